@@ -1,5 +1,13 @@
-from fastapi import APIRouter
-from app.schemas.schemas import HealthResponse
+from dependency_injector.wiring import Provide, inject
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from app.schemas.schemas import HealthResponse, ReadyResponse, StatsResponse
+from app.utils.embedding_cache import text_embedding_cache
+from app.utils.vectorize import resources
+from app.utils.inference_executor import inference_executor
+from app.utils.process_stats import process_stats
+from app.core.container import Container
+from app.core.database import WeaviateDatabase
 
 router = APIRouter(
     tags=["health"]
@@ -9,4 +17,32 @@ router = APIRouter(
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
     print("Health check endpoint called")
-    return HealthResponse(status="ok")
\ No newline at end of file
+    return HealthResponse(status="ok")
+
+
+@router.get("/ready", response_model=ReadyResponse)
+async def readiness_check():
+    """Report whether the model is loaded and warm (503 until it is)"""
+    response = ReadyResponse(
+        status="ready" if resources.ready else "loading",
+        model_loaded=resources.loaded,
+        model_warm=resources.ready,
+    )
+    if not resources.ready:
+        return JSONResponse(status_code=503, content=response.model_dump())
+    return response
+
+
+@router.get("/stats", response_model=StatsResponse)
+@inject
+async def stats(db: WeaviateDatabase = Depends(Provide[Container.db])):
+    """
+    Report runtime counters such as the text embedding cache hit rate, this
+    worker's memory and the Weaviate client's connection state and reconnects
+    """
+    return StatsResponse(
+        text_cache=text_embedding_cache.stats(),
+        inference=inference_executor.stats(),
+        process=process_stats(),
+        weaviate=db.stats(),
+    )
@@ -1,9 +1,12 @@
 from dependency_injector.wiring import Provide
+import orjson
 from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from typing import List, Dict, Any, Optional
 
 from app.core.container import Container
 from app.core.middleware import inject
+from app.schemas.schemas import ImagePageResponse
 from app.services.image_services import ImageService
 
 router = APIRouter(
@@ -12,21 +15,40 @@ router = APIRouter(
 )
 
 
-@router.get("/all")
+@router.get("/all", response_model=ImagePageResponse)
 @inject
 def read_all_images(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    stream: bool = Query(False, description="Stream every image as NDJSON instead of one page"),
+    fields: Optional[str] = Query(None, description="Comma-separated properties to return (default: all)"),
     image: ImageService = Depends(Provide[Container.image_service]),
 ):
     """
-    Retrieve all images from the database
+    Retrieve images from the database, one page at a time
     
     Args:
-        limit: Maximum number of results to return
+        limit: Maximum number of results per page (page size when streaming)
+        cursor: Cursor returned with the previous page
+        stream: Stream all images as newline-delimited JSON (constant memory)
+        fields: Properties to return
         
     Returns:
-        List of images
+        A page of images and the cursor of the next page, or an NDJSON stream of images
     """
-    return image.read_all_image()
+    properties = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    try:
+        if stream:
+            # Validated here, before the response starts: errors mid-stream cannot become a 400
+            images = image.iter_images(properties, page_size=limit)
+        else:
+            page = image.read_image_page(limit=limit, cursor=cursor, properties=properties)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if stream:
+        lines = (orjson.dumps(item, default=str) + b"\n" for item in images)
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+    return ORJSONResponse(page)
 
 
 @router.get("/{image_id}")
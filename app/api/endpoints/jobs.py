@@ -0,0 +1,33 @@
+from dependency_injector.wiring import Provide
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from app.core.container import Container
+from app.core.middleware import inject
+from app.schemas.schemas import JobResponse
+from app.services.job_services import JobService
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"],
+)
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+@inject
+async def get_job(
+    job_id: str,
+    service: JobService = Depends(Provide[Container.job_service]),
+):
+    """
+    Report the status of an ingestion job
+
+    Args:
+        job_id: Id returned by the upload endpoints
+
+    Returns:
+        Status, progress, throughput and per-item failures
+    """
+    job = await run_in_threadpool(service.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
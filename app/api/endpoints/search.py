@@ -1,12 +1,16 @@
 from dependency_injector.wiring import Provide
-from fastapi import APIRouter, Depends, UploadFile, File, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
 from typing import List, Optional
 import io
 from PIL import Image
 import base64
-from app.schemas.schemas import TextSearchResponse, ImageRequest, TextRequest
+from app.schemas.schemas import BatchSearchResponse, BatchTextSearchRequest, TextSearchResponse, ImageRequest, TextRequest
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
+from app.core.config import configs
 from app.core.container import Container
+from app.utils.preprocess import decode_image
+from app.utils.vectorize import IMAGE_RESIZE
 from app.core.middleware import inject
 from app.services.image_services import ImageService
 from app.services.text_services import TextService
@@ -19,7 +23,7 @@ router = APIRouter(
 
 @router.get("/text")
 @inject
-def search_by_text(
+async def search_by_text(
     query: TextRequest,
     limit: int = Query(5, ge=1, le=100),
     service: TextService = Depends(Provide[Container.text_service]),
@@ -34,7 +38,7 @@ def search_by_text(
     Returns:
         List of matching image results
     """
-    image_paths = service.search_by_text(text=query, limit=limit)
+    image_paths = await service.search_by_text_async(text=query, limit=limit)
     
     # Create FileResponse objects here if you need to return the actual files
     response_files = []
@@ -63,13 +67,95 @@ async def search_by_image(
         List of matching text results
     """
     content = await file.read()
-    image = Image.open(io.BytesIO(content)).convert('RGB')
+    image = await run_in_threadpool(decode_image, content, IMAGE_RESIZE)
     
-    results = service.search_by_image(image=image, limit=limit)
+    results = await service.search_by_image_async(image=image, limit=limit)
     
     
     text_results = []
     for obj in results.objects:
         if obj.properties.get("text"):
             text_results.append(obj.properties["text"])
-    return TextSearchResponse(text=text_results)
\ No newline at end of file
+    return TextSearchResponse(text=text_results)
+
+
+def _check_batch_size(count: int) -> None:
+    """Reject empty batches and batches above SEARCH_BATCH_MAX_QUERIES."""
+    if count == 0:
+        raise HTTPException(status_code=400, detail="At least one query is required")
+    if count > configs.SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {configs.SEARCH_BATCH_MAX_QUERIES} queries per batch (got {count})",
+        )
+
+
+@router.post("/text/batch", response_model=BatchSearchResponse)
+@inject
+async def search_by_texts(
+    request: BatchTextSearchRequest,
+    limit: int = Query(5, ge=1, le=100),
+    service: TextService = Depends(Provide[Container.text_service]),
+):
+    """
+    Search for images with several text queries in one request
+
+    The queries not in the embedding cache are encoded in one forward
+    pass and searched together.
+
+    Args:
+        request: Text queries (at most SEARCH_BATCH_MAX_QUERIES)
+        limit: Maximum number of results per query
+
+    Returns:
+        Image paths of the results, keyed by query
+    """
+    _check_batch_size(len(request.queries))
+    image_paths = await service.search_by_texts_async(texts=request.queries, limit=limit)
+    return BatchSearchResponse(results=dict(zip(request.queries, image_paths)))
+
+
+@router.post("/image/batch", response_model=BatchSearchResponse)
+@inject
+async def search_by_images(
+    files: List[ImageRequest] = File(...),
+    limit: int = Query(5, ge=1, le=100),
+    service: ImageService = Depends(Provide[Container.image_service]),
+):
+    """
+    Search for text with several image queries in one request
+
+    The images are encoded in one forward pass (images already uploaded
+    reuse their stored embedding) and searched together. Images that
+    cannot be decoded are reported in failures.
+
+    Args:
+        files: Image files to search with (at most SEARCH_BATCH_MAX_QUERIES, unique file names)
+        limit: Maximum number of results per query
+
+    Returns:
+        Matching texts, keyed by file name
+    """
+    _check_batch_size(len(files))
+    filenames = [file.filename for file in files]
+    if len(set(filenames)) != len(filenames):
+        raise HTTPException(status_code=400, detail="File names must be unique")
+    contents = [await file.read() for file in files]
+
+    def decode_all():
+        decoded, failures = [], {}
+        for filename, content in zip(filenames, contents):
+            try:
+                decoded.append((filename, content, decode_image(content, IMAGE_RESIZE)))
+            except Exception as e:
+                failures[filename] = f"Could not decode image: {str(e)}"
+        return decoded, failures
+
+    decoded, failures = await run_in_threadpool(decode_all)
+    results = {}
+    if decoded:
+        names, images_content, images = (list(column) for column in zip(*decoded))
+        batch_results = await service.search_by_images_async(images, images_content, limit=limit)
+        for name, entities in zip(names, batch_results):
+            results[name] = [obj.properties["text"] for obj in entities.objects if obj.properties.get("text")]
+    return BatchSearchResponse(results=results, failures=failures)
@@ -1,14 +1,24 @@
 from dependency_injector.wiring import Provide
-from fastapi import APIRouter, Depends, UploadFile, File, Form
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Dict, Any, Optional
 import json
 from PIL import Image
 import io
-from app.schemas.schemas import UploadResponse, TextRequest, ImageRequest
+from fastapi.responses import JSONResponse
+from app.schemas.schemas import (
+    JobAcceptedResponse, StreamUploadResponse, TextStreamUploadResponse, UploadResponse, TextRequest, ImageRequest
+)
+from app.core.config import configs
 from app.core.container import Container
+from app.utils.preprocess import decode_image
+from app.utils.upload_stream import ArchiveStream, MultipartImageStream, NdjsonTextStream, archive_kind
+from app.utils.vectorize import IMAGE_RESIZE
 from app.core.middleware import inject
 from app.services.image_services import ImageService
 from app.services.text_services import TextService
+from app.services.job_services import JobService
+from app.utils.inference_executor import InferenceSaturatedError
 from fastapi import HTTPException
 
 
@@ -18,47 +28,182 @@ router = APIRouter(
 )
 
 
-@router.post("/text", response_model=UploadResponse)
+def _job_accepted(request: Request, job: Dict[str, Any]) -> JSONResponse:
+    """202 Accepted response pointing at the job status endpoint."""
+    status_url = request.app.url_path_for("get_job", job_id=job["id"])
+    return JSONResponse(
+        status_code=202,
+        content=JobAcceptedResponse(
+            job_id=job["id"], status=job["status"], total=job["total"], status_url=status_url
+        ).model_dump(),
+        headers={"Location": status_url},
+    )
+
+
+@router.post("/text", response_model=UploadResponse, responses={202: {"model": JobAcceptedResponse}})
 @inject
-def upload_text(
+async def upload_text(
+    request: Request,
     request_data: Dict[str, Any],
-    service: TextService = Depends(Provide[Container.text_service])
+    wait: bool = Query(False, description="Process the upload before responding instead of queueing a job"),
+    service: TextService = Depends(Provide[Container.text_service]),
+    job_service: JobService = Depends(Provide[Container.job_service]),
 ):
-    """Upload text data to the vector database"""
+    """
+    Upload text data to the vector database
+
+    The texts are queued as an ingestion job and the response (202) carries
+    the job id; progress is reported by GET /jobs/{job_id}. With wait=true
+    they are encoded and stored before responding, as a single request.
+    """
     metadata = request_data.get("metadata", None)
     texts = request_data.get("texts", None)
+    if not isinstance(texts, list) or not texts:
+        raise HTTPException(status_code=400, detail="texts must be a non-empty list")
+    if metadata is not None and len(metadata) != len(texts):
+        raise HTTPException(status_code=400, detail="Length of texts and metadata must match")
     
-    print(f"Received metadata: {metadata}")
-    print(f"Received texts: {texts}")
-    return service.upload_text(texts, metadata)
+    print(f"Received {len(texts)} texts")
+    if wait:
+        return await service.upload_text_async(texts, metadata)
+    job = await run_in_threadpool(job_service.submit_texts, texts, metadata)
+    return _job_accepted(request, job)
 
 
-@router.post("/image")
+@router.post("/texts", response_model=TextStreamUploadResponse)
+@inject
+async def upload_texts(
+    request: Request,
+    batch_size: Optional[int] = Query(None, ge=1, le=4096, description="Texts per batch (defaults to UPLOAD_TEXT_BATCH_SIZE)"),
+    service: TextService = Depends(Provide[Container.text_service]),
+):
+    """
+    Upload texts as NDJSON (application/x-ndjson), processed as it streams in
+
+    Each line is {"text": "...", "metadata": {...}} (metadata optional) or
+    a bare JSON string. Lines are parsed as they arrive, and texts are
+    encoded and stored in fixed-size batches while the rest of the body is
+    still being received, so corpora of any size are loaded with bounded
+    memory. The response counts the lines uploaded and failed, and lists
+    the failed lines with their error.
+    """
+    stream = NdjsonTextStream(configs.UPLOAD_MAX_LINE_BYTES)
+
+    async def records():
+        async for chunk in request.stream():
+            for record in stream.feed(chunk):
+                yield record
+        for record in stream.close():
+            yield record
+
+    return await service.upload_text_stream(records(), batch_size)
+
+
+@router.post("/image", responses={202: {"model": JobAcceptedResponse}})
 @inject
 async def upload_image(
+    request: Request,
     metadata_json: str = Form(None),
     file: UploadFile = File(...),
-    service: ImageService = Depends(Provide[Container.image_service])
+    wait: bool = Query(False, description="Process the upload before responding instead of queueing a job"),
+    service: ImageService = Depends(Provide[Container.image_service]),
+    job_service: JobService = Depends(Provide[Container.job_service]),
 ):
-    """Upload image files to the vector database"""
+    """
+    Upload image files to the vector database
+
+    The image is spooled to disk and queued as an ingestion job; the
+    response (202) carries the job id, and progress is reported by
+    GET /jobs/{job_id}. With wait=true it is processed before responding.
+    """
+    # Parse metadata: one object for the image (or a list of one)
+    try:
+        metadata = json.loads(metadata_json) if metadata_json else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"metadata_json is not valid JSON: {str(e)}")
+    if isinstance(metadata, dict):
+        metadata = [metadata]
+    if metadata is not None and (not isinstance(metadata, list) or len(metadata) != 1
+                                 or not isinstance(metadata[0], dict)):
+        raise HTTPException(status_code=400, detail="metadata_json must be a JSON object for the image")
     
     try:
         
         # Process single uploaded image
         content = await file.read()
-        # Parse metadata
-        metadata = json.loads(metadata_json) if metadata_json else None
-        img = Image.open(io.BytesIO(content)).convert('RGB')
-        images = [img]  # Create a list with the single image
         images_filename = [file.filename]
+        if not wait:
+            job = await run_in_threadpool(job_service.submit_images, [content], images_filename, metadata)
+            return _job_accepted(request, job)
+
+        img = await run_in_threadpool(decode_image, content, IMAGE_RESIZE)
+        images = [img]  # Create a list with the single image
         
         print(f"Processed image: {file.filename}, size: {img.size}")
         
         # Call service with single image in a list
-        response = service.upload_image(images,images_filename, metadata)
+        response = await service.upload_image_async(images, images_filename, [content], metadata)
         if not isinstance(response, dict):
             return {"message": "Image uploaded successfully"}
         return response
+    except InferenceSaturatedError:
+        raise
     except Exception as e:
         print(f"Error processing upload: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+
+@router.post("/images", response_model=StreamUploadResponse)
+@inject
+async def upload_images(
+    request: Request,
+    filename: Optional[str] = Query(None, description="Archive file name, for a raw archive body (e.g. photos.tar.gz)"),
+    batch_size: Optional[int] = Query(None, ge=1, le=1024, description="Images per batch (defaults to UPLOAD_BATCH_SIZE)"),
+    service: ImageService = Depends(Provide[Container.image_service]),
+):
+    """
+    Upload many images in one request, processed in batches as it streams in
+
+    The body is either multipart/form-data with any number of image files
+    and/or tar, tar.gz or zip archives (and an optional "metadata" field,
+    sent before the files: a JSON object keyed by file name, or a JSON list
+    in file order), or a raw tar, tar.gz or zip archive. Images are decoded,
+    encoded and stored batch by batch while the rest of the body is still
+    being received, so memory use does not grow with the upload size.
+    Non-image archive members are skipped; each file that cannot be read
+    or decoded is reported in the summary without failing the others.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        try:
+            stream = MultipartImageStream(
+                content_type, configs.UPLOAD_MAX_FILE_BYTES, configs.UPLOAD_SPOOL_MEMORY_BYTES
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        metadata_for = stream.metadata_for
+    else:
+        kind = archive_kind(filename, content_type.split(";")[0].strip())
+        if kind is None:
+            raise HTTPException(
+                status_code=415,
+                detail="Expected multipart/form-data or a tar, tar.gz or zip archive",
+            )
+        stream = ArchiveStream(kind, configs.UPLOAD_MAX_FILE_BYTES, configs.UPLOAD_SPOOL_MEMORY_BYTES)
+        metadata_for = None
+
+    async def entries():
+        async for chunk in request.stream():
+            for entry in stream.feed(chunk):
+                yield entry
+        for entry in stream.close():
+            yield entry
+
+    try:
+        return await service.upload_image_stream(entries(), metadata_for, batch_size)
+    except InferenceSaturatedError:
+        raise
+    except ValueError as e:
+        # Malformed multipart body, archive or metadata
+        print(f"Error processing streamed upload: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Upload failed: {str(e)}")
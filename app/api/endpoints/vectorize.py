@@ -1,75 +1,85 @@
-from fastapi import APIRouter, HTTPException
-from app.models.schemas import TextRequest, ImageRequest, TextVectorResponse, ImageVectorResponse
-from app.core.initialization import get_resources
-import torch
 import base64
-import io
-from PIL import Image
+from enum import Enum
+
+import numpy as np
+from fastapi import APIRouter, File, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+
+from app.schemas.schemas import TextRequest, ImageRequest, TextVectorResponse, ImageVectorResponse
+from app.utils.batching import batched_resources
+from app.utils.embedding_cache import text_embedding_cache
+from app.utils.preprocess import decode_image
+from app.utils.vectorize import IMAGE_RESIZE, resources
+
+router = APIRouter(
+    prefix="/vectorize",
+    tags=["vectorize"],
+)
+
+
+class VectorFormat(str, Enum):
+    json = "json"
+    base64 = "base64"
+    binary = "binary"
+
+
+def _vector_response(vector: np.ndarray, format: VectorFormat, text: str = None):
+    """
+    Serialize a float32 vector in the requested format.
+
+    - json: list of floats (the default, as before)
+    - base64: little-endian float32 bytes, base64 encoded
+    - binary: raw little-endian float32 bytes (application/octet-stream),
+      with the dimension and dtype in the X-Vector-Dim / X-Vector-Dtype headers
+    """
+    vector = np.asarray(vector, dtype="<f4")
+    if format == VectorFormat.binary:
+        return Response(
+            content=vector.tobytes(),
+            media_type="application/octet-stream",
+            headers={"X-Vector-Dim": str(vector.shape[0]), "X-Vector-Dtype": "float32"},
+        )
+    if format == VectorFormat.base64:
+        payload = base64.b64encode(vector.tobytes()).decode("ascii")
+    else:
+        payload = vector.tolist()
+    if text is None:
+        return ImageVectorResponse(vector=payload, dim=vector.shape[0])
+    return TextVectorResponse(text=text, vector=payload, dim=vector.shape[0])
 
-router = APIRouter()
 
 @router.post("/text", response_model=TextVectorResponse)
-async def vectorize_text(request: TextRequest):
-    # Get initialized resources
-    resources = get_resources()
-    
-    text = request.text
-    print(f"Received text: {text}")
-    print(f"Using device: {resources.device}")
-    
-    if resources.tokenizer is None:
-        raise HTTPException(status_code=500, detail="Tokenizer not initialized")
-    
-    # Encode text
-    encoded_texts = resources.tokenizer(
-        [text],
-        padding=True,
-        truncation=True,
-        max_length=100,
-        return_tensors='pt'
-    )
-    
-    # Move to device
-    input_ids = encoded_texts['input_ids'].to(resources.device)
-    attention_mask = encoded_texts['attention_mask'].to(resources.device)
-    
-    # Extract text features
-    with torch.no_grad():
-        text_features = resources.model.extract_text_features(input_ids, attention_mask)
-        text_features = torch.nn.functional.normalize(text_features, p=2, dim=-1)
-    
-    # Convert to list and return
-    vector = text_features[0].cpu().numpy().tolist()
-    
-    return TextVectorResponse(
-        text=text,
-        vector=vector,
-        dim=len(vector)
+def vectorize_text(
+    text: TextRequest,
+    format: VectorFormat = Query(VectorFormat.json),
+):
+    """
+    Embed a text query
+
+    Args:
+        text: Text to embed
+        format: Vector encoding in the response (json, base64 or binary)
+    """
+    embedding = text_embedding_cache.encode_text(
+        text, batched_resources.encode_text, resources.text_model_version
     )
+    return _vector_response(embedding["vector"], format, text=text)
+
 
 @router.post("/image", response_model=ImageVectorResponse)
-async def vectorize_image(request: ImageRequest):
-    # Get initialized resources
-    resources = get_resources()
-    
-    # Decode base64 image
-    try:
-        image_data = base64.b64decode(request.image)
-        image = Image.open(io.BytesIO(image_data)).convert('RGB')
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid image data: {str(e)}")
-    
-    # Transform and encode image
-    img_tensor = resources.transform(image).unsqueeze(0).to(resources.device)
-    
-    with torch.no_grad():
-        image_features = resources.model.extract_image_features(img_tensor)
-        image_features = torch.nn.functional.normalize(image_features, p=2, dim=-1)
-    
-    # Convert to list and return
-    vector = image_features[0].cpu().numpy().tolist()
-    
-    return ImageVectorResponse(
-        vector=vector,
-        dim=len(vector)
-    )
\ No newline at end of file
+async def vectorize_image(
+    file: ImageRequest = File(...),
+    format: VectorFormat = Query(VectorFormat.json),
+):
+    """
+    Embed an image
+
+    Args:
+        file: Image file to embed
+        format: Vector encoding in the response (json, base64 or binary)
+    """
+    content = await file.read()
+    image = await run_in_threadpool(decode_image, content, IMAGE_RESIZE)
+    embedding = await run_in_threadpool(batched_resources.encode_image, image)
+    return _vector_response(embedding["vector"], format)
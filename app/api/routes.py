@@ -3,6 +3,8 @@ from app.api.endpoints.health import router as health_router
 from app.api.endpoints.search import router as search_router
 from app.api.endpoints.upload import router as upload_router
 from app.api.endpoints.image import router as image_router
+from app.api.endpoints.vectorize import router as vectorize_router
+from app.api.endpoints.jobs import router as jobs_router
 
 # Create main API router
 api_router = APIRouter()
@@ -11,7 +13,9 @@ router_list = [
     health_router,
     search_router,
     upload_router,
-    image_router
+    image_router,
+    vectorize_router,
+    jobs_router,
 ]
 
 for router in router_list:
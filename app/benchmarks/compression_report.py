@@ -0,0 +1,168 @@
+"""
+Memory per object and recall@k of compressed (PQ / BQ) Weaviate vector
+indexes against the uncompressed index, on our own data.
+
+A sample of objects (with their vectors) is read from the live collection
+and loaded into temporary collections, one per quantizer, built with the
+same schema as the app (app.core.schema). Every query vector (sampled
+from the same data) is run against each collection, with and without
+client-side rescoring (read_by_vector's rescore_limit), and compared with
+the uncompressed collection's results and with exact brute-force search.
+
+Memory per object is estimated from the index layout (vector codes plus
+HNSW links). With --metrics-url pointing at Weaviate's Prometheus endpoint
+(PROMETHEUS_MONITORING_ENABLED=true), the measured Go heap growth per
+loaded object is reported too.
+
+Usage:
+    python -m app.benchmarks.compression_report [--sample 20000] [--queries 200] [--k 10]
+        [--quantizers none pq bq] [--rescore 0 50 100] [--metrics-url http://localhost:2112/metrics]
+
+The temporary collections are deleted afterwards.
+"""
+import argparse
+import math
+import re
+import time
+import urllib.request
+
+import numpy as np
+from weaviate.classes.query import MetadataQuery
+
+from app.core.config import configs
+from app.core.database import WeaviateDatabase
+from app.core.schema import create_collection
+from app.repository.base_repository import rescore_objects
+
+
+def heap_bytes(metrics_url):
+    """Go heap in use, from Weaviate's Prometheus metrics (None if unavailable)."""
+    if not metrics_url:
+        return None
+    try:
+        text = urllib.request.urlopen(metrics_url, timeout=5).read().decode()
+    except OSError:
+        return None
+    match = re.search(r"^go_memstats_heap_inuse_bytes\s+(\S+)", text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def estimated_bytes_per_object(quantizer, dim):
+    """In-memory vector codes plus HNSW links (layer 0 holds up to 2 * maxConnections 8-byte ids)."""
+    links = 2 * configs.WEAVIATE_HNSW_MAX_CONNECTIONS * 8
+    if quantizer == "pq":
+        code = configs.WEAVIATE_PQ_SEGMENTS * (1 if configs.WEAVIATE_PQ_CENTROIDS <= 256 else 2)
+    elif quantizer == "bq":
+        code = math.ceil(dim / 8)
+    else:
+        code = dim * 4
+    return code, links
+
+
+def load_sample(collection, size):
+    """Read up to `size` objects with their vectors from the live collection."""
+    ids, vectors, properties = [], [], []
+    for obj in collection.iterator(include_vector=True):
+        vector = obj.vector.get("default") if isinstance(obj.vector, dict) else obj.vector
+        ids.append(obj.uuid)
+        vectors.append(vector)
+        properties.append(obj.properties)
+        if len(ids) >= size:
+            break
+    return ids, np.asarray(vectors, dtype=np.float32), properties
+
+
+def wait_until_indexed(client, name, compressed, timeout=600):
+    """Wait for the vector queue to drain (and PQ/BQ compression to kick in)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        shards = [shard for node in client.cluster.nodes(collection=name, output="verbose") for shard in node.shards]
+        if all(shard.vector_queue_length == 0 and (shard.compressed or not compressed) for shard in shards):
+            return True
+        time.sleep(2)
+    print(f"Warning: {name} still indexing after {timeout}s")
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sample", type=int, default=20000, help="Objects copied from the live collection")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--quantizers", nargs="+", default=["none", "pq", "bq"])
+    parser.add_argument("--rescore", type=int, nargs="+", default=[0, 50, 100])
+    parser.add_argument("--metrics-url", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    db = WeaviateDatabase()
+    client = db.client
+    source = client.collections.get(configs.WEAVIATE_COLLECTION_NAME)
+    ids, vectors, properties = load_sample(source, args.sample)
+    if len(ids) < args.k:
+        raise SystemExit(f"Only {len(ids)} objects in {configs.WEAVIATE_COLLECTION_NAME}")
+    rng = np.random.default_rng(args.seed)
+    queries = vectors[rng.choice(len(ids), min(args.queries, len(ids)), replace=False)]
+    norms = np.linalg.norm(vectors, axis=1)
+    exact = []
+    for query in queries:
+        similarity = vectors @ query / (norms * np.linalg.norm(query) + 1e-12)
+        exact.append({ids[i] for i in np.argsort(-similarity)[:args.k]})
+    print(f"{len(ids)} objects x {vectors.shape[1]} dims from {configs.WEAVIATE_COLLECTION_NAME}, "
+          f"{len(queries)} queries, k={args.k}, index {configs.WEAVIATE_VECTOR_INDEX}")
+
+    results = {}
+    rows = []
+    names = []
+    try:
+        for quantizer in ["none"] + [q for q in args.quantizers if q != "none"]:
+            name = f"{configs.WEAVIATE_COLLECTION_NAME}_report_{quantizer}"
+            if client.collections.exists(name):
+                client.collections.delete(name)
+            heap_before = heap_bytes(args.metrics_url)
+            # Train PQ on the sample itself so compression actually happens
+            create_collection(client, name, quantizer=quantizer, training_limit=min(len(ids), configs.WEAVIATE_PQ_TRAINING_LIMIT))
+            names.append(name)
+            collection = client.collections.get(name)
+            with collection.batch.fixed_size(batch_size=200) as batch:
+                for uuid, vector, props in zip(ids, vectors, properties):
+                    batch.add_object(properties=props, vector=vector.tolist(), uuid=uuid)
+            wait_until_indexed(client, name, compressed=quantizer != "none")
+            heap_after = heap_bytes(args.metrics_url)
+            measured = (heap_after - heap_before) / len(ids) if heap_before and heap_after else None
+            code, links = estimated_bytes_per_object(quantizer, vectors.shape[1])
+
+            for rescore in args.rescore:
+                found_exact = found_baseline = 0
+                start = time.perf_counter()
+                for q, query in enumerate(queries):
+                    fetch = max(rescore, args.k)
+                    response = collection.query.near_vector(
+                        near_vector=query.tolist(), limit=fetch, include_vector=rescore > args.k,
+                        return_metadata=MetadataQuery(distance=True),
+                    )
+                    objects = response.objects
+                    if rescore > args.k:
+                        objects = rescore_objects(objects, query, args.k)
+                    got = {obj.uuid for obj in objects[:args.k]}
+                    results[(quantizer, rescore, q)] = got
+                    found_exact += len(got & exact[q])
+                    found_baseline += len(got & results[("none", args.rescore[0], q)])
+                ms = (time.perf_counter() - start) / len(queries) * 1000
+                total = len(queries) * args.k
+                rows.append((quantizer, rescore, code, links, measured, found_baseline / total, found_exact / total, ms))
+    finally:
+        for name in names:
+            client.collections.delete(name)
+        client.close()
+
+    print(f"{'quantizer':>9} {'rescore':>7} {'code B/obj':>10} {'links B/obj':>11} {'heap B/obj':>10} "
+          f"{'recall vs none':>14} {'recall vs exact':>15} {'ms/query':>9}")
+    for quantizer, rescore, code, links, measured, recall_baseline, recall_exact, ms in rows:
+        heap = f"{measured:.0f}" if measured is not None else "-"
+        print(f"{quantizer:>9} {rescore:>7} {code:>10} {links:>11} {heap:>10} "
+              f"{recall_baseline:>14.3f} {recall_exact:>15.3f} {ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark image decode + preprocessing time per megapixel.
+
+Compares the previous path (full decode, convert('RGB'), transform) with
+reduced-resolution JPEG decoding (decode_image), and measures parallel
+preprocessing of a whole batch with ImagePreprocessor.
+
+Usage:
+    python -m app.benchmarks.decode_benchmark [--images DIR] [--sizes 1024x768 4000x3000 6000x4000] [--workers 4]
+
+Without --images, synthetic JPEGs of the given sizes are generated in memory.
+"""
+import argparse
+import io
+import os
+import time
+
+import numpy as np
+import torchvision.transforms as transforms
+from PIL import Image
+
+from app.utils.preprocess import ImagePreprocessor, decode_image
+from app.utils.vectorize import IMAGE_CROP, IMAGE_RESIZE
+
+
+def synthetic_jpeg(width, height, quality=90):
+    """Encode a smooth random RGB image of the given size as JPEG bytes."""
+    rng = np.random.default_rng(0)
+    small = rng.integers(0, 255, size=(max(1, height // 16), max(1, width // 16), 3), dtype=np.uint8)
+    image = Image.fromarray(small).resize((width, height), Image.BILINEAR)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def median_time(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="Directory of real images to benchmark")
+    parser.add_argument("--sizes", nargs="+", default=["1024x768", "4000x3000", "6000x4000"])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    transform = transforms.Compose([
+        transforms.Resize(IMAGE_RESIZE),
+        transforms.CenterCrop(IMAGE_CROP),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+    ])
+
+    if args.images:
+        samples = []
+        for name in sorted(os.listdir(args.images)):
+            with open(os.path.join(args.images, name), "rb") as f:
+                samples.append((name, f.read()))
+    else:
+        samples = []
+        for size in args.sizes:
+            width, height = (int(v) for v in size.split("x"))
+            samples.append((size, synthetic_jpeg(width, height)))
+
+    print(f"{'image':>24} {'MP':>6} {'full ms':>9} {'reduced ms':>11} {'full ms/MP':>11} {'reduced ms/MP':>14} {'speedup':>8}")
+    for name, content in samples:
+        try:
+            with Image.open(io.BytesIO(content)) as probe:
+                megapixels = probe.size[0] * probe.size[1] / 1e6
+        except Exception:
+            continue
+        full = median_time(lambda: transform(Image.open(io.BytesIO(content)).convert("RGB")), args.repeat)
+        reduced = median_time(lambda: transform(decode_image(content, IMAGE_RESIZE)), args.repeat)
+        print(f"{name[:24]:>24} {megapixels:>6.1f} {full * 1000:>9.1f} {reduced * 1000:>11.1f} "
+              f"{full * 1000 / megapixels:>11.2f} {reduced * 1000 / megapixels:>14.2f} {full / reduced:>7.2f}x")
+
+    # Parallel preprocessing of one batch
+    batch = [content for _, content in samples] * (args.batch // len(samples) + 1)
+    batch = batch[:args.batch]
+    sequential = ImagePreprocessor(transform, IMAGE_RESIZE, workers=1)
+    parallel = ImagePreprocessor(transform, IMAGE_RESIZE, workers=args.workers)
+    sequential_time = median_time(lambda: sequential.preprocess(batch), args.repeat)
+    parallel_time = median_time(lambda: parallel.preprocess(batch), args.repeat)
+    print(f"Batch of {len(batch)}: 1 worker {sequential_time * 1000:.1f} ms, "
+          f"{args.workers} workers {parallel_time * 1000:.1f} ms ({sequential_time / parallel_time:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
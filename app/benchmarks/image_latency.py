@@ -0,0 +1,66 @@
+"""
+Compare per-image latency of the baseline eager image path (NCHW fp32,
+torch.no_grad) with the optimized path (Conv+BN folded, channels_last,
+torch.inference_mode, optionally torch.compile).
+
+Usage:
+    python -m app.benchmarks.image_latency [--batch-sizes 1 8 32] [--repeat 20] [--compile]
+
+Runs on random 224x224 inputs, so only the model forward is measured.
+"""
+import argparse
+import time
+
+import torch
+
+from app.core.config import configs
+from app.utils.simple_clip.backends import TorchBackend
+from app.utils.vectorize import SimpleClipResources
+
+
+def per_image_latency(fn, batch_size, repeat, grad_mode):
+    """Return the median per-image latency (ms) of fn on a random batch."""
+    batch = torch.randn(batch_size, 3, 224, 224)
+    timings = []
+    with grad_mode():
+        for _ in range(3):
+            fn(batch)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(batch)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] / batch_size * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--compile", action="store_true", help="Also measure torch.compile")
+    args = parser.parse_args()
+
+    baseline = SimpleClipResources(backend="torch", optimize=False)
+    baseline.initialize()
+    optimized = SimpleClipResources(backend="torch", optimize=True)
+    optimized.initialize()
+
+    variants = [
+        ("baseline", baseline.backend.extract_image_features, torch.no_grad),
+        ("optimized", optimized.backend.extract_image_features, torch.inference_mode),
+    ]
+    if args.compile:
+        # Already folded, so this only adds compilation on top of the optimized model
+        compiled = TorchBackend(optimized.model, optimize=True, compile=True, batch_buckets=args.batch_sizes)
+        variants.append(("optimized+compile", compiled.extract_image_features, torch.inference_mode))
+
+    print(f"torch {torch.__version__}, {torch.get_num_threads()} threads, encoder {configs.IMAGE_ENCODER}")
+    print(f"{'batch':>6} " + " ".join(f"{name:>18}" for name, _, _ in variants) + f" {'speedup':>8}")
+    for batch_size in args.batch_sizes:
+        latencies = [per_image_latency(fn, batch_size, args.repeat, mode) for _, fn, mode in variants]
+        print(f"{batch_size:>6} " + " ".join(f"{ms:>15.3f} ms" for ms in latencies)
+              + f" {latencies[0] / min(latencies[1:]):>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Measure how long `import app.main` takes in a fresh interpreter and check
+it against configs.IMPORT_TIME_BUDGET_S.
+
+Usage:
+    python -m app.benchmarks.import_time [--module app.main] [--budget 3.0] [--repeat 3] [--top 15]
+
+Exits with status 1 when the best of the runs is over budget, and prints
+the slowest imports reported by `python -X importtime`.
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+from app.core.config import configs
+
+
+def measure_import(module: str) -> float:
+    """Return the wall time in seconds of importing module in a new interpreter."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True)
+    return time.perf_counter() - start
+
+
+def slowest_imports(module: str, top: int):
+    """Return the top cumulative import times (microseconds, module) from -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True, capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    # Only top-level entries (no indentation) are meaningful on their own
+    rows = [row for row in rows if not row[1].startswith(" ")]
+    return sorted(rows, reverse=True)[:top]
+
+
+def heavy_imports(module: str):
+    """Return which model libraries get imported as a side effect of importing module."""
+    names = ("torch", "torchvision", "transformers", "timm", "sentence_transformers")
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, {module}; print('loaded:', *(n for n in {names!r} if n in sys.modules))"],
+        check=True, capture_output=True, text=True,
+    )
+    # The module may print on import; the answer is on the last line
+    return result.stdout.strip().splitlines()[-1].split()[1:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget", type=float, default=configs.IMPORT_TIME_BUDGET_S)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    timings = [measure_import(args.module) for _ in range(args.repeat)]
+    best = min(timings)
+    print(f"import {args.module}: best {best:.3f}s over {args.repeat} runs "
+          f"({', '.join(f'{t:.3f}s' for t in timings)}), budget {args.budget:.3f}s")
+
+    print("Slowest top-level imports (cumulative):")
+    for cumulative, name in slowest_imports(args.module, args.top):
+        print(f"  {cumulative / 1e6:8.3f}s  {name}")
+
+    heavy = heavy_imports(args.module)
+    if heavy:
+        print(f"Warning: importing {args.module} loads {', '.join(heavy)}")
+
+    if best > args.budget:
+        print("Import time budget exceeded")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
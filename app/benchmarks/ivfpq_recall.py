@@ -0,0 +1,85 @@
+"""
+Recall@k vs latency of the IVF-PQ index against exact search.
+
+Generates synthetic CLIP-like vectors (unit-norm, 256-d, clustered around
+topic directions with anisotropic noise), builds an IVF-PQ index and
+reports, for each nprobe and re-rank setting, recall@k against exact
+brute-force search together with the mean per-query latency.
+
+Usage:
+    python -m app.benchmarks.ivfpq_recall [--rows 200000] [--queries 200] [--k 10]
+        [--nlist 0] [--m 32] [--nprobe 1 4 8 16 32 64] [--rerank-factors 0 10]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.utils.ivfpq import IVFPQIndex
+
+
+def clip_like_vectors(rows, dim, topics, seed):
+    """Unit vectors clustered around random topic directions, with a low-rank structure."""
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((dim, dim)).astype(np.float32)
+    scales = np.geomspace(1.0, 0.05, dim).astype(np.float32)  # anisotropic spectrum
+    centers = rng.standard_normal((topics, dim)).astype(np.float32) * scales
+    assign = rng.integers(0, topics, rows)
+    vectors = centers[assign] + 0.6 * rng.standard_normal((rows, dim)).astype(np.float32) * scales
+    vectors = vectors @ basis
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0, help="0 = 4 * sqrt(rows)")
+    parser.add_argument("--m", type=int, default=32)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--rerank-factors", type=int, nargs="+", default=[0, 10])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data = clip_like_vectors(args.rows + args.queries, args.dim, topics=max(16, args.rows // 500), seed=args.seed)
+    vectors, queries = data[:args.rows], data[args.rows:]
+
+    # Exact ground truth
+    start = time.perf_counter()
+    truth = []
+    for query in queries:
+        scores = vectors @ query
+        top = np.argpartition(-scores, args.k - 1)[:args.k]
+        truth.append(set(top.tolist()))
+    exact_ms = (time.perf_counter() - start) / len(queries) * 1000
+
+    nlist = args.nlist or int(np.clip(4 * np.sqrt(args.rows), 16, 65536))
+    start = time.perf_counter()
+    index = IVFPQIndex(nlist=nlist, m=args.m)
+    index.train(vectors, seed=args.seed)
+    train_s = time.perf_counter() - start
+    start = time.perf_counter()
+    index.add(vectors, np.arange(args.rows))
+    add_s = time.perf_counter() - start
+
+    print(f"{args.rows} x {args.dim} vectors, nlist={index.nlist}, m={args.m} "
+          f"({args.m} bytes/vector vs {args.dim * 4} float32), train {train_s:.1f}s, add {add_s:.1f}s")
+    print(f"exact search: {exact_ms:.2f} ms/query (recall 1.000)")
+    print(f"{'nprobe':>7} {'rerank':>7} {'recall@' + str(args.k):>10} {'ms/query':>9} {'speedup':>8}")
+    for rerank_factor in args.rerank_factors:
+        for nprobe in args.nprobe:
+            found = 0
+            start = time.perf_counter()
+            for query, expected in zip(queries, truth):
+                ids, _ = index.search(query, args.k, nprobe=nprobe, rerank=args.k * rerank_factor, vectors=vectors)
+                found += len(expected & set(ids.tolist()))
+            ms = (time.perf_counter() - start) / len(queries) * 1000
+            print(f"{nprobe:>7} {args.k * rerank_factor:>7} {found / (len(queries) * args.k):>10.3f} "
+                  f"{ms:>9.2f} {exact_ms / ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
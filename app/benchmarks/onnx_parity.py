@@ -0,0 +1,92 @@
+"""
+Check that the ONNX Runtime backend produces the same embeddings as the
+eager PyTorch backend, and compare their latency and the memory each adds
+when loaded (ONNX first, so a cached export shows its footprint without
+the PyTorch weights; run once beforehand to create the export).
+
+Usage:
+    python -m app.benchmarks.onnx_parity [--images ./app/asset/] [--atol 1e-4] [--repeat 5]
+
+Exits with status 1 when any normalized embedding differs by more than
+--atol (max absolute difference) between the two backends.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from app.benchmarks.quantization_accuracy import DEFAULT_CAPTIONS, load_images
+from app.core.config import configs
+from app.utils.process_stats import memory_usage
+from app.utils.vectorize import SimpleClipResources
+
+
+def timed(fn, repeat):
+    """Return the result of fn and its best wall time over repeat runs."""
+    result = fn()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def load(resources):
+    """Load a backend and print the resident memory it added."""
+    before = memory_usage().get("rss_mb")
+    resources.initialize()
+    after = memory_usage().get("rss_mb")
+    if before is not None and after is not None:
+        print(f"{resources.backend_name} backend: +{after - before:.0f} MB RSS after loading")
+    return resources
+
+
+def compare(name, reference, candidate, atol):
+    """Print the difference between two embedding matrices and return whether it is within atol."""
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    max_abs = float(np.abs(reference - candidate).max())
+    min_cos = float(np.sum(reference * candidate, axis=1).min())
+    ok = max_abs <= atol
+    print(f"{name}: max |diff| {max_abs:.2e}  min cosine {min_cos:.6f}  {'OK' if ok else 'FAIL'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=configs.IMAGE_SAVE_DIR, help="Directory of test images")
+    parser.add_argument("--max-images", type=int, default=16)
+    parser.add_argument("--atol", type=float, default=1e-4)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    onnx_resources = load(SimpleClipResources(text_precision="fp32", backend="onnx"))
+    torch_resources = load(SimpleClipResources(text_precision="fp32", backend="torch"))
+
+    images = load_images(args.images, args.max_images)
+    captions = DEFAULT_CAPTIONS
+    ok = True
+
+    torch_text, torch_text_time = timed(lambda: torch_resources.encode_texts(captions)["vectors"], args.repeat)
+    onnx_text, onnx_text_time = timed(lambda: onnx_resources.encode_texts(captions)["vectors"], args.repeat)
+    ok &= compare(f"text ({len(captions)} captions)", torch_text, onnx_text, args.atol)
+    print(f"  latency per caption: torch {torch_text_time / len(captions) * 1000:.2f} ms  "
+          f"onnx {onnx_text_time / len(captions) * 1000:.2f} ms")
+
+    if images:
+        torch_image, torch_image_time = timed(lambda: torch_resources.encode_images(images)["vectors"], args.repeat)
+        onnx_image, onnx_image_time = timed(lambda: onnx_resources.encode_images(images)["vectors"], args.repeat)
+        ok &= compare(f"image ({len(images)} images)", torch_image, onnx_image, args.atol)
+        print(f"  latency per image: torch {torch_image_time / len(images) * 1000:.2f} ms  "
+              f"onnx {onnx_image_time / len(images) * 1000:.2f} ms")
+    else:
+        print(f"No images found in {args.images}, skipping image parity")
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
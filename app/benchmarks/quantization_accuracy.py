@@ -0,0 +1,117 @@
+"""
+Compare int8 and fp32 text embeddings on a held-out caption set.
+
+Usage:
+    python -m app.benchmarks.quantization_accuracy [--captions captions.txt] [--images ./app/asset/] [--k 5]
+
+--captions is a text file with one caption per line, or a JSONL file whose
+lines carry a "text" field. Reports:
+  - cosine drift: 1 - cos(fp32, int8) per caption (mean / p50 / p95 / max)
+  - top-k agreement: overlap of the top-k images retrieved with fp32 and
+    int8 query embeddings, and how often the top-1 image is the same
+  - per-caption encode latency of both modes
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import configs
+from app.utils.vectorize import SimpleClipResources
+
+
+DEFAULT_CAPTIONS = [
+    "Một con mèo đang nằm ngủ trên ghế sofa",
+    "Hai đứa trẻ đang chơi đá bóng trên bãi cỏ",
+    "Một người đàn ông đang đạp xe trên phố",
+    "Chiếc xe buýt màu vàng đỗ bên đường",
+    "Cô gái đang ăn kem trong công viên",
+    "Một đĩa phở bò nóng hổi trên bàn",
+    "Con chó chạy trên bãi biển lúc hoàng hôn",
+    "Nhóm bạn đang ngồi uống cà phê",
+    "Một chiếc thuyền nhỏ trên dòng sông",
+    "Người phụ nữ đội nón lá đi chợ",
+    "Đàn gà đang mổ thóc trong sân",
+    "Một tòa nhà cao tầng vào ban đêm",
+]
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def load_captions(path):
+    """Read captions from a text or JSONL file."""
+    captions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                captions.append(json.loads(line)["text"])
+            else:
+                captions.append(line)
+    return captions
+
+
+def load_images(directory, limit):
+    """Open up to limit images from directory."""
+    names = sorted(n for n in os.listdir(directory) if os.path.splitext(n)[1].lower() in IMAGE_EXTENSIONS)
+    return [Image.open(os.path.join(directory, n)).convert("RGB") for n in names[:limit]]
+
+
+def encode_texts_timed(resources, captions):
+    """Encode captions one at a time, returning embeddings and mean latency."""
+    resources.encode_texts(captions[:1])
+    start = time.perf_counter()
+    vectors = [resources.encode_text(c)["vector"] for c in captions]
+    elapsed = time.perf_counter() - start
+    return np.asarray(vectors, dtype=np.float32), elapsed / len(captions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--captions", help="Held-out captions (.txt, one per line, or .jsonl)")
+    parser.add_argument("--images", default=configs.IMAGE_SAVE_DIR, help="Directory of gallery images")
+    parser.add_argument("--max-images", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    captions = load_captions(args.captions) if args.captions else DEFAULT_CAPTIONS
+    print(f"{len(captions)} captions")
+
+    fp32 = SimpleClipResources(text_precision="fp32")
+    int8 = SimpleClipResources(text_precision="int8")
+
+    fp32_vectors, fp32_latency = encode_texts_timed(fp32, captions)
+    int8_vectors, int8_latency = encode_texts_timed(int8, captions)
+
+    # Embeddings are L2-normalized, so the dot product is the cosine
+    drift = 1.0 - np.sum(fp32_vectors * int8_vectors, axis=1)
+    print("Cosine drift (1 - cos):")
+    print(f"  mean {drift.mean():.6f}  p50 {np.percentile(drift, 50):.6f}  "
+          f"p95 {np.percentile(drift, 95):.6f}  max {drift.max():.6f}")
+
+    images = load_images(args.images, args.max_images)
+    if images:
+        # The image tower is fp32 in both modes, so one gallery serves both
+        gallery = np.asarray(fp32.encode_images(images)["vectors"], dtype=np.float32)
+        k = min(args.k, len(images))
+        fp32_top = np.argsort(-(fp32_vectors @ gallery.T), axis=1)[:, :k]
+        int8_top = np.argsort(-(int8_vectors @ gallery.T), axis=1)[:, :k]
+        overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(fp32_top, int8_top)])
+        top1 = np.mean(fp32_top[:, 0] == int8_top[:, 0])
+        print(f"Retrieval agreement over {len(images)} images:")
+        print(f"  top-{k} overlap {overlap:.4f}  top-1 agreement {top1:.4f}")
+    else:
+        print(f"No images found in {args.images}, skipping retrieval agreement")
+
+    print("Text encode latency per caption:")
+    print(f"  fp32 {fp32_latency * 1000:.2f} ms  int8 {int8_latency * 1000:.2f} ms  "
+          f"speedup x{fp32_latency / int8_latency:.2f}")
+
+
+if __name__ == "__main__":
+    main()
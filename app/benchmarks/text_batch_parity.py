@@ -0,0 +1,57 @@
+"""
+Regression check: a caption must get the same embedding whether it is
+encoded alone or inside a batch of mixed-length captions.
+
+Usage:
+    python -m app.benchmarks.text_batch_parity [--captions captions.txt] [--batch-size 4] [--atol 1e-5]
+
+Also reports how many padding positions length bucketing saves compared
+with padding every batch to the longest caption. Exits with status 1
+when any embedding differs by more than --atol.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from app.benchmarks.quantization_accuracy import DEFAULT_CAPTIONS, load_captions
+from app.utils.vectorize import TEXT_MAX_LENGTH, resources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--captions", help="Captions (.txt, one per line, or .jsonl)")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--atol", type=float, default=1e-5)
+    args = parser.parse_args()
+
+    captions = load_captions(args.captions) if args.captions else DEFAULT_CAPTIONS
+    # Mix very short and long captions in the same batches
+    captions = captions + [captions[0].split()[0], " ".join(captions)]
+
+    start = time.perf_counter()
+    single = np.asarray([resources.encode_text(c)["vector"] for c in captions], dtype=np.float32)
+    single_time = time.perf_counter() - start
+    start = time.perf_counter()
+    batched = np.asarray(resources.encode_texts(captions, batch_size=args.batch_size)["vectors"], dtype=np.float32)
+    batched_time = time.perf_counter() - start
+
+    max_abs = float(np.abs(single - batched).max())
+    print(f"{len(captions)} captions, batch size {args.batch_size}: max |single - batched| {max_abs:.2e}")
+    print(f"  single {single_time * 1000:.1f} ms  batched {batched_time * 1000:.1f} ms")
+
+    lengths = sorted(len(ids) for ids in resources.tokenizer(captions, truncation=True, max_length=TEXT_MAX_LENGTH)["input_ids"])
+    bucketed = sum(max(lengths[i:i + args.batch_size]) * len(lengths[i:i + args.batch_size])
+                   for i in range(0, len(lengths), args.batch_size))
+    print(f"  token positions: {sum(lengths)} real, {bucketed} with length bucketing, "
+          f"{max(lengths) * len(lengths)} padded to the longest caption")
+
+    if max_abs > args.atol:
+        print("FAIL: batched embeddings differ from single-item embeddings")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import List, Optional
 
 # from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
@@ -14,8 +14,41 @@ class Configs(BaseSettings):
     PROJECT_NAME: str = "Simple CLIP"
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = ["*"]
+    # Server (python -m app.serve)
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8081
+    # Forked worker processes sharing the preloaded model (0 = cores / INFERENCE_SLOTS)
+    SERVER_WORKERS: int = 0
+    # Bulk ingestion (python -m app.ingest): decode threads (0 = cores), objects
+    # per upsert, raw items read ahead, and the resume checkpoint
+    INGEST_DECODE_WORKERS: int = 0
+    INGEST_UPSERT_BATCH_SIZE: int = 1000
+    INGEST_QUEUE_SIZE: int = 1024
+    INGEST_CHECKPOINT_PATH: str = "./data/ingest_checkpoint.json"
+    # Ingestion jobs (upload endpoints): SQLite queue and spooled uploads
+    JOB_STORE_PATH: str = "./data/jobs.db"
+    JOB_SPOOL_DIR: str = "./data/job_spool"
+    # Worker threads per process (0 disables them), items per batch, idle poll interval
+    JOB_WORKERS: int = 1
+    JOB_BATCH_SIZE: int = 32
+    JOB_POLL_INTERVAL_S: float = 0.5
+    # Seconds after which items claimed by a dead worker are retried, and attempts per item
+    JOB_LEASE_S: float = 600.0
+    JOB_MAX_ATTEMPTS: int = 3
+    # Longest wait before claiming again while inference is saturated (the wait doubles up to it)
+    JOB_OVERLOAD_BACKOFF_MAX_S: float = 30.0
+    # Streaming uploads (/upload/images): images per decode/encode batch, largest
+    # accepted image, and zip archive bytes kept in memory before spooling to disk
+    UPLOAD_BATCH_SIZE: int = 32
+    UPLOAD_MAX_FILE_BYTES: int = 50 * 1024 * 1024
+    UPLOAD_SPOOL_MEMORY_BYTES: int = 8 * 1024 * 1024
+    # Streaming NDJSON text uploads (/upload/texts): texts per encode batch and longest line
+    UPLOAD_TEXT_BATCH_SIZE: int = 256
+    UPLOAD_MAX_LINE_BYTES: int = 1024 * 1024
     # Image path 
     IMAGE_SAVE_DIR: str = "./app/asset/"
+    # Image embeddings keyed by content hash
+    EMBEDDING_STORE_PATH: str = "./data/image_embeddings.db"
     # date 
     DATETIME_FORMAT: str = "%Y-%m-%d %H:%M:%S"
     DATE_FORMAT: str = "%Y-%m-%d"
@@ -27,10 +60,101 @@ class Configs(BaseSettings):
     IMAGE_ENCODER: str = "mobile_net_v3_small"
     # Text encoder name
     TEXT_ENCODER: str = "phobert-base"
+    # Text tower precision: "fp32" or "int8" (dynamic quantization, CPU only)
+    TEXT_PRECISION: str = "fp32"
+    # Inference backend: "torch" (eager) or "onnx" (ONNX Runtime, CPU)
+    INFERENCE_BACKEND: str = "torch"
+    ONNX_EXPORT_DIR: str = "./data/onnx"
+    # ONNX Runtime intra-op threads (0 keeps its default)
+    ORT_NUM_THREADS: int = 0
+    # Optimized eager image path (torch backend): Conv+BN folding and channels_last
+    INFERENCE_OPTIMIZE: bool = True
+    # torch.compile the image tower, padding batches to a fixed set of sizes
+    TORCH_COMPILE: bool = False
+    COMPILE_BATCH_BUCKETS: List[int] = [1, 2, 4, 8, 16, 32]
+    # Load and warm up the model in the background when the server starts
+    WARMUP_ON_STARTUP: bool = True
+    WARMUP_BATCH_SIZES: List[int] = [1, 8]
+    # Budget (seconds) for `import app.main`, checked by app.benchmarks.import_time
+    IMPORT_TIME_BUDGET_S: float = 3.0
+    # Threads decoding and transforming images before a batch is encoded
+    PREPROCESS_WORKERS: int = 4
+    # Maximum number of items per forward pass when encoding in batch
+    ENCODE_BATCH_SIZE: int = 32
+    # Micro-batching of concurrent search queries
+    BATCHING_ENABLED: bool = True
+    BATCH_MAX_SIZE: int = 32
+    BATCH_MAX_WAIT_MS: float = 2.0
+    # Text query embedding cache (size 0 disables it, TTL in seconds)
+    TEXT_CACHE_SIZE: int = 10000
+    TEXT_CACHE_TTL: Optional[float] = None
+    # Inference concurrency: model slots, torch thread pools (0 = cores / slots)
+    # and the bounded queue of callers waiting for a slot
+    INFERENCE_SLOTS: int = 2
+    TORCH_NUM_THREADS: int = 0
+    TORCH_INTEROP_THREADS: int = 1
+    INFERENCE_QUEUE_SIZE: int = 64
+    INFERENCE_QUEUE_TIMEOUT: float = 10.0
+    # Status code returned when inference is saturated (503 or 429)
+    INFERENCE_SATURATED_STATUS_CODE: int = 503
     # Weavite URL 
     WEAVIATE_URL: str = "http://localhost:8080"
+    # Weaviate gRPC port (REST host and port come from WEAVIATE_URL)
+    WEAVIATE_GRPC_PORT: int = 50051
+    # HTTP connection pool of the long-lived client (connections kept, maximum pool size)
+    WEAVIATE_POOL_CONNECTIONS: int = 20
+    WEAVIATE_POOL_MAXSIZE: int = 100
+    # Client timeouts in seconds: connection checks, queries, inserts
+    WEAVIATE_TIMEOUT_INIT: float = 2.0
+    WEAVIATE_TIMEOUT_QUERY: float = 30.0
+    WEAVIATE_TIMEOUT_INSERT: float = 90.0
+    # Seconds between liveness checks before the shared client is reused
+    WEAVIATE_HEALTH_CHECK_INTERVAL_S: float = 10.0
+    # Connection retries after a failure, with exponential backoff (base and cap in seconds)
+    WEAVIATE_CONNECT_RETRIES: int = 3
+    WEAVIATE_RECONNECT_BACKOFF_S: float = 0.5
+    WEAVIATE_RECONNECT_BACKOFF_MAX_S: float = 10.0
     # Weaviate class name
     WEAVIATE_COLLECTION_NAME: str = "MultimodalData"
+    # Vector index: "hnsw", "flat" (small collections) or "dynamic" (flat, then HNSW past the threshold)
+    WEAVIATE_VECTOR_INDEX: str = "hnsw"
+    WEAVIATE_DISTANCE: str = "cosine"
+    # HNSW search ef (-1 = dynamic), build-time efConstruction and maxConnections
+    WEAVIATE_HNSW_EF: int = -1
+    WEAVIATE_HNSW_EF_CONSTRUCTION: int = 128
+    WEAVIATE_HNSW_MAX_CONNECTIONS: int = 32
+    # Object count at which a dynamic index switches from flat to HNSW
+    WEAVIATE_DYNAMIC_THRESHOLD: int = 10000
+    # Vector compression: "none", "pq" (product quantization) or "bq" (binary quantization)
+    WEAVIATE_QUANTIZER: str = "none"
+    # PQ segments (must divide the vector dimension), centroids per segment, objects used for training
+    WEAVIATE_PQ_SEGMENTS: int = 64
+    WEAVIATE_PQ_CENTROIDS: int = 256
+    WEAVIATE_PQ_TRAINING_LIMIT: int = 100000
+    # BQ candidates rescored on the server with full vectors
+    WEAVIATE_BQ_RESCORE_LIMIT: int = 200
+    # Objects per insert_many request of the async repositories
+    WEAVIATE_ASYNC_INSERT_BATCH_SIZE: int = 200
+    # Default client-side rescore limit of read_by_vector (0 = no rescoring)
+    SEARCH_RESCORE_LIMIT: int = 0
+    # Batch search (/search/batch): most queries per request, and concurrent
+    # near_vector requests per batch on Weaviate
+    SEARCH_BATCH_MAX_QUERIES: int = 64
+    SEARCH_BATCH_CONCURRENCY: int = 16
+    # Vector backend: "weaviate" or "local" (in-process exact search, no Weaviate needed)
+    VECTOR_BACKEND: str = "weaviate"
+    # Directory of the local vector store (vectors file + append log)
+    LOCAL_STORE_DIR: str = "./data/local_store"
+    # Local index: "flat" (exact scan) or "ivfpq" (approximate, for large stores)
+    LOCAL_INDEX: str = "flat"
+    # Stores smaller than this are always searched exactly
+    LOCAL_INDEX_MIN_ROWS: int = 20000
+    # IVF lists (0 = 4 * sqrt(rows)), PQ subspaces, lists scanned per query
+    LOCAL_IVF_NLIST: int = 0
+    LOCAL_PQ_M: int = 32
+    LOCAL_IVF_NPROBE: int = 16
+    # limit * LOCAL_RERANK_FACTOR PQ candidates are re-scored exactly (0 disables)
+    LOCAL_RERANK_FACTOR: int = 10
 
 configs = Configs()
 
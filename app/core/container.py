@@ -1,7 +1,9 @@
 from dependency_injector import containers, providers
 from app.core.config import configs
 from app.core.database import WeaviateDatabase
+from app.utils.local_vector_store import LocalVectorStore
 from app.repository import *
+from app.repository.base_repository import TYPE_PROPERTY
 from app.services import *
 
 
@@ -13,22 +15,68 @@ class Container(containers.DeclarativeContainer):
             "app.api.endpoints.search",
             "app.api.endpoints.image",
             "app.api.endpoints.health",
+            "app.api.endpoints.jobs",
         ]
     )
 
     # Khởi tạo Database là một Singleton, đảm bảo chỉ có một instance trong toàn ứng dụng
     db = providers.Singleton(WeaviateDatabase)
 
+    # Vector store cục bộ (VECTOR_BACKEND = "local"), một instance cho cả ứng dụng
+    local_store = providers.Singleton(
+        LocalVectorStore,
+        path=configs.LOCAL_STORE_DIR,
+        type_property=TYPE_PROPERTY,
+        index=configs.LOCAL_INDEX,
+        index_min_rows=configs.LOCAL_INDEX_MIN_ROWS,
+        nlist=configs.LOCAL_IVF_NLIST,
+        pq_m=configs.LOCAL_PQ_M,
+        nprobe=configs.LOCAL_IVF_NPROBE,
+        rerank_factor=configs.LOCAL_RERANK_FACTOR,
+    )
+
     # # Định nghĩa các repository sử dụng Factory, mỗi lần gọi sẽ tạo instance mới
     # # session_factory được truyền từ db.provided.session là một phương thức được cung cấp bởi đối tượng Database
-    image_repository = providers.Factory(
-        ImageRepository, session_factory=db.provided.session
+    # Chọn repository theo VECTOR_BACKEND: Weaviate hoặc vector store cục bộ
+    image_repository = providers.Selector(
+        providers.Object(configs.VECTOR_BACKEND),
+        weaviate=providers.Factory(ImageRepository, session_factory=db.provided.session),
+        local=providers.Factory(LocalImageRepository, store=local_store),
+    )
+    text_repository = providers.Selector(
+        providers.Object(configs.VECTOR_BACKEND),
+        weaviate=providers.Factory(TextRepository, session_factory=db.provided.session),
+        local=providers.Factory(LocalTextRepository, store=local_store),
+    )
+
+    # Repository async cho các endpoint async: client Weaviate async,
+    # hoặc repository cục bộ chạy trong thread pool
+    async_image_repository = providers.Selector(
+        providers.Object(configs.VECTOR_BACKEND),
+        weaviate=providers.Factory(AsyncImageRepository, session_factory=db.provided.async_session),
+        local=providers.Factory(ThreadedAsyncRepository, repository=image_repository),
     )
-    text_repository = providers.Factory(
-        TextRepository, session_factory=db.provided.session
+    async_text_repository = providers.Selector(
+        providers.Object(configs.VECTOR_BACKEND),
+        weaviate=providers.Factory(AsyncTextRepository, session_factory=db.provided.async_session),
+        local=providers.Factory(ThreadedAsyncRepository, repository=text_repository),
     )
-    
 
     # # Định nghĩa các service sử dụng Factory, các service này phụ thuộc vào repository tương ứng
-    image_service = providers.Factory(ImageService, image_repository=image_repository)
-    text_service = providers.Factory(TextService, text_repository=text_repository)
+    image_service = providers.Factory(
+        ImageService, image_repository=image_repository, async_repository=async_image_repository
+    )
+    text_service = providers.Factory(
+        TextService, text_repository=text_repository, async_repository=async_text_repository
+    )
+
+    # Hàng đợi job ingestion: service để tạo/xem job, và worker nền (một instance mỗi process)
+    job_service = providers.Factory(JobService)
+    job_worker = providers.Singleton(
+        JobWorker,
+        image_service=image_service.provider,
+        text_service=text_service.provider,
+        workers=configs.JOB_WORKERS,
+        batch_size=configs.JOB_BATCH_SIZE,
+        poll_interval=configs.JOB_POLL_INTERVAL_S,
+    )
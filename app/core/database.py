@@ -1,41 +1,286 @@
-from contextlib import contextmanager
-from typing import Any, Generator
+import asyncio
+import os
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime
+from typing import Any, AsyncGenerator, Dict, Generator, Optional
+from urllib.parse import urlparse
 from app.core.config import configs
 import weaviate
+from weaviate.classes.init import AdditionalConfig, Timeout
+from weaviate.config import ConnectionConfig
+from weaviate.exceptions import (
+    WeaviateClosedClientError,
+    WeaviateConnectionError,
+    WeaviateGRPCUnavailableError,
+    WeaviateStartUpError,
+    WeaviateTimeoutError,
+)
+
+# Các lỗi cho thấy kết nối có vấn đề: lần dùng client tiếp theo sẽ kiểm tra lại kết nối ngay
+CONNECTION_ERRORS = (
+    WeaviateConnectionError,
+    WeaviateClosedClientError,
+    WeaviateGRPCUnavailableError,
+    WeaviateStartUpError,
+    WeaviateTimeoutError,
+    ConnectionError,
+)
+
+
+def _connection_kwargs() -> Dict[str, Any]:
+    """Tham số kết nối lấy từ Configs: host/port từ WEAVIATE_URL, pool HTTP và timeout."""
+    url = urlparse(configs.WEAVIATE_URL)
+    return dict(
+        host=url.hostname or "localhost",
+        port=url.port or 8080,
+        grpc_port=configs.WEAVIATE_GRPC_PORT,
+        additional_config=AdditionalConfig(
+            connection=ConnectionConfig(
+                session_pool_connections=configs.WEAVIATE_POOL_CONNECTIONS,
+                session_pool_maxsize=configs.WEAVIATE_POOL_MAXSIZE,
+            ),
+            timeout=Timeout(
+                init=configs.WEAVIATE_TIMEOUT_INIT,
+                query=configs.WEAVIATE_TIMEOUT_QUERY,
+                insert=configs.WEAVIATE_TIMEOUT_INSERT,
+            ),
+        ),
+    )
+
+
+def _backoff(attempt: int) -> float:
+    """Thời gian chờ trước lần kết nối lại thứ `attempt` (lũy thừa 2, có giới hạn và jitter)."""
+    delay = min(configs.WEAVIATE_RECONNECT_BACKOFF_MAX_S, configs.WEAVIATE_RECONNECT_BACKOFF_S * 2 ** (attempt - 1))
+    return delay * random.uniform(0.5, 1.0)
+
 
 class WeaviateDatabase:
+    """
+    Giữ một client Weaviate dùng lâu dài cho cả process (sync và async).
+
+    Client được tạo khi cần lần đầu và dùng lại cho mọi request, nên các
+    kết nối HTTP trong pool và kênh gRPC được tái sử dụng. Trước khi dùng,
+    client được kiểm tra (is_live) tối đa mỗi WEAVIATE_HEALTH_CHECK_INTERVAL_S
+    giây, hoặc ngay sau một lỗi kết nối; nếu không còn sống thì được thay bằng
+    client mới, kết nối lại với backoff. Số lần kết nối lại có trong stats().
+    """
     def __init__(self) -> None:
-        # Khởi tạo client kết nối đến Weaviate với URL được cung cấp
-        self._client = weaviate.connect_to_local()
-    
+        # Client được tạo khi cần lần đầu, để khởi động ứng dụng không phải chờ Weaviate
+        self._client = None
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        # Process sở hữu client: sau fork (app.serve) process con tạo client riêng
+        self._pid = os.getpid()
+        # Client async (weaviate v4) cho các endpoint async, kết nối trong event loop khi cần lần đầu
+        self._async_client = None
+        self._async_lock = None
+        self._async_checked_at = 0.0
+        # Số liệu kết nối cho /stats
+        self.reconnects = 0
+        self.connect_failures = 0
+        self.last_reconnect_at: Optional[float] = None
+
+    def _check_pid(self) -> None:
+        if self._pid != os.getpid():
+            # Socket của process cha không được dùng chung: bỏ client (không đóng)
+            self._client = None
+            self._async_client = None
+            self._async_lock = None
+            self._pid = os.getpid()
+
+    def _due_for_check(self, checked_at: float) -> bool:
+        return time.monotonic() - checked_at >= configs.WEAVIATE_HEALTH_CHECK_INTERVAL_S
+
+    def _record_reconnect(self) -> None:
+        self.reconnects += 1
+        self.last_reconnect_at = time.time()
+
+    @staticmethod
+    def _is_healthy(client: Any) -> bool:
+        try:
+            return client.is_connected() and client.is_live()
+        except Exception:
+            return False
+
+    def _connect(self) -> Any:
+        """Tạo client mới, thử lại với backoff khi không kết nối được."""
+        attempt = 0
+        while True:
+            try:
+                return weaviate.connect_to_local(**_connection_kwargs())
+            except CONNECTION_ERRORS as e:
+                self.connect_failures += 1
+                attempt += 1
+                if attempt > configs.WEAVIATE_CONNECT_RETRIES:
+                    raise
+                delay = _backoff(attempt)
+                print(f"Could not connect to Weaviate ({str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    @property
+    def client(self) -> Any:
+        """
+        Trả về client Weaviate dùng chung (thread-safe), kết nối lần đầu khi
+        được gọi và kết nối lại nếu lần kiểm tra sức khỏe thất bại.
+        """
+        self._check_pid()
+        client = self._client
+        if client is not None and not self._due_for_check(self._checked_at):
+            return client
+        with self._lock:
+            client = self._client
+            if client is not None and not self._due_for_check(self._checked_at):
+                return client
+            if client is not None and self._is_healthy(client):
+                self._checked_at = time.monotonic()
+                return client
+            if client is not None:
+                print("Weaviate client is not healthy, reconnecting...")
+            new_client = self._connect()
+            self._client = new_client
+            self._checked_at = time.monotonic()
+            if client is not None:
+                self._record_reconnect()
+                try:
+                    client.close()
+                except Exception:
+                    pass
+            return new_client
+
+    def mark_unhealthy(self) -> None:
+        """Buộc kiểm tra lại kết nối ở lần dùng client tiếp theo (sau một lỗi kết nối)."""
+        self._checked_at = 0.0
+        self._async_checked_at = 0.0
+
+    async def _connect_async(self) -> Any:
+        """Tạo và kết nối client async mới, thử lại với backoff."""
+        attempt = 0
+        while True:
+            client = weaviate.use_async_with_local(**_connection_kwargs())
+            try:
+                await client.connect()
+                return client
+            except CONNECTION_ERRORS as e:
+                self.connect_failures += 1
+                attempt += 1
+                if attempt > configs.WEAVIATE_CONNECT_RETRIES:
+                    raise
+                delay = _backoff(attempt)
+                print(f"Could not connect to Weaviate ({str(e)}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def get_async_client(self) -> Any:
+        """
+        Trả về client Weaviate async dùng chung, kết nối lần đầu khi được gọi
+        và kết nối lại nếu lần kiểm tra sức khỏe thất bại.
+        Các thao tác trên client này không chặn event loop.
+        """
+        self._check_pid()
+        client = self._async_client
+        if client is not None and not self._due_for_check(self._async_checked_at):
+            return client
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            client = self._async_client
+            if client is not None and not self._due_for_check(self._async_checked_at):
+                return client
+            if client is not None:
+                try:
+                    healthy = client.is_connected() and await client.is_live()
+                except Exception:
+                    healthy = False
+                if healthy:
+                    self._async_checked_at = time.monotonic()
+                    return client
+                print("Weaviate async client is not healthy, reconnecting...")
+            new_client = await self._connect_async()
+            self._async_client = new_client
+            self._async_checked_at = time.monotonic()
+            if client is not None:
+                self._record_reconnect()
+                try:
+                    await client.close()
+                except Exception:
+                    pass
+            return new_client
+
+    def close(self) -> None:
+        """Đóng client sync (khi ứng dụng tắt)."""
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+
+    async def close_async(self) -> None:
+        """Đóng client async (khi ứng dụng tắt)."""
+        if self._async_client is not None and self._pid == os.getpid():
+            await self._async_client.close()
+        self._async_client = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Trạng thái kết nối và số lần kết nối lại (không gửi request tới Weaviate)."""
+        return {
+            "connected": self._client is not None and self._client.is_connected(),
+            "async_connected": self._async_client is not None and self._async_client.is_connected(),
+            "reconnects": self.reconnects,
+            "connect_failures": self.connect_failures,
+            "last_reconnect_at": (
+                datetime.fromtimestamp(self.last_reconnect_at).isoformat() if self.last_reconnect_at else None
+            ),
+        }
+
     def create_schema(self) -> None:
         """
-        Tạo hoặc cập nhật schema cho một class trong Weaviate.
-        Ví dụ, bạn có thể định nghĩa schema cho một entity như 'User'
+        Tạo collection trong Weaviate với schema tường minh lấy từ Configs
+        (không vectorizer, thuộc tính type có index để lọc, cấu hình HNSW/flat/dynamic).
+        Nếu collection đã tồn tại: áp dụng các thay đổi có thể làm tại chỗ và
+        báo các khác biệt cần migrate (python -m app.core.schema --migrate).
         """
-        # Lưu ý: Bạn nên kiểm tra nếu class đã tồn tại để tránh lỗi
-        if self._client.collections.exists(configs.WEAVIATE_COLLECTION_NAME):
-            print(f"Schema for {configs.WEAVIATE_COLLECTION_NAME} already exists")
+        from app.core.schema import apply_in_place, create_collection, schema_drift
+
+        name = configs.WEAVIATE_COLLECTION_NAME
+        if not self.client.collections.exists(name):
+            create_collection(self.client, name)
+            print(f"Schema for {name} created")
             return
-        self._client.collections.create(configs.WEAVIATE_COLLECTION_NAME)
-        print(f"Schema for {configs.WEAVIATE_COLLECTION_NAME} created")
+        in_place, rebuild = schema_drift(self.client, name)
+        if in_place:
+            apply_in_place(self.client, name)
+            print(f"Schema for {name} updated: {', '.join(in_place)}")
+        if rebuild:
+            print(f"Schema for {name} differs from Configs and needs a migration "
+                  f"(python -m app.core.schema --migrate): {'; '.join(rebuild)}")
+        if not in_place and not rebuild:
+            print(f"Schema for {name} already exists")
     
     @contextmanager
     def session(self) -> Generator[Any, None, None]:
         """
-        Cung cấp một context manager để lấy client Weaviate.
+        Cung cấp một context manager để lấy client Weaviate dùng chung.
         Vì Weaviate hoạt động theo giao thức HTTP, không có khái niệm session hay giao dịch 
         nên chúng ta chỉ trả về client để thực hiện các thao tác CRUD.
+        Client không bị đóng khi ra khỏi context; lỗi kết nối khiến lần dùng
+        sau kiểm tra lại (và kết nối lại nếu cần).
         """
         try:
-            if hasattr(self._client, 'is_connected') and not self._client.is_connected():
-                print("Connecting to Weaviate...")
-                self._client.connect()
-            yield self._client
-        except Exception as e:
+            yield self.client
+        except CONNECTION_ERRORS:
             # Không có rollback cho Weaviate vì các thao tác đều được gửi qua HTTP
-            raise e
-        finally:
-            # Không cần đóng kết nối vì weaviate-client sử dụng HTTP, nên không có thao tác clean-up đặc biệt
-            # self._client.close()
-            pass
\ No newline at end of file
+            self.mark_unhealthy()
+            raise
+
+    @asynccontextmanager
+    async def async_session(self) -> AsyncGenerator[Any, None]:
+        """
+        Phiên bản async của session(): cung cấp client Weaviate async
+        cho các repository async (AsyncImageRepository, AsyncTextRepository).
+        """
+        try:
+            yield await self.get_async_client()
+        except CONNECTION_ERRORS:
+            self.mark_unhealthy()
+            raise
@@ -5,9 +5,6 @@ import json
 from functools import wraps
 
 from dependency_injector.wiring import inject as di_inject
-from loguru import logger
-
-from app.services.weavite__service import BaseService
 
 
 def inject(func):
@@ -15,27 +12,15 @@ def inject(func):
     @wraps(func)
     async def async_wrapper(*args, **kwargs):
         print(f"Injecting dependencies into {func.__name__} (async)")
-        result = await func(*args, **kwargs)
-        injected_services = [arg for arg in kwargs.values() if isinstance(arg, BaseService)]
-        if len(injected_services) > 0:
-            try:
-                injected_services[-1].close_scoped_session()
-            except Exception as e:
-                logger.error(e)
-        return result
+        # The Weaviate clients are long-lived and shared (WeaviateDatabase),
+        # so there is no per-request session to close afterwards
+        return await func(*args, **kwargs)
 
     @di_inject
     @wraps(func)
     def sync_wrapper(*args, **kwargs):
         print(f"Injecting dependencies into {func.__name__} (sync)")
-        result = func(*args, **kwargs)
-        injected_services = [arg for arg in kwargs.values() if isinstance(arg, BaseService)]
-        if len(injected_services) > 0:
-            try:
-                injected_services[-1].close_scoped_session()
-            except Exception as e:
-                logger.error(e)
-        return result
+        return func(*args, **kwargs)
 
     if asyncio.iscoroutinefunction(func):
         return async_wrapper
@@ -0,0 +1,318 @@
+"""
+Explicit schema of the Weaviate collection, built from Configs, and a
+migration path for collections created with an older (or auto) schema.
+
+Usage:
+    python -m app.core.schema             # show how the live collection differs from Configs
+    python -m app.core.schema --apply     # apply the changes possible in place
+    python -m app.core.schema --migrate   # rebuild the collection, copying objects and vectors
+
+Changes possible in place are new properties, the mutable vector index
+settings (ef, dynamic threshold) and switching on PQ compression.
+Everything else (vectorizer, index type, distance, efConstruction,
+maxConnections, BQ, filterable flags, timestamp indexing, property types)
+is fixed at creation and needs --migrate.
+"""
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+from weaviate.classes.config import Configure, DataType, Property, Reconfigure, Tokenization, VectorDistances
+
+from app.core.config import configs
+from app.repository.base_repository import METADATA_JSON_PROPERTY, TYPE_PROPERTY, metadata_properties
+
+
+def collection_properties() -> List[Property]:
+    """Properties of the collection (see image_object / text_object)."""
+    return [
+        # Filtered on by every near_vector search: exact-match, not full-text
+        Property(name=TYPE_PROPERTY, data_type=DataType.TEXT, tokenization=Tokenization.FIELD,
+                 index_filterable=True, index_searchable=False),
+        Property(name="image_path", data_type=DataType.TEXT, tokenization=Tokenization.FIELD,
+                 index_filterable=False, index_searchable=False),
+        Property(name="content_hash", data_type=DataType.TEXT, tokenization=Tokenization.FIELD,
+                 index_filterable=True, index_searchable=False),
+        Property(name="text", data_type=DataType.TEXT, tokenization=Tokenization.WORD,
+                 index_filterable=True, index_searchable=True),
+        # Only the keys set by the app; any other user metadata key would need auto-schema
+        Property(name="metadata", data_type=DataType.OBJECT, nested_properties=[
+            Property(name="created_at", data_type=DataType.TEXT, tokenization=Tokenization.FIELD),
+            Property(name="filename", data_type=DataType.TEXT, tokenization=Tokenization.FIELD),
+        ]),
+        # The whole free-form metadata, as JSON (see metadata_properties)
+        Property(name=METADATA_JSON_PROPERTY, data_type=DataType.TEXT, tokenization=Tokenization.FIELD,
+                 index_filterable=False, index_searchable=False),
+    ]
+
+
+def quantizer_config(quantizer: Optional[str] = None, training_limit: Optional[int] = None):
+    """
+    Vector compression from configs.WEAVIATE_QUANTIZER: "pq" keeps
+    WEAVIATE_PQ_SEGMENTS one-byte codes per vector in memory (trained on the
+    first WEAVIATE_PQ_TRAINING_LIMIT objects), "bq" one bit per dimension;
+    both rescore their candidates with the full vectors kept on disk.
+
+    Args:
+        quantizer: Overrides configs.WEAVIATE_QUANTIZER
+        training_limit: Overrides configs.WEAVIATE_PQ_TRAINING_LIMIT
+    """
+    quantizer = quantizer or configs.WEAVIATE_QUANTIZER
+    if quantizer == "none":
+        return None
+    if quantizer == "pq":
+        return Configure.VectorIndex.Quantizer.pq(
+            segments=configs.WEAVIATE_PQ_SEGMENTS,
+            centroids=configs.WEAVIATE_PQ_CENTROIDS,
+            training_limit=training_limit or configs.WEAVIATE_PQ_TRAINING_LIMIT,
+        )
+    if quantizer == "bq":
+        return Configure.VectorIndex.Quantizer.bq(rescore_limit=configs.WEAVIATE_BQ_RESCORE_LIMIT)
+    raise ValueError(f"Unknown WEAVIATE_QUANTIZER: {quantizer}")
+
+
+def _hnsw_config(distance: VectorDistances, quantizer=None):
+    return Configure.VectorIndex.hnsw(
+        distance_metric=distance,
+        ef=configs.WEAVIATE_HNSW_EF,
+        ef_construction=configs.WEAVIATE_HNSW_EF_CONSTRUCTION,
+        max_connections=configs.WEAVIATE_HNSW_MAX_CONNECTIONS,
+        quantizer=quantizer,
+    )
+
+
+def vector_index_config(quantizer: Optional[str] = None, training_limit: Optional[int] = None):
+    """
+    Vector index from configs.WEAVIATE_VECTOR_INDEX: "hnsw", "flat" (brute
+    force, best for small collections) or "dynamic" (flat until
+    WEAVIATE_DYNAMIC_THRESHOLD objects, then HNSW; needs ASYNC_INDEXING on
+    the server), compressed as set by quantizer_config(). The flat index
+    only supports BQ.
+    """
+    distance = VectorDistances(configs.WEAVIATE_DISTANCE)
+    index_type = configs.WEAVIATE_VECTOR_INDEX
+    quantizer = quantizer or configs.WEAVIATE_QUANTIZER
+    compression = quantizer_config(quantizer, training_limit)
+    if index_type == "hnsw":
+        return _hnsw_config(distance, compression)
+    if index_type == "flat":
+        if quantizer == "pq":
+            raise ValueError("The flat vector index only supports BQ compression")
+        return Configure.VectorIndex.flat(distance_metric=distance, quantizer=compression)
+    if index_type == "dynamic":
+        return Configure.VectorIndex.dynamic(
+            distance_metric=distance,
+            threshold=configs.WEAVIATE_DYNAMIC_THRESHOLD,
+            hnsw=_hnsw_config(distance, compression),
+            flat=Configure.VectorIndex.flat(
+                distance_metric=distance, quantizer=compression if quantizer == "bq" else None,
+            ),
+        )
+    raise ValueError(f"Unknown WEAVIATE_VECTOR_INDEX: {index_type}")
+
+
+def create_collection(client: Any, name: str, quantizer: Optional[str] = None,
+                      training_limit: Optional[int] = None) -> None:
+    """
+    Create the collection with the explicit schema (vectors are always supplied by the app).
+
+    Args:
+        client: Connected Weaviate client
+        name: Collection name
+        quantizer: Overrides configs.WEAVIATE_QUANTIZER
+        training_limit: Overrides configs.WEAVIATE_PQ_TRAINING_LIMIT
+    """
+    client.collections.create(
+        name,
+        vectorizer_config=Configure.Vectorizer.none(),
+        vector_index_config=vector_index_config(quantizer, training_limit),
+        # Creation timestamps are filtered and sorted on by the paginated listing
+        inverted_index_config=Configure.inverted_index(index_timestamps=True),
+        properties=collection_properties(),
+    )
+
+
+def _value(setting: Any) -> Any:
+    return getattr(setting, "value", setting)
+
+
+def schema_drift(client: Any, name: str) -> Tuple[List[str], List[str]]:
+    """
+    Compare the live collection with the configured schema.
+
+    Returns:
+        (in_place, rebuild): differences that apply_in_place() can fix, and
+        differences that need migrate_collection()
+    """
+    config = client.collections.get(name).config.get()
+    in_place, rebuild = [], []
+
+    if config.vectorizer_config is not None or _value(config.vectorizer) not in (None, "none"):
+        rebuild.append(f"vectorizer is {_value(config.vectorizer)}, expected none")
+    if not config.inverted_index_config.index_timestamps:
+        rebuild.append("creation timestamps are not indexed")
+
+    existing = {prop.name: prop for prop in config.properties}
+    for prop in collection_properties():
+        current = existing.get(prop.name)
+        if current is None:
+            in_place.append(f"add property {prop.name} ({_value(prop.dataType)})")
+        elif _value(current.data_type) != _value(prop.dataType):
+            rebuild.append(f"property {prop.name} is {_value(current.data_type)}, expected {_value(prop.dataType)}")
+        elif prop.name == TYPE_PROPERTY and not current.index_filterable:
+            rebuild.append(f"property {prop.name} is not filterable")
+
+    index_type = _value(config.vector_index_type)
+    if index_type != configs.WEAVIATE_VECTOR_INDEX:
+        rebuild.append(f"vector index is {index_type}, expected {configs.WEAVIATE_VECTOR_INDEX}")
+        return in_place, rebuild
+    index = config.vector_index_config
+    if _value(index.distance_metric) != configs.WEAVIATE_DISTANCE:
+        rebuild.append(f"distance is {_value(index.distance_metric)}, expected {configs.WEAVIATE_DISTANCE}")
+    if index_type == "dynamic":
+        if index.threshold != configs.WEAVIATE_DYNAMIC_THRESHOLD:
+            in_place.append(f"dynamic threshold {index.threshold} -> {configs.WEAVIATE_DYNAMIC_THRESHOLD}")
+        index = index.hnsw
+    current_quantizer = _quantizer_name(index.quantizer)
+    if current_quantizer != configs.WEAVIATE_QUANTIZER:
+        if current_quantizer == "none" and configs.WEAVIATE_QUANTIZER == "pq" and index_type != "flat":
+            in_place.append("enable PQ compression")
+        else:
+            rebuild.append(f"compression is {current_quantizer}, expected {configs.WEAVIATE_QUANTIZER}")
+    if index_type in ("hnsw", "dynamic"):
+        if index.ef != configs.WEAVIATE_HNSW_EF:
+            in_place.append(f"ef {index.ef} -> {configs.WEAVIATE_HNSW_EF}")
+        if index.ef_construction != configs.WEAVIATE_HNSW_EF_CONSTRUCTION:
+            rebuild.append(f"efConstruction is {index.ef_construction}, expected {configs.WEAVIATE_HNSW_EF_CONSTRUCTION}")
+        if index.max_connections != configs.WEAVIATE_HNSW_MAX_CONNECTIONS:
+            rebuild.append(f"maxConnections is {index.max_connections}, expected {configs.WEAVIATE_HNSW_MAX_CONNECTIONS}")
+    return in_place, rebuild
+
+
+def _quantizer_name(quantizer: Any) -> str:
+    if quantizer is None:
+        return "none"
+    # _PQConfig, _BQConfig, _SQConfig
+    return type(quantizer).__name__.strip("_").lower().replace("config", "")
+
+
+def apply_in_place(client: Any, name: str) -> None:
+    """Add missing properties and update the mutable vector index settings."""
+    collection = client.collections.get(name)
+    config = collection.config.get()
+    existing = {prop.name for prop in config.properties}
+    for prop in collection_properties():
+        if prop.name not in existing:
+            collection.config.add_property(prop)
+            print(f"Added property {prop.name}")
+
+    index_type = _value(config.vector_index_type)
+    index = config.vector_index_config.hnsw if index_type == "dynamic" else config.vector_index_config
+    quantizer = None
+    if index_type != "flat" and index.quantizer is None and configs.WEAVIATE_QUANTIZER == "pq":
+        # PQ is the only compression that can be switched on after creation
+        quantizer = Reconfigure.VectorIndex.Quantizer.pq(
+            segments=configs.WEAVIATE_PQ_SEGMENTS,
+            centroids=configs.WEAVIATE_PQ_CENTROIDS,
+            training_limit=configs.WEAVIATE_PQ_TRAINING_LIMIT,
+        )
+    hnsw = Reconfigure.VectorIndex.hnsw(ef=configs.WEAVIATE_HNSW_EF, quantizer=quantizer)
+    if index_type == "hnsw":
+        collection.config.update(vector_index_config=hnsw)
+    elif index_type == "dynamic":
+        collection.config.update(vector_index_config=Reconfigure.VectorIndex.dynamic(
+            threshold=configs.WEAVIATE_DYNAMIC_THRESHOLD, hnsw=hnsw,
+        ))
+
+
+def _count(collection: Any) -> int:
+    return collection.aggregate.over_all(total_count=True).total_count
+
+
+def _migrated_properties(properties: Dict[str, Any]) -> Dict[str, Any]:
+    """Fold the free-form metadata of objects stored before METADATA_JSON_PROPERTY into it."""
+    if METADATA_JSON_PROPERTY in properties or not isinstance(properties.get("metadata"), dict):
+        return properties
+    return {**properties, **metadata_properties(properties["metadata"])}
+
+
+def _copy(source: Any, target: Any, batch_size: int) -> int:
+    """Copy every object (properties, vector and UUID) from source to target."""
+    copied = 0
+    with target.batch.fixed_size(batch_size=batch_size) as batch:
+        for obj in source.iterator(include_vector=True):
+            vector = obj.vector.get("default") if isinstance(obj.vector, dict) else obj.vector
+            batch.add_object(properties=_migrated_properties(obj.properties), vector=vector, uuid=obj.uuid)
+            copied += 1
+    failed = target.batch.failed_objects
+    if failed:
+        raise RuntimeError(f"{len(failed)} objects failed to copy, first error: {failed[0].message}")
+    return copied
+
+
+def migrate_collection(client: Any, name: str, batch_size: int = 200) -> None:
+    """
+    Rebuild the collection with the configured schema.
+
+    Objects (with their vectors and UUIDs) are copied into a staging
+    collection, the old collection is recreated with the new schema and
+    the objects are copied back. The staging collection is deleted only
+    after the copy back is verified, so an interrupted migration can be
+    recovered from it.
+    """
+    staging_name = f"{name}_migration"
+    if client.collections.exists(staging_name):
+        raise RuntimeError(f"{staging_name} already exists (interrupted migration?); inspect it before retrying")
+    source = client.collections.get(name)
+    total = _count(source)
+
+    create_collection(client, staging_name)
+    staging = client.collections.get(staging_name)
+    copied = _copy(source, staging, batch_size)
+    if _count(staging) != total:
+        raise RuntimeError(f"Copied {_count(staging)} of {total} objects into {staging_name}; {name} left untouched")
+    print(f"Copied {copied} objects into {staging_name}")
+
+    client.collections.delete(name)
+    create_collection(client, name)
+    target = client.collections.get(name)
+    _copy(staging, target, batch_size)
+    if _count(target) != total:
+        raise RuntimeError(f"Copied {_count(target)} of {total} objects back into {name}; {staging_name} kept")
+    client.collections.delete(staging_name)
+    print(f"Migrated {name}: {total} objects")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apply", action="store_true", help="Apply the changes possible in place")
+    parser.add_argument("--migrate", action="store_true", help="Rebuild the collection with the configured schema")
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    from app.core.database import WeaviateDatabase
+
+    db = WeaviateDatabase()
+    client = db.client
+    name = configs.WEAVIATE_COLLECTION_NAME
+    try:
+        if not client.collections.exists(name):
+            create_collection(client, name)
+            print(f"Created {name}")
+            return
+        in_place, rebuild = schema_drift(client, name)
+        for change in in_place:
+            print(f"in place: {change}")
+        for change in rebuild:
+            print(f"needs migration: {change}")
+        if not in_place and not rebuild:
+            print(f"{name} matches the configured schema")
+        if args.migrate and rebuild:
+            migrate_collection(client, name, args.batch_size)
+        elif (args.apply or args.migrate) and in_place:
+            apply_in_place(client, name)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
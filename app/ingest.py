@@ -0,0 +1,464 @@
+"""
+Offline bulk ingestion of an image directory tree and/or a captions JSONL.
+
+Items flow through a pipeline of bounded queues, so every stage runs
+concurrently and memory stays flat whatever the input size:
+
+    read  → decode (N threads) → encode (batched forward pass) → upsert (batched)
+
+- read: walks the directory (sorted, so the order is stable across runs)
+  or reads the JSONL line by line
+- decode: images are read, hashed, and decoded at reduced resolution and
+  transformed into model tensors; images whose content hash is already in
+  the image embedding store skip decoding and encoding entirely. Caption
+  lines are parsed ({"text": ..., "metadata": {...}})
+- encode: one forward pass per ENCODE_BATCH_SIZE items
+- upsert: objects are written to the configured backend (VECTOR_BACKEND)
+  in batches of --upsert-batch
+
+Progress is checkpointed after every upsert batch as the number of leading
+items fully written per source, so an interrupted run resumes where it
+stopped (python -m app.ingest again with the same arguments). Object UUIDs
+are deterministic, so items written after the checkpoint are simply
+overwritten on resume. Items/sec and busy time per stage are printed every
+--report-interval seconds and at the end.
+
+Usage:
+    python -m app.ingest [--images DIR] [--captions FILE.jsonl] [--decode-workers 8]
+        [--encode-batch 64] [--upsert-batch 1000] [--copy] [--restart]
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import configs
+from app.utils.preprocess import IMAGE_EXTENSIONS
+
+# Marks the end of a stage's input
+_DONE = object()
+
+
+class StageStats:
+    """Items processed and time spent working (not waiting) by one stage."""
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.items = 0
+        self.failed = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, items: int, seconds: float, failed: int = 0) -> None:
+        with self._lock:
+            self.items += items
+            self.failed += failed
+            self.busy += seconds
+
+
+class Checkpoint:
+    """
+    Number of leading items of each source fully written, saved as JSON.
+
+    Items finish out of order (parallel decoding), so completed indices
+    above the watermark are kept in memory until the gap before them fills.
+    """
+    def __init__(self, path: str, restart: bool = False) -> None:
+        self.path = path
+        self.state: Dict[str, int] = {}
+        if not restart and os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
+        self._pending: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    def start(self, key: str) -> int:
+        """Index of the first item of `key` still to process."""
+        return self.state.get(key, 0)
+
+    def mark_done(self, key: str, indices: List[int]) -> None:
+        """Record items as written and persist the advanced watermark."""
+        with self._lock:
+            pending = self._pending.setdefault(key, set())
+            pending.update(indices)
+            watermark = self.state.get(key, 0)
+            while watermark in pending:
+                pending.remove(watermark)
+                watermark += 1
+            self.state[key] = watermark
+            self._save()
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+
+class Pipeline:
+    """
+    Bounded-queue pipeline: read → decode (thread pool) → encode → upsert.
+
+    A failure in the encode or upsert stage stops the pipeline and is
+    re-raised by run(); items that fail to decode are counted, reported and
+    skipped.
+    """
+    def __init__(self, name: str, source: Iterator[Tuple[int, Any]],
+                 decode: Callable[[Any], Optional[Dict[str, Any]]],
+                 encode: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+                 upsert: Callable[[List[Dict[str, Any]]], None],
+                 on_written: Callable[[List[int]], None],
+                 decode_workers: int, encode_batch: int, upsert_batch: int, queue_size: int,
+                 report_interval: float = 10.0) -> None:
+        """
+        Args:
+            name: Name shown in reports
+            source: Iterator of (index, raw item)
+            decode: Raw item → decoded item (None to skip it; raising marks it failed)
+            encode: Decoded items → records to upsert (same order)
+            upsert: Writes a list of records
+            on_written: Called with the indices of every item fully handled (written, skipped or failed)
+            decode_workers: Number of decode threads
+            encode_batch: Items per encode call
+            upsert_batch: Records per upsert call
+            queue_size: Raw items read ahead of the decode stage
+            report_interval: Seconds between progress reports (0 disables them)
+        """
+        self.name = name
+        self.source = source
+        self.decode = decode
+        self.encode = encode
+        self.upsert = upsert
+        self.on_written = on_written
+        self.decode_workers = max(1, decode_workers)
+        self.encode_batch = max(1, encode_batch)
+        self.upsert_batch = max(1, upsert_batch)
+        self.report_interval = report_interval
+        # Raw items are small, decoded ones (image tensors) are not: only
+        # two encode batches of them are held at any time
+        self.read_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.decoded_queue: "queue.Queue" = queue.Queue(maxsize=2 * self.encode_batch)
+        self.encoded_queue: "queue.Queue" = queue.Queue(maxsize=2)
+        self.stats = [StageStats(stage) for stage in ("read", "decode", "encode", "upsert")]
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def _put(self, q: "queue.Queue", item: Any) -> bool:
+        # Give up when another stage failed, instead of blocking on a full queue forever
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: "queue.Queue", timeout: Optional[float] = None) -> Any:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._stop.is_set():
+            wait = 0.2 if deadline is None else min(0.2, deadline - time.monotonic())
+            if wait <= 0:
+                raise queue.Empty
+            try:
+                return q.get(timeout=wait)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, error: BaseException) -> None:
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    def _read(self) -> None:
+        stats = self.stats[0]
+        try:
+            while True:
+                start = time.perf_counter()
+                item = next(self.source, _DONE)
+                stats.record(0 if item is _DONE else 1, time.perf_counter() - start)
+                if item is _DONE or not self._put(self.read_queue, item):
+                    break
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            for _ in range(self.decode_workers):
+                self._put(self.read_queue, _DONE)
+
+    def _decode(self) -> None:
+        stats = self.stats[1]
+        while True:
+            item = self._get(self.read_queue)
+            if item is _DONE:
+                break
+            index, raw = item
+            start = time.perf_counter()
+            try:
+                decoded = self.decode(raw)
+                failed = 0
+            except Exception as e:
+                print(f"[{self.name}] Skipping item {index} ({str(raw).strip()[:200]}): {str(e)}")
+                decoded, failed = None, 1
+            stats.record(1, time.perf_counter() - start, failed)
+            if not self._put(self.decoded_queue, (index, decoded)):
+                break
+        self._put(self.decoded_queue, _DONE)
+
+    def _encode(self) -> None:
+        stats = self.stats[2]
+        running = self.decode_workers
+        try:
+            while running:
+                # Block for the first item, then fill the batch with whatever is ready
+                batch = []
+                while running and len(batch) < self.encode_batch:
+                    try:
+                        item = self._get(self.decoded_queue, timeout=None if not batch else 0.05)
+                    except queue.Empty:
+                        break
+                    if item is _DONE:
+                        if self._stop.is_set():
+                            return
+                        running -= 1
+                        continue
+                    batch.append(item)
+                if not batch:
+                    continue
+                indices = [index for index, _ in batch]
+                items = [decoded for _, decoded in batch if decoded is not None]
+                start = time.perf_counter()
+                records = self.encode(items) if items else []
+                stats.record(len(items), time.perf_counter() - start)
+                if not self._put(self.encoded_queue, (indices, records)):
+                    return
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._put(self.encoded_queue, _DONE)
+
+    def _flush(self, indices: List[int], records: List[Dict[str, Any]]) -> None:
+        start = time.perf_counter()
+        if records:
+            self.upsert(records)
+        self.stats[3].record(len(records), time.perf_counter() - start)
+        self.on_written(indices)
+
+    def _upsert(self) -> None:
+        indices, records = [], []
+        try:
+            while True:
+                item = self._get(self.encoded_queue)
+                if item is _DONE:
+                    break
+                indices.extend(item[0])
+                records.extend(item[1])
+                if len(records) >= self.upsert_batch:
+                    self._flush(indices, records)
+                    indices, records = [], []
+            if indices and not self._stop.is_set():
+                self._flush(indices, records)
+        except BaseException as e:
+            self._fail(e)
+
+    def report(self, elapsed: float, final: bool = False) -> None:
+        """Print items, items/sec and busy share of every stage."""
+        label = "done" if final else "progress"
+        parts = []
+        for stage in self.stats:
+            rate = stage.items / elapsed if elapsed > 0 else 0.0
+            busy = stage.busy / elapsed * 100 if elapsed > 0 else 0.0
+            failed = f", {stage.failed} failed" if stage.failed else ""
+            parts.append(f"{stage.name} {stage.items} ({rate:.1f}/s, busy {busy:.0f}%{failed})")
+        print(f"[{self.name}] {label} after {elapsed:.0f}s: " + " | ".join(parts))
+
+    def run(self) -> None:
+        """Run all stages to completion, re-raising the first stage failure."""
+        threads = [threading.Thread(target=self._read, name=f"{self.name}-read", daemon=True)]
+        threads += [
+            threading.Thread(target=self._decode, name=f"{self.name}-decode-{i}", daemon=True)
+            for i in range(self.decode_workers)
+        ]
+        threads += [
+            threading.Thread(target=self._encode, name=f"{self.name}-encode", daemon=True),
+            threading.Thread(target=self._upsert, name=f"{self.name}-upsert", daemon=True),
+        ]
+        started_at = time.monotonic()
+        for thread in threads:
+            thread.start()
+        try:
+            while threads[-1].is_alive():
+                threads[-1].join(timeout=self.report_interval or None)
+                if threads[-1].is_alive() and self.report_interval:
+                    self.report(time.monotonic() - started_at)
+        except KeyboardInterrupt:
+            self._fail(KeyboardInterrupt())
+        self._stop.set()
+        for thread in threads:
+            thread.join()
+        self.report(time.monotonic() - started_at, final=True)
+        if self._error is not None:
+            raise self._error
+
+
+def iter_image_files(root: str, start: int = 0) -> Iterator[Tuple[int, str]]:
+    """Image files under root in a stable (sorted) order, as (index, path), from index `start`."""
+    index = 0
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            if index >= start:
+                yield index, os.path.join(directory, name)
+            index += 1
+
+
+def iter_lines(path: str, start: int = 0) -> Iterator[Tuple[int, str]]:
+    """Lines of a text file as (index, line), from line `start`."""
+    with open(path, encoding="utf-8") as f:
+        for index, line in enumerate(f):
+            if index >= start:
+                yield index, line
+
+
+def ingest_images(root: str, repository, checkpoint: Checkpoint, args) -> None:
+    """Run the image pipeline over a directory tree."""
+    from app.utils.embedding_store import content_hash, image_embedding_store
+    from app.utils.save_image import save_image_content
+    from app.utils.vectorize import resources
+
+    import torch
+
+    resources.initialize()
+    model_version = resources.model_version
+    key = f"images:{os.path.abspath(root)}"
+    start = checkpoint.start(key)
+    if start:
+        print(f"Resuming {root} after {start} images")
+
+    def decode(path: str) -> Dict[str, Any]:
+        with open(path, "rb") as f:
+            content = f.read()
+        h = content_hash(content)
+        item = {"hash": h, "filename": os.path.basename(path), "vector": None, "tensor": None}
+        if args.copy:
+            stored_filename = f"{h}{os.path.splitext(path)[1].lower()}"
+            item["image_path"] = save_image_content([content], [stored_filename])[0]
+        else:
+            item["image_path"] = os.path.abspath(path)
+        stored = image_embedding_store.get_many([h], model_version)
+        if h in stored:
+            item["vector"] = stored[h]
+        else:
+            item["tensor"] = resources.preprocessor.preprocess_one(content)
+        return item
+
+    def encode(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        to_encode = [item for item in items if item["vector"] is None]
+        if to_encode:
+            vectors = resources.encode_image_tensors(torch.stack([item["tensor"] for item in to_encode]))["vectors"]
+            for item, vector in zip(to_encode, vectors):
+                item["vector"] = vector
+                item["tensor"] = None
+            image_embedding_store.put_many(((item["hash"], item["vector"]) for item in to_encode), model_version)
+        created_at = datetime.now().strftime(configs.DATETIME_FORMAT)
+        return [
+            {
+                "image_path": item["image_path"],
+                "content_hash": item["hash"],
+                "vector": item["vector"],
+                "metadata": {"filename": item["filename"], "created_at": created_at},
+            }
+            for item in items
+        ]
+
+    Pipeline(
+        "images", iter_image_files(root, start), decode, encode, repository.update_image_data,
+        lambda indices: checkpoint.mark_done(key, indices),
+        decode_workers=args.decode_workers, encode_batch=args.encode_batch,
+        upsert_batch=args.upsert_batch, queue_size=args.queue_size, report_interval=args.report_interval,
+    ).run()
+
+
+def ingest_captions(path: str, repository, checkpoint: Checkpoint, args) -> None:
+    """Run the text pipeline over a captions JSONL ({"text": ..., "metadata": {...}} per line)."""
+    from app.utils.vectorize import resources
+
+    resources.initialize()
+    key = f"captions:{os.path.abspath(path)}"
+    start = checkpoint.start(key)
+    if start:
+        print(f"Resuming {path} after {start} lines")
+
+    def decode(line: str) -> Optional[Dict[str, Any]]:
+        if not line.strip():
+            return None
+        record = json.loads(line)
+        text = record[args.text_field]
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError(f"missing or empty {args.text_field!r}")
+        metadata = record.get("metadata") or {}
+        if not isinstance(metadata, dict):
+            raise ValueError("metadata must be a JSON object")
+        return {"text": text, "metadata": metadata}
+
+    def encode(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        vectors = resources.encode_texts([item["text"] for item in items], batch_size=len(items))["vectors"]
+        created_at = datetime.now().strftime(configs.DATETIME_FORMAT)
+        for item, vector in zip(items, vectors):
+            item["vector"] = vector
+            item["metadata"].setdefault("created_at", created_at)
+        return items
+
+    Pipeline(
+        "captions", iter_lines(path, start), decode, encode, repository.update_text_data,
+        lambda indices: checkpoint.mark_done(key, indices),
+        # Parsing JSON is cheap; more threads would only contend for the GIL
+        decode_workers=1, encode_batch=args.encode_batch,
+        upsert_batch=args.upsert_batch, queue_size=args.queue_size, report_interval=args.report_interval,
+    ).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="Directory tree of images to ingest")
+    parser.add_argument("--captions", help="JSONL file of captions to ingest")
+    parser.add_argument("--text-field", default="text", help="JSONL field holding the caption")
+    parser.add_argument("--decode-workers", type=int, default=configs.INGEST_DECODE_WORKERS or os.cpu_count() or 4)
+    parser.add_argument("--encode-batch", type=int, default=configs.ENCODE_BATCH_SIZE)
+    parser.add_argument("--upsert-batch", type=int, default=configs.INGEST_UPSERT_BATCH_SIZE)
+    parser.add_argument("--queue-size", type=int, default=configs.INGEST_QUEUE_SIZE)
+    parser.add_argument("--copy", action="store_true",
+                        help="Copy images into IMAGE_SAVE_DIR under content-addressed names "
+                             "(default: store the source paths)")
+    parser.add_argument("--checkpoint", default=configs.INGEST_CHECKPOINT_PATH)
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    parser.add_argument("--report-interval", type=float, default=10.0)
+    args = parser.parse_args()
+    if not args.images and not args.captions:
+        parser.error("nothing to ingest: pass --images and/or --captions")
+
+    from app.core.container import Container
+
+    container = Container()
+    if configs.VECTOR_BACKEND == "weaviate":
+        container.db().create_schema()
+    checkpoint = Checkpoint(args.checkpoint, restart=args.restart)
+    try:
+        if args.images:
+            ingest_images(args.images, container.image_repository(), checkpoint, args)
+        if args.captions:
+            ingest_captions(args.captions, container.text_repository(), checkpoint, args)
+    finally:
+        if configs.VECTOR_BACKEND == "weaviate":
+            container.db().close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
-from fastapi import FastAPI
+import threading
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from starlette.middleware.cors import CORSMiddleware
 from app.core.config import configs
 from app.core.container import Container
 from app.utils.class_object import singleton
 from app.api.routes import api_router
+from app.utils.vectorize import resources
+from app.utils.inference_executor import InferenceSaturatedError
 # from app.core.middleware import request_debug_middleware
 
 
@@ -18,10 +22,9 @@ class AppCreator:
         
         # self.app.middleware("http")(request_debug_middleware)
 
-        # set db and container
+        # set db and container (the Weaviate client connects on first use)
         self.container = Container()
         self.db = self.container.db()
-        self.db.create_schema()
 
         # set cors
         if configs.BACKEND_CORS_ORIGINS:
@@ -42,6 +45,37 @@ class AppCreator:
 
         self.app.include_router(api_router)
 
+        # shed load instead of queueing without bound when inference is saturated
+        @self.app.exception_handler(InferenceSaturatedError)
+        async def inference_saturated_handler(request: Request, exc: InferenceSaturatedError):
+            return JSONResponse(
+                status_code=configs.INFERENCE_SATURATED_STATUS_CODE,
+                content={"detail": str(exc)},
+                headers={"Retry-After": str(int(exc.retry_after))},
+            )
+
+        # connect and load the model once the server is up, not at import time
+        @self.app.on_event("startup")
+        def startup():
+            if configs.VECTOR_BACKEND == "weaviate":
+                try:
+                    self.db.create_schema()
+                except Exception as e:
+                    print(f"Could not create Weaviate schema at startup: {str(e)}")
+            # already warm when the model was preloaded before forking (app.serve)
+            if configs.WARMUP_ON_STARTUP and not resources.ready:
+                threading.Thread(target=resources.warmup, name="model-warmup", daemon=True).start()
+            # drain the ingestion job queue in the background (in every server worker)
+            if configs.JOB_WORKERS > 0:
+                self.container.job_worker().start()
+
+        @self.app.on_event("shutdown")
+        async def shutdown():
+            if configs.JOB_WORKERS > 0:
+                self.container.job_worker().stop()
+            await self.db.close_async()
+            self.db.close()
+
 
 app_creator = AppCreator()
 app = app_creator.app
@@ -1,2 +1,4 @@
 from app.repository.image_repository import ImageRepository
-from app.repository.text_repository import TextRepository
\ No newline at end of file
+from app.repository.text_repository import TextRepository
+from app.repository.local_repository import LocalImageRepository, LocalTextRepository
+from app.repository.async_repository import AsyncImageRepository, AsyncTextRepository, ThreadedAsyncRepository
@@ -0,0 +1,144 @@
+import asyncio
+from contextlib import AbstractAsyncContextManager
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from fastapi.concurrency import run_in_threadpool
+from weaviate.classes.data import DataObject
+from weaviate.classes.query import Filter, MetadataQuery
+from app.core.config import configs
+from app.repository.base_repository import TYPE_PROPERTY, image_object, public_properties, rescore_objects, text_object
+
+
+class AsyncBaseRepository:
+    """
+    Async repository for Weaviate, built on the v4 async client.
+    Same methods as BaseRepository, as coroutines: requests to Weaviate
+    never block the event loop.
+    """
+    def __init__(self, session_factory: Callable[..., AbstractAsyncContextManager[Any]]) -> None:
+        """Initialize the repository with an async Weaviate session factory (WeaviateDatabase.async_session)."""
+        self.session_factory = session_factory
+
+    async def _insert(self, objects: List[DataObject], kind: str) -> None:
+        async with self.session_factory() as client:
+            collection = client.collections.get(configs.WEAVIATE_COLLECTION_NAME)
+            size = max(1, configs.WEAVIATE_ASYNC_INSERT_BATCH_SIZE)
+            for start in range(0, len(objects), size):
+                result = await collection.data.insert_many(objects[start:start + size])
+                if result.has_errors:
+                    for index, error in result.errors.items():
+                        print(f"Failed to import {kind} {objects[start + index].uuid}: {error.message}")
+                    first = next(iter(result.errors.values()))
+                    raise RuntimeError(
+                        f"{len(result.errors)} {kind} objects failed to import, first error: {first.message}"
+                    )
+        print(f"Uploaded {len(objects)} {kind} objects")
+
+    async def update_image_data(self, image_data: List[Dict[str, Any]]) -> None:
+        """Import image data (same item format as BaseRepository.update_image_data)."""
+        objects = []
+        for item in image_data:
+            object_id, properties = image_object(item)
+            objects.append(DataObject(properties=properties, vector=item["vector"], uuid=object_id))
+        await self._insert(objects, "image")
+
+    async def update_text_data(self, text_data: List[Dict[str, Any]]) -> None:
+        """Import text data (same item format as BaseRepository.update_text_data)."""
+        objects = []
+        for item in text_data:
+            object_id, properties = text_object(item)
+            objects.append(DataObject(properties=properties, vector=item["vector"], uuid=object_id))
+        await self._insert(objects, "text")
+
+    async def read_by_id(self, id: str) -> Optional[Dict[str, Any]]:
+        """Read an entity by its ID."""
+        async with self.session_factory() as client:
+            collection = client.collections.get(configs.WEAVIATE_COLLECTION_NAME)
+            entity = await collection.query.fetch_object_by_id(id)
+            return public_properties(entity.properties) if entity else None
+
+    async def read_by_vector(self, search_vector: Sequence[float], type_filter: str, limit: int = 5,
+                             rescore_limit: Optional[int] = None) -> Any:
+        """Read entities by vector (see BaseRepository.read_by_vector)."""
+        if rescore_limit is None:
+            rescore_limit = configs.SEARCH_RESCORE_LIMIT
+        rescore = rescore_limit > limit
+        async with self.session_factory() as client:
+            collection = client.collections.get(configs.WEAVIATE_COLLECTION_NAME)
+            entities = await collection.query.near_vector(
+                near_vector=search_vector,
+                filters=Filter.by_property(TYPE_PROPERTY).equal(type_filter),
+                limit=rescore_limit if rescore else limit,
+                include_vector=rescore,
+                return_metadata=MetadataQuery(distance=True),
+            )
+        if entities and rescore:
+            entities.objects = rescore_objects(entities.objects, search_vector, limit)
+        return entities if entities else []
+
+    async def read_by_vectors(self, search_vectors: Sequence[Sequence[float]], type_filter: str, limit: int = 5,
+                              rescore_limit: Optional[int] = None) -> List[Any]:
+        """
+        Read entities for several query vectors. Weaviate has no multi-vector
+        query, so the near_vector requests run concurrently (at most
+        SEARCH_BATCH_CONCURRENCY at a time) over the shared client.
+
+        Returns:
+            One read_by_vector result per vector, in input order
+        """
+        semaphore = asyncio.Semaphore(max(1, configs.SEARCH_BATCH_CONCURRENCY))
+
+        async def read(vector: Sequence[float]) -> Any:
+            async with semaphore:
+                return await self.read_by_vector(vector, type_filter, limit, rescore_limit)
+
+        return list(await asyncio.gather(*(read(vector) for vector in search_vectors)))
+
+    async def delete_by_id(self, id: str) -> None:
+        """Delete an entity by its ID."""
+        async with self.session_factory() as client:
+            collection = client.collections.get(configs.WEAVIATE_COLLECTION_NAME)
+            await collection.data.delete_by_id(id)
+            print(f"Deleted entity with ID: {id}")
+
+
+class AsyncImageRepository(AsyncBaseRepository):
+    """Async repository for image data in Weaviate."""
+
+
+class AsyncTextRepository(AsyncBaseRepository):
+    """Async repository for text data in Weaviate."""
+
+
+class ThreadedAsyncRepository:
+    """
+    Async facade over a synchronous repository (e.g. LocalRepository):
+    each call runs in the thread pool, so in-process searches do not
+    block the event loop either.
+    """
+    def __init__(self, repository: Any) -> None:
+        """Initialize with the synchronous repository to wrap."""
+        self.repository = repository
+
+    async def update_image_data(self, image_data: List[Dict[str, Any]]) -> None:
+        await run_in_threadpool(self.repository.update_image_data, image_data)
+
+    async def update_text_data(self, text_data: List[Dict[str, Any]]) -> None:
+        await run_in_threadpool(self.repository.update_text_data, text_data)
+
+    async def read_by_id(self, id: str) -> Optional[Dict[str, Any]]:
+        return await run_in_threadpool(self.repository.read_by_id, id)
+
+    async def read_by_vector(self, search_vector: Sequence[float], type_filter: str, limit: int = 5,
+                             rescore_limit: Optional[int] = None) -> Any:
+        return await run_in_threadpool(
+            self.repository.read_by_vector, search_vector, type_filter, limit, rescore_limit
+        )
+
+    async def read_by_vectors(self, search_vectors: Sequence[Sequence[float]], type_filter: str, limit: int = 5,
+                              rescore_limit: Optional[int] = None) -> List[Any]:
+        return await run_in_threadpool(
+            self.repository.read_by_vectors, search_vectors, type_filter, limit, rescore_limit
+        )
+
+    async def delete_by_id(self, id: str) -> None:
+        await run_in_threadpool(self.repository.delete_by_id, id)
@@ -1,10 +1,139 @@
 import weaviate 
+import base64
+import json
 from contextlib import AbstractContextManager
-from typing import Any, Callable, Dict, List, Optional, Protocol, TypeVar, Union
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Protocol, Sequence, Tuple, TypeVar, Union
 from app.core.config import configs 
-from weaviate.classes.query import Filter
+from weaviate.classes.query import Filter, MetadataQuery, Sort
+from weaviate.exceptions import WeaviateBaseError
 from tqdm import tqdm
 import uuid
+import numpy as np
+
+# Property holding the object type ("Image" or "Text"), used by every backend
+TYPE_PROPERTY = "type"
+IMAGE_TYPE = "Image"
+TEXT_TYPE = "Text"
+
+
+# Properties stored on images (see image_object)
+IMAGE_PROPERTIES = (TYPE_PROPERTY, "image_path", "content_hash", "metadata")
+
+
+def check_properties(properties: Optional[List[str]], known: Sequence[str]) -> None:
+    """Raise ValueError if a requested property is not one of `known`."""
+    unknown = [name for name in properties or [] if name not in known]
+    if unknown:
+        raise ValueError(f"Unknown properties: {', '.join(unknown)} (expected some of: {', '.join(known)})")
+
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    """Encode a pagination state as an opaque URL-safe cursor."""
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Dict[str, Any]:
+    """Decode a cursor produced by encode_cursor (None or "" is the first page)."""
+    if not cursor:
+        return {}
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+# Keys of "metadata" declared in the collection schema (see app/core/schema.py).
+# Metadata is free-form, so all of it, other keys included, is also stored
+# as JSON text and restored from there on read (see public_properties)
+METADATA_KEYS = ("created_at", "filename")
+METADATA_JSON_PROPERTY = "metadata_json"
+
+
+def metadata_properties(metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build the stored properties holding an item's metadata."""
+    metadata = metadata or {}
+    return {
+        "metadata": {key: metadata[key] for key in METADATA_KEYS if isinstance(metadata.get(key), str)},
+        METADATA_JSON_PROPERTY: json.dumps(metadata, ensure_ascii=False),
+    }
+
+
+def stored_property_names(properties: Optional[List[str]]) -> Optional[List[str]]:
+    """Properties to fetch for the requested ones ("metadata" is read from its JSON copy)."""
+    if properties is not None and "metadata" in properties and METADATA_JSON_PROPERTY not in properties:
+        return list(properties) + [METADATA_JSON_PROPERTY]
+    return properties
+
+
+def public_properties(properties: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Properties as returned to callers, with the full metadata restored from its JSON copy."""
+    if not properties or METADATA_JSON_PROPERTY not in properties:
+        return properties
+    properties = dict(properties)
+    raw = properties.pop(METADATA_JSON_PROPERTY)
+    if raw:
+        properties["metadata"] = json.loads(raw)
+    return properties
+
+
+def image_object(item: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Build the UUID and properties stored for an image item (see update_image_data).
+    Shared by every vector backend so they store identical objects.
+    """
+    properties = {
+        "image_path": item["image_path"],
+        # "image_base64": item.get("image_base64", None),  # Optional base64 image
+        TYPE_PROPERTY: IMAGE_TYPE,
+        **metadata_properties(item.get("metadata")),
+    }
+    if item.get("content_hash"):
+        properties["content_hash"] = item["content_hash"]
+    # Identical content maps to the same object, whatever its file name
+    uuid_source = item.get("content_hash") or item["image_path"].split("/")[-1]
+    return item.get("id", str(uuid.uuid5(uuid.NAMESPACE_DNS, uuid_source))), properties  # Optional UUID
+
+
+def text_object(item: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Build the UUID and properties stored for a text item (see update_text_data).
+    """
+    properties = {
+        "text": item["text"],
+        TYPE_PROPERTY: TEXT_TYPE,
+        **metadata_properties(item.get("metadata")),
+    }
+    return item.get("id", str(uuid.uuid5(uuid.NAMESPACE_DNS, item["text"]))), properties  # Optional UUID
+
+
+def rescore_objects(objects: List[Any], query: Sequence[float], limit: int) -> List[Any]:
+    """
+    Re-rank search results (fetched with include_vector=True) by exact
+    cosine distance to the query, keeping the best `limit`.
+    """
+    if not objects:
+        return objects
+    vectors = np.asarray(
+        [obj.vector.get("default") if isinstance(obj.vector, dict) else obj.vector for obj in objects],
+        dtype=np.float32,
+    )
+    query = np.asarray(query, dtype=np.float32).ravel()
+    similarity = (vectors @ query) / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query) + 1e-12)
+    best = np.argsort(-similarity, kind="stable")[:limit]
+    for i in best:
+        objects[i].metadata.distance = float(1.0 - similarity[i])
+    return [objects[i] for i in best]
+
+
+def _raise_failed_objects(collection: Any, kind: str) -> None:
+    """
+    Raise if the last batch import into collection dropped objects, so
+    callers never treat failed writes as stored.
+    """
+    failed = collection.batch.failed_objects
+    if failed:
+        raise RuntimeError(f"{len(failed)} {kind} objects failed to import, first error: {failed[0].message}")
+
 
 class BaseRepository(Protocol):
     """
@@ -23,7 +152,8 @@ class BaseRepository(Protocol):
         image_data should be a list of dictionaries with:
         - id: string (optional unique identifier to link with captions later)
         - image_path: string 
-        - vector: list of floats
+        - content_hash: SHA-256 of the image bytes (optional, used for the UUID)
+        - vector: float32 NumPy array (or list of floats), passed to the client as is
         - image_base64: base64 encoded image (optional)
         - metadata: dict (optional)
         
@@ -37,18 +167,13 @@ class BaseRepository(Protocol):
             collection = client.collections.get(configs.WEAVIATE_COLLECTION_NAME)
             with collection.batch.dynamic() as batch:
                 for item in tqdm(image_data, desc="Uploading images"):
-                    print(item['image_path'])
-                    properties = {
-                        "image_path": item["image_path"],
-                        # "image_base64": item.get("image_base64", None),  # Optional base64 image
-                        "Type": "Image",
-                        "metadata": item.get("metadata", {}),
-                    }
+                    object_id, properties = image_object(item)
                     batch.add_object(
                         properties=properties,
                         vector=item["vector"],
-                        uuid=item.get("id", str(uuid.uuid5(uuid.NAMESPACE_DNS, item["image_path"].split("/")[-1]))),  # Optional UUID
+                        uuid=object_id,
                     )
+            _raise_failed_objects(collection, "image")
     
     def update_text_data(self, text_data: List[Dict[str, Any]]) -> None:
         """Update text data for an entity."""
@@ -58,7 +183,7 @@ class BaseRepository(Protocol):
         text_data should be a list of dictionaries with:
         - id: string (optional unique identifier to link with images later)
         - text: string 
-        - vector: list of floats
+        - vector: float32 NumPy array (or list of floats), passed to the client as is
         - metadata: dict (optional)
         
         Returns a list of UUIDs for the imported objects.
@@ -68,46 +193,174 @@ class BaseRepository(Protocol):
             collection = client.collections.get(configs.WEAVIATE_COLLECTION_NAME)
             with collection.batch.dynamic() as batch:
                 for item in tqdm(text_data, desc="Uploading texts"):
-                    properties = {
-                        "text": item["text"],
-                        "Type": "Text",
-                        "metadata": item.get("metadata", {}),
-                    }
+                    object_id, properties = text_object(item)
                     batch.add_object(
                         properties=properties,
                         vector=item["vector"],
-                        uuid=item.get("id", str(uuid.uuid5(uuid.NAMESPACE_DNS, item["text"]))),  # Optional UUID
+                        uuid=object_id,
                     )
+            _raise_failed_objects(collection, "text")
+
     def read_by_id(self, id: str) -> Optional[Dict[str, Any]]:
         """Read an entity by its ID."""
         with self.session_factory() as client:
             collection = client.collections.get(configs.WEAVIATE_COLLECTION_NAME)
             entity = collection.query.fetch_object_by_id(id)
             print(entity.properties)
-            return entity.properties if entity else None
+            return public_properties(entity.properties) if entity else None
         
     def read_all(self) -> List[Dict[str, Any]]:
         """Read all entities."""
-        entities = []
+        return list(self.iter_objects())
+
+    def iter_objects(self, type_filter: Optional[str] = None, properties: Optional[List[str]] = None,
+                     page_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over all entities page by page (constant memory).
+
+        Args:
+            type_filter: Only yield entities of this type ("Image" or "Text")
+            properties: Properties to fetch (None fetches all)
+            page_size: Number of entities fetched per request
+
+        Yields:
+            Entity properties, plus their "id"
+        """
+        cursor = None
+        while True:
+            items, cursor = self.read_page(type_filter, properties, page_size, cursor)
+            yield from items
+            if cursor is None:
+                return
+
+    def read_page(self, type_filter: Optional[str] = None, properties: Optional[List[str]] = None,
+                  limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Read one page of entities, filtered by type on the server.
+
+        Pages are keyset-paginated on the creation time (ascending), which
+        Weaviate can filter and sort on when the collection indexes
+        timestamps; objects sharing the boundary timestamp are remembered in
+        the cursor and skipped on the next page (or, past `limit` of them,
+        counted and offset past). Without indexed timestamps
+        this falls back to Weaviate's UUID cursor, which cannot be combined
+        with filters, so the type is then filtered client-side.
+
+        Args:
+            type_filter: Only return entities of this type
+            properties: Properties to fetch (None fetches all)
+            limit: Page size
+            cursor: Cursor returned with the previous page (None for the first page)
+
+        Returns:
+            (entities, next_cursor); next_cursor is None after the last page
+        """
+        state = decode_cursor(cursor)
+        properties = stored_property_names(properties)
         with self.session_factory() as client:
             collection = client.collections.get(configs.WEAVIATE_COLLECTION_NAME)
-            print("Fetching all entities...")
-            results = collection.query.fetch_objects(limit=1000).objects
-            print(f"Fetched {len(results)} entities.")
-            for item in results:
-                entities.append(item.properties)
-            return entities if entities else []
+            if "after" not in state:
+                try:
+                    return self._read_page_by_time(collection, type_filter, properties, limit, state)
+                except WeaviateBaseError as e:
+                    if state:
+                        raise
+                    print(f"Keyset pagination unavailable ({str(e)}), falling back to the UUID cursor")
+            return self._read_page_by_uuid(collection, type_filter, properties, limit, state)
+
+    def _read_page_by_time(self, collection, type_filter, properties, limit, state):
+        # Ties on the boundary timestamp are broken by UUID, so the objects of
+        # that timestamp already returned are always a prefix in this order
+        skip = set(state.get("skip", []))
+        offset = state.get("n", 0)
+        filters = Filter.by_property(TYPE_PROPERTY).equal(type_filter) if type_filter else None
+        if "t" in state:
+            since = Filter.by_creation_time().greater_or_equal(
+                datetime.fromtimestamp(state["t"] / 1000, tz=timezone.utc)
+            )
+            filters = since if filters is None else filters & since
+        response = collection.query.fetch_objects(
+            limit=limit + len(skip),
+            offset=offset or None,
+            filters=filters,
+            sort=Sort.by_creation_time(ascending=True).by_id(ascending=True),
+            return_properties=properties,
+            return_metadata=MetadataQuery(creation_time=True),
+        )
+        objects = [obj for obj in response.objects if str(obj.uuid) not in skip][:limit]
+        if not objects:
+            return [], None
+        items = [{"id": str(obj.uuid), **public_properties(obj.properties)} for obj in objects]
+        if len(response.objects) < limit + len(skip):
+            return items, None
+        last_ms = int(objects[-1].metadata.creation_time.timestamp() * 1000)
+        # Objects at the boundary timestamp already returned (here or on earlier pages)
+        boundary = {str(obj.uuid) for obj in objects
+                    if int(obj.metadata.creation_time.timestamp() * 1000) == last_ms}
+        if state.get("t") == last_ms:
+            if "n" in state:
+                return items, encode_cursor({"t": last_ms, "n": offset + len(boundary)})
+            boundary |= skip
+        if len(boundary) > limit:
+            # Too many ties to remember in the cursor: count them instead
+            return items, encode_cursor({"t": last_ms, "n": len(boundary)})
+        return items, encode_cursor({"t": last_ms, "skip": sorted(boundary)})
+
+    def _read_page_by_uuid(self, collection, type_filter, properties, limit, state):
+        items = []
+        after = state.get("after")
+        if type_filter and properties is not None and TYPE_PROPERTY not in properties:
+            # Needed to filter client-side
+            properties = list(properties) + [TYPE_PROPERTY]
+        while len(items) < limit:
+            response = collection.query.fetch_objects(limit=limit, after=after, return_properties=properties)
+            if not response.objects:
+                return items, None
+            for obj in response.objects:
+                after = str(obj.uuid)
+                if type_filter is None or obj.properties.get(TYPE_PROPERTY) == type_filter:
+                    items.append({"id": after, **public_properties(obj.properties)})
+                    if len(items) == limit:
+                        break
+            if len(response.objects) < limit and after == str(response.objects[-1].uuid):
+                return items, None
+        return items, encode_cursor({"after": after})
         
-    def read_by_vector(self, search_vector: List[float], type_filter: str, limit: int = 5) -> List[Dict[str, Any]]:
-        """Read entities by vector."""
+    def read_by_vector(self, search_vector: Sequence[float], type_filter: str, limit: int = 5,
+                       rescore_limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Read entities by vector.
+
+        With a rescore limit above `limit`, that many candidates are fetched
+        with their stored vectors and re-ranked by exact cosine distance, to
+        recover the recall lost to a compressed (PQ/BQ) vector index.
+
+        Args:
+            search_vector: Query vector
+            type_filter: Only return entities of this type
+            limit: Maximum number of results
+            rescore_limit: Candidates to rescore (defaults to configs.SEARCH_RESCORE_LIMIT; 0 disables)
+        """
+        if rescore_limit is None:
+            rescore_limit = configs.SEARCH_RESCORE_LIMIT
+        rescore = rescore_limit > limit
         with self.session_factory() as client:
             collection = client.collections.get(configs.WEAVIATE_COLLECTION_NAME)
             entities = collection.query.near_vector(
             near_vector=search_vector,
-            filters = Filter.by_property("type").equal(type_filter),
-            limit=limit
+            filters = Filter.by_property(TYPE_PROPERTY).equal(type_filter),
+            limit=rescore_limit if rescore else limit,
+            include_vector=rescore,
+            return_metadata=MetadataQuery(distance=True),
             )
+            if entities and rescore:
+                entities.objects = rescore_objects(entities.objects, search_vector, limit)
             return entities if entities else []
+
+    def read_by_vectors(self, search_vectors: Sequence[Sequence[float]], type_filter: str, limit: int = 5,
+                        rescore_limit: Optional[int] = None) -> List[Any]:
+        """Read entities for several query vectors (one read_by_vector result per vector, in order)."""
+        return [self.read_by_vector(vector, type_filter, limit, rescore_limit) for vector in search_vectors]
         
     def delete_by_id(self, id: str) -> None:
         """Delete an entity by its ID."""
@@ -117,8 +370,9 @@ class BaseRepository(Protocol):
             print(f"Deleted entity with ID: {id}")
             
     def close_scoped_session(self):
-        with self.session_factory() as client:
-            return client.close() 
+        # Nothing to close: the client is shared by the whole process and
+        # kept alive (and reconnected when needed) by WeaviateDatabase
+        return None
         
 
         
\ No newline at end of file
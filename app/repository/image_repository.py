@@ -2,7 +2,7 @@ import weaviate
 from contextlib import AbstractContextManager
 from typing import Any, Callable, Dict, List, Optional, Protocol, TypeVar, Union
 from app.core.config import configs 
-from app.repository.base_repository import BaseRepository
+from app.repository.base_repository import IMAGE_TYPE, BaseRepository
 
 class ImageRepository(BaseRepository):
     """
@@ -14,11 +14,6 @@ class ImageRepository(BaseRepository):
         self.session_factory = session_factory
         super().__init__(session_factory)
         
-    def read_all_image(self):
-        """Read all image data from Weaviate."""
-        all_objects = self.read_all()
-        all_images = filter(lambda obj: obj["type"] == "Image", all_objects) 
-        if not all_images:
-            return []
-        all_images = list(all_images)
-        return all_images
\ No newline at end of file
+    def read_all_image(self, properties: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Read all image data from Weaviate (filtered by type on the server)."""
+        return list(self.iter_objects(type_filter=IMAGE_TYPE, properties=properties))
@@ -0,0 +1,106 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from app.repository.base_repository import (
+    IMAGE_TYPE, decode_cursor, encode_cursor, image_object, public_properties, stored_property_names, text_object,
+)
+from app.utils.local_vector_store import LocalQueryResult, LocalVectorStore
+
+
+class LocalRepository:
+    """
+    Repository backed by the in-process LocalVectorStore.
+    Implements the same methods as BaseRepository, so services work with
+    either backend (selected with configs.VECTOR_BACKEND).
+    """
+    def __init__(self, store: LocalVectorStore) -> None:
+        """Initialize the repository with a local vector store."""
+        self.store = store
+
+    def update_image_data(self, image_data: List[Dict[str, Any]]) -> None:
+        """Import image data (same item format as BaseRepository.update_image_data)."""
+        objects = []
+        for item in image_data:
+            object_id, properties = image_object(item)
+            objects.append((object_id, item["vector"], properties))
+        self.store.upsert(objects)
+        print(f"Stored {len(objects)} images in the local vector store")
+
+    def update_text_data(self, text_data: List[Dict[str, Any]]) -> None:
+        """Import text data (same item format as BaseRepository.update_text_data)."""
+        objects = []
+        for item in text_data:
+            object_id, properties = text_object(item)
+            objects.append((object_id, item["vector"], properties))
+        self.store.upsert(objects)
+        print(f"Stored {len(objects)} texts in the local vector store")
+
+    def read_by_id(self, id: str) -> Optional[Dict[str, Any]]:
+        """Read an entity by its ID."""
+        entity = self.store.get(id)
+        return public_properties(entity.properties) if entity else None
+
+    def read_all(self) -> List[Dict[str, Any]]:
+        """Read all entities."""
+        return list(self.iter_objects())
+
+    def iter_objects(self, type_filter: Optional[str] = None, properties: Optional[List[str]] = None,
+                     page_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Iterate over all entities page by page (see BaseRepository.iter_objects)."""
+        cursor = None
+        while True:
+            items, cursor = self.read_page(type_filter, properties, page_size, cursor)
+            yield from items
+            if cursor is None:
+                return
+
+    def read_page(self, type_filter: Optional[str] = None, properties: Optional[List[str]] = None,
+                  limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Read one page of entities in insertion order (see BaseRepository.read_page)."""
+        entities, last_row = self.store.page(type_filter, decode_cursor(cursor).get("row", -1), limit)
+        properties = stored_property_names(properties)
+        items = []
+        for entity in entities:
+            values = entity.properties
+            if properties is not None:
+                values = {name: values[name] for name in properties if name in values}
+            items.append({"id": entity.uuid, **public_properties(values)})
+        return items, encode_cursor({"row": last_row}) if last_row is not None else None
+
+    def read_by_vector(self, search_vector: Sequence[float], type_filter: str, limit: int = 5,
+                       rescore_limit: Optional[int] = None) -> LocalQueryResult:
+        """
+        Read entities by vector (cosine distance). rescore_limit sets how
+        many IVF-PQ candidates are re-ranked exactly (flat search is exact).
+        """
+        return LocalQueryResult(objects=self.store.search(
+            search_vector, type_filter=type_filter, limit=limit, rerank=rescore_limit,
+        ))
+
+    def read_by_vectors(self, search_vectors: Sequence[Sequence[float]], type_filter: str, limit: int = 5,
+                        rescore_limit: Optional[int] = None) -> List[LocalQueryResult]:
+        """Read entities for several query vectors at once (see LocalVectorStore.search_many)."""
+        return [
+            LocalQueryResult(objects=objects)
+            for objects in self.store.search_many(
+                search_vectors, type_filter=type_filter, limit=limit, rerank=rescore_limit,
+            )
+        ]
+
+    def delete_by_id(self, id: str) -> None:
+        """Delete an entity by its ID."""
+        self.store.delete(id)
+        print(f"Deleted entity with ID: {id}")
+
+    def close_scoped_session(self):
+        # Nothing to close: the store lives for the whole process
+        return None
+
+
+class LocalImageRepository(LocalRepository):
+    """Image repository on the local vector store."""
+    def read_all_image(self, properties: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Read all image data."""
+        return list(self.iter_objects(type_filter=IMAGE_TYPE, properties=properties))
+
+
+class LocalTextRepository(LocalRepository):
+    """Text repository on the local vector store."""
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Union
 from fastapi import UploadFile
 
 TextRequest = str
@@ -10,21 +10,87 @@ class TextSearchResponse(BaseModel):
     text: List[str] 
 
     
+class BatchTextSearchRequest(BaseModel):
+    queries: List[str]
+
+class BatchSearchResponse(BaseModel):
+    results: Dict[str, List[str]]
+    failures: Dict[str, str] = {}
+
 class UploadResponse(BaseModel):
     message: str
 
+class UploadFailure(BaseModel):
+    index: int
+    filename: str
+    error: str
+
+class StreamUploadResponse(BaseModel):
+    received: int
+    uploaded: int
+    failed: int
+    batches: int
+    failures: List[UploadFailure]
+
+class LineFailure(BaseModel):
+    line: int
+    error: str
+
+class TextStreamUploadResponse(BaseModel):
+    received: int
+    uploaded: int
+    failed: int
+    batches: int
+    failures: List[LineFailure]
+
+class JobAcceptedResponse(BaseModel):
+    job_id: str
+    status: str
+    total: int
+    status_url: str
+
+class JobFailure(BaseModel):
+    index: int
+    item: str
+    error: Optional[str] = None
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    total: int
+    processed: int
+    failed: int
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    items_per_second: float
+    failures: List[JobFailure]
+
 class HealthResponse(BaseModel):
     status: str
 
-    
+class ReadyResponse(BaseModel):
+    status: str
+    model_loaded: bool
+    model_warm: bool
+
+class StatsResponse(BaseModel):
+    text_cache: Dict[str, Any]
+    inference: Dict[str, Any]
+    process: Dict[str, Any]
+    weaviate: Dict[str, Any]
 
 
+class ImagePageResponse(BaseModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
 
-# class TextVectorResponse(BaseModel):
-#     text: str
-#     vector: List[float]
-#     dim: int
+class TextVectorResponse(BaseModel):
+    text: str
+    vector: Union[List[float], str]  # str when format=base64 (little-endian float32)
+    dim: int
 
-# class ImageVectorResponse(BaseModel):
-#     vector: List[float]
-#     dim: int
\ No newline at end of file
+class ImageVectorResponse(BaseModel):
+    vector: Union[List[float], str]  # str when format=base64 (little-endian float32)
+    dim: int
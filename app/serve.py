@@ -0,0 +1,209 @@
+"""
+Preload-and-fork server entry point.
+
+The master process loads and warms the model once, binds the listening
+socket and then forks SERVER_WORKERS uvicorn workers. The workers share
+the model weights copy-on-write (they are never written after loading),
+so memory grows by each worker's private pages only, not by a full copy
+of PhoBERT and MobileNet, and workers start without reloading the model.
+
+Usage:
+    python -m app.serve [--host 0.0.0.0] [--port 8081] [--workers 4]
+
+Each worker logs its startup time and RSS/PSS once it accepts requests,
+and the master prints a per-worker table (plus total PSS, the figure to
+size pods with) once all workers are up. GET /stats reports the same
+numbers for the worker serving the request.
+
+Notes:
+    - The master runs torch with a single thread, so no OpenMP thread
+      pool exists at fork time; each worker then pins its own pools to
+      cores / (workers * INFERENCE_SLOTS) threads.
+    - CUDA cannot be used across fork(), so on a GPU machine every worker
+      loads its own model instead.
+    - Without os.fork (Windows) or with a single worker the server runs
+      in the master process.
+"""
+import argparse
+import gc
+import os
+import select
+import signal
+import sys
+import time
+import traceback
+
+import uvicorn
+
+from app.core.config import configs
+from app.utils.inference_executor import configure_torch_threads
+from app.utils.process_stats import mark_startup, memory_usage, process_stats
+
+
+class WorkerServer(uvicorn.Server):
+    """uvicorn server that records (and reports to the master) when it is ready."""
+    def __init__(self, config, started_at, notify_fd=None):
+        super().__init__(config)
+        self.started_at = started_at
+        self.notify_fd = notify_fd
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        seconds = mark_startup(self.started_at, role="worker")
+        print(f"Worker {os.getpid()} ready in {seconds:.2f}s: {process_stats()}")
+        if self.notify_fd is not None:
+            # One short line per worker, written atomically into the pipe
+            os.write(self.notify_fd, f"{os.getpid()} {seconds:.3f}\n".encode())
+
+
+def default_workers():
+    """One worker per INFERENCE_SLOTS cores."""
+    return max(1, (os.cpu_count() or 1) // max(1, configs.INFERENCE_SLOTS))
+
+
+def preload_model():
+    """
+    Load and warm the model in the master, before forking.
+
+    Returns:
+        Whether the model was preloaded (False on CUDA machines)
+    """
+    import torch
+
+    if torch.cuda.is_available():
+        print("CUDA is available: not preloading, every worker loads its own model")
+        return False
+    from app.utils.vectorize import resources
+    resources.warmup()
+    return True
+
+
+def run_worker(config, sock, workers, started_at, notify_fd):
+    """Body of a forked worker process."""
+    # Drop the master's handlers; uvicorn installs its own
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    configure_torch_threads(configs.INFERENCE_SLOTS, workers=workers)
+    server = WorkerServer(config, started_at, notify_fd)
+    server.run(sockets=[sock])
+
+
+def report_workers(startup_times):
+    """Print startup time and memory of the master and every worker."""
+    master = memory_usage()
+    print(f"{'process':>14} {'startup s':>10} {'rss MB':>9} {'pss MB':>9} {'shared MB':>10} {'private MB':>11}")
+    rows = [(f"master {os.getpid()}", None, master)]
+    rows += [(f"worker {pid}", seconds, memory_usage(pid)) for pid, seconds in sorted(startup_times.items())]
+    for name, seconds, usage in rows:
+        startup = f"{seconds:.2f}" if seconds is not None else "-"
+        print(f"{name:>14} {startup:>10} {usage.get('rss_mb', 0):>9.1f} {usage.get('pss_mb', 0):>9.1f} "
+              f"{usage.get('shared_mb', 0):>10.1f} {usage.get('private_mb', 0):>11.1f}")
+    total_pss = sum(usage.get("pss_mb", 0) for _, _, usage in rows)
+    print(f"Total PSS (master + {len(startup_times)} workers): {total_pss:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=configs.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=configs.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=configs.SERVER_WORKERS or default_workers())
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    started_at = time.monotonic()
+    forking = args.workers > 1 and hasattr(os, "fork")
+
+    if forking:
+        # No intra-op thread pool may exist in the master at fork time
+        configure_torch_threads(1, num_threads=1)
+    from app.main import app
+    preloaded = preload_model()
+
+    config = uvicorn.Config(app, host=args.host, port=args.port, log_level=args.log_level)
+    if not forking:
+        # Single process: serve from the master itself
+        server = WorkerServer(config, started_at)
+        server.run()
+        return
+
+    # Move everything allocated so far out of the collector's reach, so
+    # that GC passes in the workers do not touch (and copy) shared pages
+    gc.collect()
+    gc.freeze()
+
+    sock = config.bind_socket()
+    seconds = mark_startup(started_at, role="master")
+    print(f"Master {os.getpid()} {'preloaded the model' if preloaded else 'started'} in {seconds:.2f}s: "
+          f"{process_stats()}")
+
+    read_fd, notify_fd = os.pipe()
+    workers = {}
+    startup_times = {}
+    shutting_down = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            forked_at = time.monotonic()
+            os.close(read_fd)
+            code = 0
+            try:
+                run_worker(config, sock, args.workers, forked_at, notify_fd)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            os._exit(code)
+        workers[pid] = index
+        print(f"Started worker {index} (pid {pid})")
+
+    def shutdown(signum, frame):
+        nonlocal shutting_down
+        shutting_down = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    for index in range(args.workers):
+        spawn(index)
+
+    reported = False
+    buffer = b""
+    while workers:
+        ready, _, _ = select.select([read_fd], [], [], 1.0)
+        if ready:
+            buffer += os.read(read_fd, 4096)
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                pid, seconds = line.split()
+                startup_times[int(pid)] = float(seconds)
+            if not reported and len(startup_times) >= args.workers:
+                report_workers({pid: startup_times[pid] for pid in workers if pid in startup_times})
+                reported = True
+
+        # Reap exited workers, restarting them unless shutting down
+        while workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            index = workers.pop(pid, None)
+            startup_times.pop(pid, None)
+            if index is None or shutting_down:
+                continue
+            print(f"Worker {index} (pid {pid}) exited with status {status}, restarting")
+            time.sleep(1.0)
+            spawn(index)
+
+    sock.close()
+    print("All workers stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,3 @@
 from app.services.image_services import ImageService
-from app.services.text_services import TextService
\ No newline at end of file
+from app.services.text_services import TextService
+from app.services.job_services import JobService, JobWorker
@@ -1,13 +1,20 @@
 import os
 import logging
-from typing import List, Optional
+from typing import AsyncIterator, Callable, Iterator, List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
 from PIL import Image
 from pathlib import Path
 from app.core.config import configs
 from app.repository.image_repository import ImageRepository
+from app.repository.base_repository import IMAGE_PROPERTIES, IMAGE_TYPE, TEXT_TYPE, check_properties
 from app.services.weavite__service import BaseService
-from app.utils.vectorize import resources
-from app.utils.save_image import save_image
+from app.utils.vectorize import IMAGE_RESIZE, resources
+from app.utils.preprocess import decode_image
+from app.utils.upload_stream import Entry, process_in_batches
+from app.utils.inference_executor import InferenceSaturatedError
+from app.utils.batching import batched_resources
+from app.utils.save_image import save_image_content
+from app.utils.embedding_store import content_hash, image_embedding_store
 from typing import Dict, Any
 import base64
 import io
@@ -16,54 +23,242 @@ from datetime import datetime
 class ImageService(BaseService):
     """Service for handling image operations in the repository."""
     
-    def __init__(self, image_repository: ImageRepository) -> None:
-        """Initialize the service with the image repository."""
+    def __init__(self, image_repository: ImageRepository, async_repository: Optional[Any] = None) -> None:
+        """
+        Initialize the service with the image repository, and optionally its
+        async counterpart (AsyncImageRepository) used by the *_async methods.
+        """
         self.image_repository = image_repository
+        self.async_repository = async_repository
         super().__init__(image_repository)
         
     def read_all_image(self) -> List[Dict[str, Any]]:
         """Read all image data from the repository."""
         all_images = self.image_repository.read_all_image()
         return all_images
+
+    def read_image_page(self, limit: int = 100, cursor: Optional[str] = None,
+                        properties: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Read one page of images.
+
+        Args:
+            limit: Page size
+            cursor: Cursor from the previous page (None for the first page)
+            properties: Properties to return (None returns all)
+
+        Returns:
+            Dictionary with the images ("items") and the cursor of the next page
+            ("next_cursor", None after the last page)
+        """
+        check_properties(properties, IMAGE_PROPERTIES)
+        items, next_cursor = self.image_repository.read_page(IMAGE_TYPE, properties, limit, cursor)
+        return {"items": items, "next_cursor": next_cursor}
+
+    def iter_images(self, properties: Optional[List[str]] = None, page_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Iterate over all images, fetching them page by page (raises ValueError for unknown properties)."""
+        check_properties(properties, IMAGE_PROPERTIES)
+        return self.image_repository.iter_objects(type_filter=IMAGE_TYPE, properties=properties, page_size=page_size)
     
-    def upload_image(self, images: List[Image.Image], images_filename: List[str],
+    def upload_image(self, images: List[Image.Image], images_filename: List[str], images_content: List[bytes],
                     metadata: Optional[List[Dict[str, Any]]] = None) -> Dict[str, str]:
         """
         Upload image data to the vector database.
-        
+
         Args:
             images: List of PIL Image objects to upload
+            images_filename: List of original file names of the images
+            images_content: Raw file contents of the images (see _prepare_images)
             metadata: Optional list of metadata dictionaries for each image
         Returns:
             Dictionary with upload status message
         """
-        # Save images to local storage
-        image_paths = save_image(images, images_filename, metadata)
+        image_data, encoded = self._prepare_images(images, images_filename, images_content, metadata)
+        self.image_repository.update_image_data(image_data)
+        return {"message": f"Successfully uploaded {len(images)} image items ({encoded} encoded)"}
+
+    async def upload_image_async(self, images: List[Image.Image], images_filename: List[str],
+                                 images_content: List[bytes],
+                                 metadata: Optional[List[Dict[str, Any]]] = None) -> Dict[str, str]:
+        """
+        Async version of upload_image: hashing, saving and encoding run in
+        the thread pool, and the import goes through the async repository.
+        """
+        image_data, encoded = await run_in_threadpool(
+            self._prepare_images, images, images_filename, images_content, metadata
+        )
+        await self.async_repository.update_image_data(image_data)
+        return {"message": f"Successfully uploaded {len(images)} image items ({encoded} encoded)"}
+
+    async def upload_image_stream(self, entries: AsyncIterator[Entry],
+                                  metadata_for: Optional[Callable[[str, int], Dict[str, Any]]] = None,
+                                  batch_size: Optional[int] = None, max_failures: int = 100) -> Dict[str, Any]:
+        """
+        Upload images as they are received, in batches of batch_size.
+
+        Each batch is decoded in the thread pool and uploaded through
+        upload_image_async while the next one is being received, so at most
+        two batches are held in memory whatever the size of the upload.
+        Files that cannot be read or decoded fail on their own.
+
+        Args:
+            entries: (file name, content, error) per received file; content is None when error is set
+            metadata_for: Optional function returning the metadata of a file from
+                its name and its position in the upload
+            batch_size: Images per batch (defaults to UPLOAD_BATCH_SIZE)
+            max_failures: Maximum number of failures listed in the summary
+
+        Returns:
+            Dictionary with the number of files received, uploaded and failed,
+            the number of batches, and the failures (index, file name, error)
+        """
+        batch_size = max(1, batch_size or configs.UPLOAD_BATCH_SIZE)
+        summary = {"received": 0, "uploaded": 0, "failed": 0, "batches": 0, "failures": []}
+
+        def fail(index: int, filename: str, error: str) -> None:
+            summary["failed"] += 1
+            if len(summary["failures"]) < max_failures:
+                summary["failures"].append({"index": index, "filename": filename, "error": error})
+
+        async def upload(batch: List[Tuple[int, str, bytes, Dict[str, Any]]]) -> None:
+            decoded = await run_in_threadpool(_decode_batch, [content for _, _, content, _ in batch])
+            accepted = []
+            for (index, filename, content, item), (image, error) in zip(batch, decoded):
+                if error is not None:
+                    fail(index, filename, f"Could not decode image: {error}")
+                else:
+                    accepted.append((index, filename, content, item, image))
+            if not accepted:
+                return
+            _, filenames, contents, items, images = (list(column) for column in zip(*accepted))
+            try:
+                await self.upload_image_async(images, filenames, contents, items)
+            except InferenceSaturatedError:
+                # Overload fails the request (503/429), not individual files
+                raise
+            except Exception as e:
+                print(f"Streamed upload: batch of {len(accepted)} images failed: {str(e)}")
+                for index, filename, _, _, _ in accepted:
+                    fail(index, filename, f"Upload failed: {str(e)}")
+                return
+            summary["uploaded"] += len(accepted)
+
+        async def accepted_entries():
+            async for filename, content, error in entries:
+                index = summary["received"]
+                summary["received"] += 1
+                if error is not None:
+                    fail(index, filename, error)
+                    continue
+                yield index, filename, content, metadata_for(filename, index) if metadata_for else {}
+
+        summary["batches"] = await process_in_batches(accepted_entries(), batch_size, upload)
+        print(f"Streamed upload: {summary['uploaded']} of {summary['received']} images uploaded "
+              f"in {summary['batches']} batches")
+        return summary
+
+    async def search_by_images_async(self, images: List[Image.Image], images_content: Optional[List[bytes]] = None,
+                                     limit: int = 5) -> List[Any]:
+        """
+        Search for text with several image queries at once.
+
+        Query images whose content is already in the image embedding store
+        are not encoded again; the others are encoded in one forward pass
+        (off the event loop), and the vector lookups go to the async
+        repository together.
+
+        Args:
+            images: Query images (PIL Image objects)
+            images_content: Optional raw file contents of the images, used to look up stored embeddings
+            limit: Maximum number of results per query
+
+        Returns:
+            The search results of each query, in input order
+        """
+        def encode() -> List[Any]:
+            vectors = {}
+            if images_content is not None:
+                hashes = [content_hash(content) for content in images_content]
+                stored = image_embedding_store.get_many(hashes, resources.model_version)
+                vectors = {i: stored[h] for i, h in enumerate(hashes) if h in stored}
+            missing = [i for i in range(len(images)) if i not in vectors]
+            if missing:
+                encoded = resources.encode_images([images[i] for i in missing])["vectors"]
+                vectors.update(zip(missing, encoded))
+            return [vectors[i] for i in range(len(images))]
+
+        search_vectors = await run_in_threadpool(encode)
+        return await self.async_repository.read_by_vectors(
+            search_vectors=search_vectors,
+            type_filter=TEXT_TYPE,
+            limit=limit
+        )
+
+    def _prepare_images(self, images: List[Image.Image], images_filename: List[str], images_content: List[bytes],
+                        metadata: Optional[List[Dict[str, Any]]] = None):
+        """
+        Save images and build the items passed to update_image_data.
         
+        Images are identified by the SHA-256 of their file bytes: they are
+        saved under a content-addressed file name, and embeddings already in
+        the image embedding store are reused instead of running the model.
+        The bytes are required on every upload path, so the same file always
+        gets the same content hash and object id (decoded pixels would
+        depend on how the image was decoded).
+        
+        Args:
+            images: List of PIL Image objects to upload
+            images_filename: List of original file names of the images
+            images_content: Raw file contents of the images
+            metadata: Optional list of metadata dictionaries for each image
+        Returns:
+            (image_data, number of images encoded by the model)
+        """
         if metadata is None:
             metadata = [{} for _ in images]
-        for item in metadata:
-            # Add created_at timestamp to each metadata item
+        if len(images) != len(images_filename) or len(images) != len(metadata):
+            raise ValueError("Length of images, images_filename, and metadata must match")
+        if len(images_content) != len(images):
+            raise ValueError("Length of images and images_content must match")
+        
+        for item, name in zip(metadata, images_filename):
+            # Add created_at timestamp and original file name to each metadata item
             item['created_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-        if len(images) != len(image_paths) or len(images) != len(metadata):
-            raise ValueError("Length of images, image_paths, and metadata must match")
+            if name:
+                item.setdefault('filename', name)
         
-        image_data = []
+        # Key images by content hash and save them under content-addressed names
+        hashes = [content_hash(content) for content in images_content]
+        stored_filenames = [
+            f"{h}{os.path.splitext(name or '')[1].lower() or '.jpg'}"
+            for h, name in zip(hashes, images_filename)
+        ]
+        image_paths = save_image_content(images_content, stored_filenames)
         
-        for i, image in enumerate(images):
-            # Get image vector embedding
-            embedding = resources.encode_image(image)
+        # Reuse stored embeddings and only encode images not seen before
+        model_version = resources.model_version
+        vectors = image_embedding_store.get_many(hashes, model_version)
+        missing = {}
+        for i, h in enumerate(hashes):
+            if h not in vectors and h not in missing:
+                missing[h] = images[i]
+        if missing:
+            embeddings = resources.encode_images(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), embeddings["vectors"]))
+            image_embedding_store.put_many(new_vectors.items(), model_version)
+            vectors.update(new_vectors)
+        
+        image_data = []
+        for i, h in enumerate(hashes):
             # Create image data entry
             image_item = {
                 "image_path": image_paths[i],
-                "vector": embedding["vector"],
+                "content_hash": h,
+                "vector": vectors[h],
                 "metadata": metadata[i]
             }
             image_data.append(image_item)
-        
-        self.image_repository.update_image_data(image_data)
-        return {"message": f"Successfully uploaded {len(images)} image items"}
+        return image_data, len(missing)
     
     def search_by_image(self, image: Image.Image, limit: int = 5) -> List[Dict[str, Any]]:
         """
@@ -77,11 +272,34 @@ class ImageService(BaseService):
             List of search results
         """
         # Get image vector embedding
-        image_vector = resources.encode_image(image)["vector"]
+        image_vector = batched_resources.encode_image(image)["vector"]
         
         # Search in text repository using the image vector
         return self.image_repository.read_by_vector(
             search_vector=image_vector,
-            type_filter="Text",
+            type_filter=TEXT_TYPE,
             limit=limit
-        )
\ No newline at end of file
+        )
+
+    async def search_by_image_async(self, image: Image.Image, limit: int = 5):
+        """
+        Async version of search_by_image: the image is encoded off the event
+        loop and the search goes through the async repository.
+        """
+        image_vector = (await batched_resources.encode_image_async(image))["vector"]
+        return await self.async_repository.read_by_vector(
+            search_vector=image_vector,
+            type_filter=TEXT_TYPE,
+            limit=limit
+        )
+
+
+def _decode_batch(contents: List[bytes]) -> List[Tuple[Optional[Image.Image], Optional[str]]]:
+    """Decode images at model input resolution: (image, None) or (None, error) per content."""
+    decoded = []
+    for content in contents:
+        try:
+            decoded.append((decode_image(content, IMAGE_RESIZE), None))
+        except Exception as e:
+            decoded.append((None, str(e)))
+    return decoded
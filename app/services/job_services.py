@@ -0,0 +1,189 @@
+import os
+import shutil
+import threading
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import configs
+from app.services.image_services import ImageService
+from app.services.text_services import TextService
+from app.utils.inference_executor import InferenceSaturatedError
+from app.utils.job_store import job_store
+from app.utils.preprocess import decode_image
+from app.utils.vectorize import IMAGE_RESIZE
+
+
+class JobService:
+    """Queue ingestion jobs and report their progress."""
+
+    def submit_images(self, contents: List[bytes], filenames: List[str],
+                      metadata: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Spool uploaded images to disk and queue them as one job.
+
+        Args:
+            contents: Raw file contents of the images
+            filenames: Original file names of the images
+            metadata: Optional list of metadata dictionaries for each image
+
+        Returns:
+            The queued job (see JobStore.get_job)
+        """
+        if metadata is None:
+            metadata = [{} for _ in contents]
+        if len(contents) != len(filenames) or len(contents) != len(metadata):
+            raise ValueError("Length of images, images_filename, and metadata must match")
+        job_id = uuid.uuid4().hex
+        spool_dir = job_store.job_spool_dir(job_id)
+        os.makedirs(spool_dir, exist_ok=True)
+        payloads = []
+        for i, (content, filename, item) in enumerate(zip(contents, filenames, metadata)):
+            path = os.path.join(spool_dir, str(i))
+            with open(path, "wb") as f:
+                f.write(content)
+            payloads.append({"path": path, "filename": filename, "metadata": item or {}})
+        return job_store.create_job(job_id, "image", payloads)
+
+    def submit_texts(self, texts: List[str], metadata: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Queue texts as one job.
+
+        Args:
+            texts: List of text strings to upload
+            metadata: Optional list of metadata dictionaries for each text
+
+        Returns:
+            The queued job (see JobStore.get_job)
+        """
+        if metadata is None:
+            metadata = [{} for _ in texts]
+        if len(texts) != len(metadata):
+            raise ValueError("Length of texts and metadata must match")
+        payloads = [{"text": text, "metadata": item or {}} for text, item in zip(texts, metadata)]
+        return job_store.create_job(uuid.uuid4().hex, "text", payloads)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status, progress, throughput and item failures of a job (None if unknown)."""
+        return job_store.get_job(job_id)
+
+
+class JobWorker:
+    """
+    Background threads draining the job queue in batches of JOB_BATCH_SIZE
+    items, through ImageService.upload_image / TextService.upload_text.
+
+    Items that cannot be decoded fail on their own; when a whole batch
+    fails (e.g. the vector database is unreachable) its items go back to
+    the queue and are retried up to JOB_MAX_ATTEMPTS times. A batch refused
+    because inference is saturated goes back without using an attempt, and
+    the worker backs off (up to JOB_OVERLOAD_BACKOFF_MAX_S) before claiming again.
+    """
+    def __init__(self, image_service: Callable[[], ImageService], text_service: Callable[[], TextService],
+                 workers: int, batch_size: int, poll_interval: float) -> None:
+        """
+        Args:
+            image_service: Factory of the image service
+            text_service: Factory of the text service
+            workers: Number of worker threads
+            batch_size: Items claimed and uploaded at once
+            poll_interval: Seconds to wait when the queue is empty
+        """
+        self.image_service = image_service
+        self.text_service = text_service
+        self.workers = workers
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        """Start the worker threads (in the calling process)."""
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        print(f"Started {self.workers} ingestion job worker(s)")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop after the batches in progress (unfinished claims are retried after the lease)."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def _run(self) -> None:
+        backoff = 0.0
+        while not self._stop.is_set():
+            try:
+                claimed = job_store.claim(self.batch_size, configs.JOB_LEASE_S)
+            except Exception as e:
+                print(f"Could not claim ingestion job items: {str(e)}")
+                claimed = None
+            if claimed is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            job_id, kind, claimed_at, items = claimed
+            try:
+                if kind == "image":
+                    done, failures = self._process_images(items)
+                else:
+                    done, failures = self._process_texts(items)
+            except InferenceSaturatedError as e:
+                # Nothing wrong with the items: retry them once the model has capacity
+                job_store.requeue(job_id, [idx for idx, _ in items], claimed_at)
+                backoff = min(max(backoff * 2, e.retry_after, self.poll_interval), configs.JOB_OVERLOAD_BACKOFF_MAX_S)
+                print(f"Ingestion job {job_id}: inference saturated, retrying in {backoff:.1f}s")
+                self._stop.wait(backoff)
+                continue
+            except Exception as e:
+                print(f"Ingestion job {job_id}: batch of {len(items)} items failed: {str(e)}")
+                exhausted = job_store.release(
+                    job_id, [idx for idx, _ in items], str(e), configs.JOB_MAX_ATTEMPTS, claimed_at
+                )
+                self._remove_spooled(items, set(exhausted))
+                continue
+            backoff = 0.0
+            # Items re-claimed by another worker after the lease expired are
+            # left (with their spooled files) to that worker
+            finished = job_store.finish_items(job_id, done, failures, claimed_at)
+            self._remove_spooled(items, set(finished))
+            if job_store.get_job(job_id, max_failures=0)["finished_at"]:
+                shutil.rmtree(job_store.job_spool_dir(job_id), ignore_errors=True)
+
+    def _process_images(self, items: List[Tuple[int, Dict[str, Any]]]) -> Tuple[List[int], Dict[int, str]]:
+        indices, images, filenames, metadata, contents = [], [], [], [], []
+        failures = {}
+        for idx, payload in items:
+            try:
+                with open(payload["path"], "rb") as f:
+                    content = f.read()
+                images.append(decode_image(content, IMAGE_RESIZE))
+            except Exception as e:
+                failures[idx] = f"Could not decode image: {str(e)}"
+                continue
+            indices.append(idx)
+            filenames.append(payload["filename"])
+            metadata.append(payload["metadata"])
+            contents.append(content)
+        if images:
+            self.image_service().upload_image(images, filenames, contents, metadata)
+        return indices, failures
+
+    def _process_texts(self, items: List[Tuple[int, Dict[str, Any]]]) -> Tuple[List[int], Dict[int, str]]:
+        texts = [payload["text"] for _, payload in items]
+        metadata = [payload["metadata"] for _, payload in items]
+        self.text_service().upload_text(texts, metadata)
+        return [idx for idx, _ in items], {}
+
+    @staticmethod
+    def _remove_spooled(items: List[Tuple[int, Dict[str, Any]]], indices: set) -> None:
+        # Spooled files are only needed until their item is finished
+        for idx, payload in items:
+            if idx in indices and "path" in payload:
+                try:
+                    os.remove(payload["path"])
+                except OSError:
+                    pass
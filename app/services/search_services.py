@@ -1,6 +1,9 @@
 from app.repository.text_repository import TextRepository
+from app.repository.base_repository import IMAGE_TYPE, TEXT_TYPE
 from app.repository.image_repository import ImageRepository
 from app.utils.vectorize import resources
+from app.utils.batching import batched_resources
+from app.utils.embedding_cache import text_embedding_cache
 from app.core.config import configs
 
 
@@ -26,12 +29,14 @@ class SearchService:
             List of search results
         """
         # Get text vector embedding
-        text_vector = resources.encode_text(text)["vector"]
+        text_vector = text_embedding_cache.encode_text(
+            text, batched_resources.encode_text, resources.text_model_version
+        )["vector"]
         
         # Search in image repository using the text vector
         return self.image_repository.read_by_vector(
             search_vector=text_vector,
-            type_filter="Image",
+            type_filter=IMAGE_TYPE,
             limit=limit
         )
     
@@ -47,11 +52,11 @@ class SearchService:
             List of search results
         """
         # Get image vector embedding
-        image_vector = resources.encode_image(image)["vector"]
+        image_vector = batched_resources.encode_image(image)["vector"]
         
         # Search in text repository using the image vector
         return self.text_repository.read_by_vector(
             search_vector=image_vector,
-            type_filter="Text",
+            type_filter=TEXT_TYPE,
             limit=limit
         )
\ No newline at end of file
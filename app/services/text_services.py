@@ -1,17 +1,28 @@
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from app.repository.base_repository import IMAGE_TYPE
 from pathlib import Path
+from app.core.config import configs
 from app.repository.text_repository import TextRepository
 from app.services.weavite__service import BaseService
 from app.utils.vectorize import resources
+from app.utils.batching import batched_resources
+from app.utils.embedding_cache import text_embedding_cache
+from app.utils.upload_stream import Record, process_in_batches
+from app.utils.inference_executor import InferenceSaturatedError
 from typing import Dict, Any
 from datetime import datetime
 
 class TextService(BaseService):
     """Service for handling text operations in the repository."""
     
-    def __init__(self, text_repository: TextRepository) -> None:
-        """Initialize the service with the text repository."""
+    def __init__(self, text_repository: TextRepository, async_repository: Optional[Any] = None) -> None:
+        """
+        Initialize the service with the text repository, and optionally its
+        async counterpart (AsyncTextRepository) used by the *_async methods.
+        """
         self.text_repository = text_repository
+        self.async_repository = async_repository
         super().__init__(text_repository)
     
     def upload_text(self, texts: List[str], metadata: Optional[List[Dict[str, Any]]] = None) -> Dict[str, str]:
@@ -25,6 +36,77 @@ class TextService(BaseService):
         Returns:
             Dictionary with upload status message
         """
+        text_data = self._prepare_texts(texts, metadata)
+        
+        # Upload to repository
+        self.text_repository.update_text_data(text_data)
+        
+        return {"message": f"Successfully uploaded {len(texts)} text items"}
+
+    async def upload_text_async(self, texts: List[str],
+                                metadata: Optional[List[Dict[str, Any]]] = None) -> Dict[str, str]:
+        """
+        Async version of upload_text: encoding runs in the thread pool and
+        the import goes through the async repository.
+        """
+        text_data = await run_in_threadpool(self._prepare_texts, texts, metadata)
+        await self.async_repository.update_text_data(text_data)
+        return {"message": f"Successfully uploaded {len(texts)} text items"}
+
+    async def upload_text_stream(self, records: AsyncIterator[Record], batch_size: Optional[int] = None,
+                                 max_failures: int = 100) -> Dict[str, Any]:
+        """
+        Upload texts as they are received, in batches of batch_size.
+
+        Each batch is encoded and flushed through upload_text_async while
+        the next one is being received, so memory stays bounded whatever
+        the number of texts.
+
+        Args:
+            records: (line number, text, metadata, error) per received line; text is None when error is set
+            batch_size: Texts per batch (defaults to UPLOAD_TEXT_BATCH_SIZE)
+            max_failures: Maximum number of failed lines listed in the summary
+
+        Returns:
+            Dictionary with the number of lines received, uploaded and failed,
+            the number of batches, and the failed lines (line, error)
+        """
+        batch_size = max(1, batch_size or configs.UPLOAD_TEXT_BATCH_SIZE)
+        summary = {"received": 0, "uploaded": 0, "failed": 0, "batches": 0, "failures": []}
+
+        def fail(line: int, error: str) -> None:
+            summary["failed"] += 1
+            if len(summary["failures"]) < max_failures:
+                summary["failures"].append({"line": line, "error": error})
+
+        async def upload(batch: List[Tuple[int, str, Dict[str, Any]]]) -> None:
+            try:
+                await self.upload_text_async([text for _, text, _ in batch], [item for _, _, item in batch])
+            except InferenceSaturatedError:
+                # Overload fails the request (503/429), not individual lines
+                raise
+            except Exception as e:
+                print(f"Streamed upload: batch of {len(batch)} texts failed: {str(e)}")
+                for line, _, _ in batch:
+                    fail(line, f"Upload failed: {str(e)}")
+                return
+            summary["uploaded"] += len(batch)
+
+        async def valid_records():
+            async for line, text, metadata, error in records:
+                summary["received"] += 1
+                if error is not None:
+                    fail(line, error)
+                    continue
+                yield line, text, metadata
+
+        summary["batches"] = await process_in_batches(valid_records(), batch_size, upload)
+        print(f"Streamed upload: {summary['uploaded']} of {summary['received']} texts uploaded "
+              f"in {summary['batches']} batches")
+        return summary
+
+    def _prepare_texts(self, texts: List[str], metadata: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Encode texts and build the items passed to update_text_data."""
         if metadata is None:
             metadata = [{} for _ in texts]
         
@@ -35,24 +117,20 @@ class TextService(BaseService):
         if len(texts) != len(metadata):
             raise ValueError("Length of texts and metadata must match")
         
+        # Get text vector embeddings in batches
+        embeddings = resources.encode_texts(texts)
+        
         # Process and prepare text data
         text_data = []
         for i, text in enumerate(texts):
-            # Get text vector embedding
-            embedding = resources.encode_text(text)
-            
             # Create text data entry
             text_item = {
                 "text": text,
-                "vector": embedding["vector"],
+                "vector": embeddings["vectors"][i],
                 "metadata": metadata[i]
             }
             text_data.append(text_item)
-        
-        # Upload to repository
-        self.text_repository.update_text_data(text_data)
-        
-        return {"message": f"Successfully uploaded {len(texts)} text items"}
+        return text_data
     
 
     def search_by_text(self, text: str, limit: int = 5):
@@ -60,15 +138,63 @@ class TextService(BaseService):
         Search for images using text query.
         """
         # Get text vector embedding
-        text_vector = resources.encode_text(text)["vector"]
+        text_vector = text_embedding_cache.encode_text(
+            text, batched_resources.encode_text, resources.text_model_version
+        )["vector"]
         
         # Get raw results from repository
         raw_results = self.text_repository.read_by_vector(
             search_vector=text_vector,
-            type_filter="Image",
+            type_filter=IMAGE_TYPE,
             limit=limit
         )
         
+        return self._existing_image_paths(raw_results)
+
+    async def search_by_text_async(self, text: str, limit: int = 5):
+        """
+        Async version of search_by_text: cache misses are encoded off the
+        event loop and the search goes through the async repository.
+        """
+        text_vector = (await text_embedding_cache.encode_text_async(
+            text, batched_resources.encode_text_async, resources.text_model_version
+        ))["vector"]
+        raw_results = await self.async_repository.read_by_vector(
+            search_vector=text_vector,
+            type_filter=IMAGE_TYPE,
+            limit=limit
+        )
+        return await run_in_threadpool(self._existing_image_paths, raw_results)
+
+    async def search_by_texts_async(self, texts: List[str], limit: int = 5) -> List[List[str]]:
+        """
+        Search for images with several text queries at once.
+
+        Cache misses are encoded in one forward pass (off the event loop),
+        and the vector lookups go to the async repository together (one
+        multi-vector search on the local backend, concurrent requests on
+        Weaviate).
+
+        Args:
+            texts: Text queries
+            limit: Maximum number of results per query
+
+        Returns:
+            Image paths of the results of each query, in input order
+        """
+        embeddings = await run_in_threadpool(
+            text_embedding_cache.encode_texts, texts, resources.encode_texts, resources.text_model_version
+        )
+        raw_results = await self.async_repository.read_by_vectors(
+            search_vectors=[embedding["vector"] for embedding in embeddings],
+            type_filter=IMAGE_TYPE,
+            limit=limit
+        )
+        return await run_in_threadpool(lambda: [self._existing_image_paths(results) for results in raw_results])
+
+    @staticmethod
+    def _existing_image_paths(raw_results) -> List[str]:
+        """Image paths of the search results whose file exists."""
         image_paths = []
         for result in raw_results.objects:
             if result.properties.get("image_path"):
@@ -79,4 +205,3 @@ class TextService(BaseService):
                     print(f"Warning: Image file not found: {image_path}")
 
         return image_paths
-            
\ No newline at end of file
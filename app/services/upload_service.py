@@ -36,16 +36,16 @@ class UploadService:
         if len(texts) != len(metadata):
             raise ValueError("Length of texts and metadata must match")
         
+        # Get text vector embeddings in batches
+        embeddings = resources.encode_texts(texts)
+        
         # Process and prepare text data
         text_data = []
         for i, text in enumerate(texts):
-            # Get text vector embedding
-            embedding = resources.encode_text(text)
-            
             # Create text data entry
             text_item = {
                 "text": text,
-                "vector": embedding["vector"],
+                "vector": embeddings["vectors"][i],
                 "metadata": metadata[i]
             }
             text_data.append(text_item)
@@ -55,39 +55,32 @@ class UploadService:
         
         return {"message": f"Successfully uploaded {len(texts)} text items"}
     
-    def upload_image(self, images: List[Image.Image], 
+    def upload_image(self, images: List[Image.Image], images_filename: List[str],
                     metadata: Optional[List[Dict[str, Any]]] = None) -> Dict[str, str]:
         """
         Upload image data to the vector database.
         
         Args:
             images: List of PIL Image objects to upload
+            images_filename: List of file names used when saving the images
             metadata: Optional list of metadata dictionaries for each image
         Returns:
             Dictionary with upload status message
         """
         # Save images to local storage
-        image_paths = save_image(images, metadata)
-        # Turn images into base64 strings
-        image_base64_list = []
-        for image in images:
-            buffer = io.BytesIO()
-            image.save(buffer, format="JPEG")
-            image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            image_base64_list.append(image_base64)
-        images = image_base64_list
+        image_paths = save_image(images, images_filename, metadata)
         if metadata is None:
             metadata = [{} for _ in images]
         
         if len(images) != len(image_paths) or len(images) != len(metadata):
             raise ValueError("Length of images, image_paths, and metadata must match")
         
+        # Get image vector embeddings in batches
+        embeddings = resources.encode_images(images)
+        
         # Process and prepare image data
         image_data = []
         for i, image in enumerate(images):
-            # Get image vector embedding
-            embedding = resources.encode_image(image)
-            
             # Convert image to base64 for storage (optional)
             buffer = io.BytesIO()
             image.save(buffer, format="JPEG")
@@ -97,7 +90,7 @@ class UploadService:
             image_item = {
                 "image_path": image_paths[i],
                 "image_base64": image_base64,
-                "vector": embedding["vector"],
+                "vector": embeddings["vectors"][i],
                 "metadata": metadata[i]
             }
             image_data.append(image_item)
@@ -0,0 +1,208 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import configs
+from app.utils.inference_executor import InferenceSaturatedError
+from app.utils.vectorize import resources, SimpleClipResources
+
+
+class MicroBatcher:
+    """
+    Collect single items submitted from many threads into small batches.
+
+    A background thread waits for the first item, then keeps collecting
+    until either max_batch_size items are queued or max_wait_ms has passed,
+    and runs batch_fn once for the whole batch. Each caller gets back the
+    row of the result that belongs to its own item.
+
+    Like InferenceExecutor, the queue is bounded: when max_queue items are
+    already waiting, or a caller's result is not ready within timeout
+    seconds, the caller gets InferenceSaturatedError.
+    """
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch_size: int,
+                 max_wait_ms: float, name: str = "batcher", max_queue: int = 0,
+                 timeout: Optional[float] = None) -> None:
+        """
+        Args:
+            batch_fn: Function mapping a list of items to a list of results of the same length
+            max_batch_size: Maximum number of items passed to batch_fn at once
+            max_wait_ms: Maximum time to wait for more items after the first one arrives
+            name: Name of the worker thread
+            max_queue: Maximum number of queued items (0 = unbounded)
+            timeout: Maximum time in seconds a caller waits for its result (None = no limit)
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self._queue: "queue.Queue[tuple[Any, Future]]" = queue.Queue(self.max_queue)
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_pid: Optional[int] = None
+
+    def submit(self, item: Any) -> Future:
+        """Queue an item and return a future resolving to its result row."""
+        self._ensure_worker()
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((item, future))
+        except queue.Full:
+            raise InferenceSaturatedError(f"{self.name} queue is full")
+        return future
+
+    def process(self, item: Any) -> Any:
+        """Queue an item and block until its result row is available."""
+        future = self.submit(item)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Not started yet: the worker skips cancelled items
+            future.cancel()
+            raise InferenceSaturatedError(f"Timed out waiting for {self.name}")
+
+    async def process_async(self, item: Any) -> Any:
+        """Queue an item and await its result row without holding a thread."""
+        try:
+            # Cancelling the wrapper on timeout also cancels the queued item
+            return await asyncio.wait_for(asyncio.wrap_future(self.submit(item)), self.timeout)
+        except asyncio.TimeoutError:
+            raise InferenceSaturatedError(f"Timed out waiting for {self.name}")
+
+    def _ensure_worker(self) -> None:
+        # The worker is started lazily, and restarted in a forked child
+        # since threads do not survive fork()
+        if self._worker is not None and self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker_pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.max_queue)
+            self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def _collect(self) -> List[tuple]:
+        """Block for the first item, then gather more until the batch is full or the window closes."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            # Skip callers that gave up while waiting in the queue
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self.batch_fn([item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        f"{self.name}: batch function returned {len(results)} results for {len(batch)} items"
+                    )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+class BatchedClipResources:
+    """
+    Drop-in front for SimpleClipResources.encode_text / encode_image that
+    merges concurrent single-item calls into one forward pass per modality.
+    """
+    def __init__(self, resources: SimpleClipResources) -> None:
+        """Initialize one micro-batcher per modality."""
+        self.resources = resources
+        self.enabled = configs.BATCHING_ENABLED
+        # Same waiter limit and timeout as the inference executor (but room for at least one full batch)
+        max_queue = max(configs.INFERENCE_QUEUE_SIZE, configs.BATCH_MAX_SIZE)
+        self.text_batcher = MicroBatcher(
+            lambda texts: self.resources.encode_texts(texts)["vectors"],
+            max_batch_size=configs.BATCH_MAX_SIZE,
+            max_wait_ms=configs.BATCH_MAX_WAIT_MS,
+            name="text-batcher",
+            max_queue=max_queue,
+            timeout=configs.INFERENCE_QUEUE_TIMEOUT,
+        )
+        self.image_batcher = MicroBatcher(
+            lambda images: self.resources.encode_images(images)["vectors"],
+            max_batch_size=configs.BATCH_MAX_SIZE,
+            max_wait_ms=configs.BATCH_MAX_WAIT_MS,
+            name="image-batcher",
+            max_queue=max_queue,
+            timeout=configs.INFERENCE_QUEUE_TIMEOUT,
+        )
+
+    def encode_text(self, text: str):
+        """
+        Encode a single text, batched with concurrent callers.
+        """
+        if not self.enabled:
+            return self.resources.encode_text(text)
+        vector = self.text_batcher.process(text)
+        return {
+            "vector": vector,
+            "dim": len(vector)
+        }
+
+    def encode_image(self, image):
+        """
+        Encode a single image, batched with concurrent callers.
+        """
+        if not self.enabled:
+            return self.resources.encode_image(image)
+        vector = self.image_batcher.process(image)
+        return {
+            "vector": vector,
+            "dim": len(vector)
+        }
+
+    async def encode_text_async(self, text: str):
+        """
+        Encode a single text from a coroutine: awaits the batch result
+        without holding a thread (or runs unbatched in the thread pool).
+        """
+        if not self.enabled:
+            return await run_in_threadpool(self.resources.encode_text, text)
+        vector = await self.text_batcher.process_async(text)
+        return {
+            "vector": vector,
+            "dim": len(vector)
+        }
+
+    async def encode_image_async(self, image):
+        """
+        Encode a single image from a coroutine (see encode_text_async).
+        """
+        if not self.enabled:
+            return await run_in_threadpool(self.resources.encode_image, image)
+        vector = await self.image_batcher.process_async(image)
+        return {
+            "vector": vector,
+            "dim": len(vector)
+        }
+
+
+# Create a singleton instance
+batched_resources = BatchedClipResources(resources)
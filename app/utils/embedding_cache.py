@@ -0,0 +1,194 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.core.config import configs
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize a text query for use as a cache key.
+
+    Vietnamese text may arrive in composed or decomposed Unicode form, so the
+    text is NFC-normalized and whitespace is collapsed. Case is kept because
+    the PhoBERT tokenizer is case-sensitive.
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+class EmbeddingCache:
+    """
+    Bounded, thread-safe LRU cache for embeddings.
+
+    Entries are evicted least-recently-used first once max_size is reached,
+    and optionally expire ttl seconds after they were stored.
+    """
+    def __init__(self, max_size: int = 10000, ttl: Optional[float] = None) -> None:
+        """
+        Args:
+            max_size: Maximum number of entries kept in the cache (0 disables caching)
+            ttl: Optional lifetime of an entry in seconds
+        """
+        self.max_size = max(0, max_size)
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store value under key, evicting the least recently used entries if full."""
+        if self.max_size == 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for key, computing and storing it on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        """Remove all entries (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class TextEmbeddingCache(EmbeddingCache):
+    """
+    Cache of text query embeddings keyed on the normalized query and the model version.
+    """
+    def encode_text(self, text: str, encode: Callable[[str], Dict[str, Any]], model_version: str):
+        """
+        Return the embedding of text, calling encode only on a cache miss.
+
+        Args:
+            text: The text query
+            encode: Function returning {"vector", "dim"} for a text
+            model_version: Version of the model producing the embedding
+
+        Returns:
+            Dictionary with the vector and its dimension
+        """
+        text = normalize_query(text)
+        return self.get_or_compute((model_version, text), lambda: self._freeze(encode(text)))
+
+    async def encode_text_async(self, text: str, encode: Callable[[str], Awaitable[Dict[str, Any]]],
+                                model_version: str):
+        """
+        Async version of encode_text: encode is awaited on a cache miss.
+
+        Args:
+            text: The text query
+            encode: Coroutine function returning {"vector", "dim"} for a text
+            model_version: Version of the model producing the embedding
+
+        Returns:
+            Dictionary with the vector and its dimension
+        """
+        text = normalize_query(text)
+        key = (model_version, text)
+        embedding = self.get(key)
+        if embedding is None:
+            embedding = self._freeze(await encode(text))
+            self.put(key, embedding)
+        return embedding
+
+    def encode_texts(self, texts: List[str], encode: Callable[[List[str]], Dict[str, Any]],
+                     model_version: str) -> List[Dict[str, Any]]:
+        """
+        Return the embeddings of several texts, encoding all cache misses
+        (deduplicated) with a single call to encode.
+
+        Args:
+            texts: The text queries
+            encode: Function returning {"vectors", "dim"} for a list of texts
+                (e.g. SimpleClipResources.encode_texts)
+            model_version: Version of the model producing the embeddings
+
+        Returns:
+            One dictionary with the vector and its dimension per text, in input order
+        """
+        keys = [(model_version, normalize_query(text)) for text in texts]
+        embeddings = {}
+        missing = []
+        for key in keys:
+            if key in embeddings:
+                continue
+            embedding = self.get(key)
+            if embedding is None:
+                missing.append(key)
+                embeddings[key] = None
+            else:
+                embeddings[key] = embedding
+        if missing:
+            encoded = encode([text for _, text in missing])
+            for i, key in enumerate(missing):
+                embeddings[key] = self._freeze({"vector": encoded["vectors"][i], "dim": encoded["dim"]})
+                self.put(key, embeddings[key])
+        return [embeddings[key] for key in keys]
+
+    @staticmethod
+    def _freeze(embedding: Dict[str, Any]) -> Dict[str, Any]:
+        # Cached arrays are shared between requests, so make them read-only
+        vector = embedding["vector"]
+        if hasattr(vector, "setflags"):
+            vector.setflags(write=False)
+        return embedding
+
+
+# Create a singleton instance
+text_embedding_cache = TextEmbeddingCache(
+    max_size=configs.TEXT_CACHE_SIZE,
+    ttl=configs.TEXT_CACHE_TTL,
+)
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+from app.core.config import configs
+
+
+def content_hash(content: bytes) -> str:
+    """Return the SHA-256 hex digest of raw image bytes."""
+    return hashlib.sha256(content).hexdigest()
+
+
+class ImageEmbeddingStore:
+    """
+    Persistent on-disk store of image embeddings keyed by content hash.
+
+    Vectors are stored as little-endian float32 blobs in SQLite, keyed by
+    the SHA-256 of the raw image bytes and the model version, so an image
+    already seen by the same model never goes through the encoder again.
+    """
+    def __init__(self, path: str) -> None:
+        """Remember the database path; the file is opened on first use."""
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Callers hold self._lock
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS image_embeddings (
+                    content_hash TEXT NOT NULL,
+                    model_version TEXT NOT NULL,
+                    dim INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (content_hash, model_version)
+                )
+                """
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get_many(self, hashes: Iterable[str], model_version: str) -> Dict[str, np.ndarray]:
+        """
+        Look up stored embeddings.
+
+        Args:
+            hashes: Content hashes to look up
+            model_version: Version of the model the embeddings must come from
+
+        Returns:
+            Dictionary mapping each found content hash to its (read-only) float32 vector
+        """
+        hashes = list(dict.fromkeys(hashes))
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's host parameter limit
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._connection().execute(
+                    f"SELECT content_hash, vector FROM image_embeddings "
+                    f"WHERE model_version = ? AND content_hash IN ({placeholders})",
+                    [model_version, *chunk],
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype="<f4")
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, np.ndarray]], model_version: str) -> None:
+        """
+        Store embeddings, replacing any existing entry for the same hash and model.
+
+        Args:
+            items: Pairs of (content hash, vector)
+            model_version: Version of the model that produced the vectors
+        """
+        rows = []
+        for key, vector in items:
+            vector = np.asarray(vector, dtype="<f4")
+            rows.append((key, model_version, int(vector.shape[0]), vector.tobytes()))
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO image_embeddings (content_hash, model_version, dim, vector) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Create a singleton instance
+image_embedding_store = ImageEmbeddingStore(configs.EMBEDDING_STORE_PATH)
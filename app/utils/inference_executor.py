@@ -0,0 +1,130 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import configs
+
+
+class InferenceSaturatedError(Exception):
+    """Raised when no model slot is free and the wait queue is full or timed out."""
+    def __init__(self, message: str, retry_after: float = 1.0) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+_torch_threads_configured = False
+
+
+def configure_torch_threads(slots: int, workers: int = 1, num_threads: Optional[int] = None) -> None:
+    """
+    Pin torch's intra-op and inter-op thread pools, so that concurrent
+    model slots do not oversubscribe the CPU.
+
+    With TORCH_NUM_THREADS = 0 the cores are split evenly between the
+    slots of all worker processes.
+
+    Args:
+        slots: Number of concurrent model slots per process
+        workers: Number of worker processes sharing the machine
+        num_threads: Explicit intra-op thread count (overrides TORCH_NUM_THREADS)
+    """
+    global _torch_threads_configured
+    import torch
+
+    num_threads = num_threads or configs.TORCH_NUM_THREADS or max(1, (os.cpu_count() or 1) // max(1, slots * workers))
+    torch.set_num_threads(num_threads)
+    # The inter-op pool size can only be set once per process (and a forked
+    # worker inherits it from its parent), so only the first call sets it
+    if configs.TORCH_INTEROP_THREADS and not _torch_threads_configured:
+        try:
+            torch.set_num_interop_threads(configs.TORCH_INTEROP_THREADS)
+        except RuntimeError as e:
+            # Can only be set once, before any inter-op parallel work has started
+            print(f"Could not set torch inter-op threads: {str(e)}")
+    _torch_threads_configured = True
+    print(f"torch threads: {torch.get_num_threads()} intra-op, {torch.get_num_interop_threads()} inter-op")
+
+
+def torch_threads_configured() -> bool:
+    """Whether configure_torch_threads has already run in this process (or its parent)."""
+    return _torch_threads_configured
+
+
+class InferenceExecutor:
+    """
+    Limit how many forward passes run at once.
+
+    Callers take one of `slots` model slots; when all are busy, up to
+    `max_queue` callers wait (each at most `queue_timeout` seconds) and any
+    further caller is rejected immediately with InferenceSaturatedError.
+    """
+    def __init__(self, slots: int, max_queue: int, queue_timeout: float) -> None:
+        """
+        Args:
+            slots: Number of forward passes allowed to run concurrently
+            max_queue: Maximum number of callers waiting for a slot
+            queue_timeout: Maximum time in seconds a caller waits for a slot
+        """
+        self.slots = max(1, slots)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._semaphore = threading.BoundedSemaphore(self.slots)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @contextmanager
+    def slot(self):
+        """Hold a model slot for the duration of the block."""
+        if not self._semaphore.acquire(blocking=False):
+            with self._lock:
+                if self.waiting >= self.max_queue:
+                    self.rejected += 1
+                    raise InferenceSaturatedError("Inference queue is full")
+                self.waiting += 1
+            acquired = self._semaphore.acquire(timeout=self.queue_timeout)
+            with self._lock:
+                self.waiting -= 1
+                if not acquired:
+                    self.timed_out += 1
+            if not acquired:
+                raise InferenceSaturatedError("Timed out waiting for an inference slot")
+        with self._lock:
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+            self._semaphore.release()
+
+    def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn while holding a model slot."""
+        with self.slot():
+            return fn(*args, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return slot usage and rejection counters."""
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "max_queue": self.max_queue,
+                "active": self.active,
+                "waiting": self.waiting,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+
+
+# Create a singleton instance
+inference_executor = InferenceExecutor(
+    slots=configs.INFERENCE_SLOTS,
+    max_queue=configs.INFERENCE_QUEUE_SIZE,
+    queue_timeout=configs.INFERENCE_QUEUE_TIMEOUT,
+)
@@ -0,0 +1,264 @@
+import copy
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+# Rows processed at once when assigning vectors to centroids (bounds memory)
+_CHUNK_ROWS = 65536
+
+
+def _nearest(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid (L2) for every row of x."""
+    centroid_norms = (centroids * centroids).sum(1)
+    assign = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), _CHUNK_ROWS):
+        chunk = x[start:start + _CHUNK_ROWS]
+        # ||x||^2 is the same for every centroid, so it does not change the argmin
+        distances = centroid_norms[None, :] - 2.0 * (chunk @ centroids.T)
+        assign[start:start + len(chunk)] = distances.argmin(1)
+    return assign
+
+
+def kmeans(x: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Lloyd's k-means in NumPy.
+
+    Args:
+        x: (n, d) float32 training vectors
+        k: Number of centroids (at most n)
+        iterations: Number of assignment/update rounds
+        seed: Random seed for initialization and empty-cluster reseeding
+
+    Returns:
+        (k, d) float32 centroids
+    """
+    rng = np.random.default_rng(seed)
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), k, replace=False)].astype(np.float32, copy=True)
+    for _ in range(iterations):
+        assign = _nearest(x, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=k)
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[nonempty]
+        sums = np.add.reduceat(x[order], starts, axis=0)
+        centroids[nonempty] = sums / counts[nonempty, None]
+        # Reseed empty clusters on random training points
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = x[rng.choice(len(x), len(empty), replace=False)]
+    return centroids
+
+
+class IVFPQIndex:
+    """
+    Inverted-file index with product-quantized residuals (IVF-PQ).
+
+    A k-means coarse quantizer splits the vectors into `nlist` inverted
+    lists. Within a list, each vector is stored as the `m` byte codes of its
+    residual (vector - list centroid), one per dim/m-sized subspace, from
+    per-subspace codebooks of 256 centroids. A query scans only the `nprobe`
+    lists with the closest centroids, scoring codes with per-list distance
+    tables (asymmetric distance computation), and the best `rerank`
+    candidates can then be re-scored exactly against the original vectors.
+
+    Row ids are the caller's row numbers, so the index can be filtered with
+    a boolean mask over rows (deleted rows, other types).
+    """
+    def __init__(self, nlist: int, m: int, nbits: int = 8) -> None:
+        """
+        Args:
+            nlist: Number of inverted lists (coarse centroids)
+            m: Number of PQ subspaces (must divide the vector dimension)
+            nbits: Bits per PQ code (8 → 256 codewords per subspace)
+        """
+        self.nlist = nlist
+        self.m = m
+        self.ksub = 2 ** nbits
+        self.centroids: Optional[np.ndarray] = None  # (nlist, d)
+        self.codebooks: Optional[np.ndarray] = None  # (m, ksub, d / m)
+        self.trained_rows = 0
+        # One past the largest row id added, so callers know where to resume
+        self.next_row = 0
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._lists = np.zeros(0, dtype=np.int32)
+        self._codes = np.zeros((0, m), dtype=np.uint8)
+        self._csr: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def ntotal(self) -> int:
+        """Number of indexed rows."""
+        return len(self._ids)
+
+    def train(self, vectors: np.ndarray, sample_size: int = 65536, iterations: int = 10, seed: int = 0) -> None:
+        """
+        Train the coarse quantizer and the PQ codebooks on a sample of vectors.
+
+        Args:
+            vectors: (n, d) training vectors
+            sample_size: Maximum number of vectors used for training
+            iterations: k-means iterations
+            seed: Random seed
+        """
+        dim = vectors.shape[1]
+        if dim % self.m:
+            raise ValueError(f"PQ subspaces ({self.m}) must divide the vector dimension ({dim})")
+        rng = np.random.default_rng(seed)
+        if len(vectors) > sample_size:
+            sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))], dtype=np.float32)
+        else:
+            sample = np.asarray(vectors, dtype=np.float32)
+        self.centroids = kmeans(sample, self.nlist, iterations, seed)
+        self.nlist = len(self.centroids)
+        residuals = sample - self.centroids[_nearest(sample, self.centroids)]
+        dsub = dim // self.m
+        self.codebooks = np.stack([
+            kmeans(np.ascontiguousarray(residuals[:, j * dsub:(j + 1) * dsub]), self.ksub, iterations, seed + j + 1)
+            for j in range(self.m)
+        ])
+        self.trained_rows = len(vectors)
+
+    def _encode(self, residuals: np.ndarray) -> np.ndarray:
+        dsub = residuals.shape[1] // self.m
+        codes = np.empty((len(residuals), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = _nearest(np.ascontiguousarray(residuals[:, j * dsub:(j + 1) * dsub]), self.codebooks[j])
+        return codes
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        """
+        Encode vectors and append them to their inverted lists.
+
+        Args:
+            vectors: (n, d) vectors
+            ids: (n,) row ids returned by search
+        """
+        if len(vectors) == 0:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        lists = _nearest(vectors, self.centroids)
+        codes = self._encode(vectors - self.centroids[lists])
+        self._ids = np.concatenate([self._ids, np.asarray(ids, dtype=np.int64)])
+        self._lists = np.concatenate([self._lists, lists.astype(np.int32)])
+        self._codes = np.concatenate([self._codes, codes])
+        self.next_row = max(self.next_row, int(np.max(ids)) + 1)
+        self._csr = None
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        # Group entries by list once after additions (CSR layout); built
+        # as one tuple so concurrent searches never see a mismatched pair
+        csr = self._csr
+        if csr is None:
+            lists = self._lists
+            order = np.argsort(lists, kind="stable")
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=self.nlist))])
+            csr = self._csr = (order, offsets)
+        return csr
+
+    def snapshot(self) -> "IVFPQIndex":
+        """
+        Read-only copy of the current entries for searching without a lock:
+        add() replaces the entry arrays rather than growing them in place,
+        so the copy keeps the ids, codes and inverted lists of this moment.
+        """
+        view = copy.copy(self)
+        view._csr = self._inverted_lists()
+        return view
+
+    def search(self, query: np.ndarray, k: int, nprobe: int = 16, rerank: int = 0,
+               vectors: Optional[np.ndarray] = None,
+               mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate nearest neighbours of one query.
+
+        Args:
+            query: (d,) query vector
+            k: Number of results
+            nprobe: Number of inverted lists scanned
+            rerank: Number of best PQ candidates re-scored exactly (0 disables)
+            vectors: Original (rows, d) vectors indexed by row id, needed for rerank
+            mask: Optional boolean array over row ids; False rows are skipped
+
+        Returns:
+            (ids, scores): row ids and inner-product scores, best first
+            (exact when re-ranked, otherwise estimated from PQ distances for
+            unit vectors)
+        """
+        query = np.asarray(query, dtype=np.float32).ravel()
+        order, offsets = self._inverted_lists()
+        nprobe = min(nprobe, self.nlist)
+        coarse = ((self.centroids - query) ** 2).sum(1)
+        probes = np.argpartition(coarse, nprobe - 1)[:nprobe] if nprobe < self.nlist else np.arange(self.nlist)
+
+        dsub = query.shape[0] // self.m
+        codebook_norms = (self.codebooks ** 2).sum(2)  # (m, ksub)
+        subspaces = np.arange(self.m)
+        candidate_ids, candidate_distances = [], []
+        for list_id in probes:
+            entries = order[offsets[list_id]:offsets[list_id + 1]]
+            if len(entries) == 0:
+                continue
+            ids = self._ids[entries]
+            if mask is not None:
+                # Rows added after the mask was taken are not searchable yet
+                keep = ids < len(mask)
+                keep[keep] = mask[ids[keep]]
+                entries, ids = entries[keep], ids[keep]
+                if len(entries) == 0:
+                    continue
+            # Distance table between the query residual and every codeword
+            residual = (query - self.centroids[list_id]).reshape(self.m, dsub)
+            table = (residual ** 2).sum(1)[:, None] - 2.0 * np.einsum("md,mkd->mk", residual, self.codebooks) + codebook_norms
+            distances = table[subspaces, self._codes[entries]].sum(1)
+            candidate_ids.append(ids)
+            candidate_distances.append(distances)
+        if not candidate_ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        ids = np.concatenate(candidate_ids)
+        distances = np.concatenate(candidate_distances)
+        if rerank and vectors is not None:
+            shortlist = min(max(rerank, k), len(ids))
+            top = np.argpartition(distances, shortlist - 1)[:shortlist]
+            ids = ids[top]
+            # Gather rows in file order (sequential reads on a memmap)
+            rows = np.sort(ids)
+            scores = np.asarray(vectors[rows], dtype=np.float32) @ query
+            ids = rows
+        else:
+            # ||q - x||^2 = 2 - 2 q.x for unit vectors
+            scores = 1.0 - distances / 2.0
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return ids[top], scores[top]
+
+    def save(self, path: str) -> None:
+        """Write the index to an .npz file (atomically replaced)."""
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            centroids=self.centroids, codebooks=self.codebooks, trained_rows=self.trained_rows, next_row=self.next_row,
+            ids=self._ids, lists=self._lists, codes=self._codes, m=self.m, ksub=self.ksub,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFPQIndex":
+        """Read an index written by save()."""
+        with np.load(path) as data:
+            index = cls(nlist=len(data["centroids"]), m=int(data["m"]), nbits=int(np.log2(int(data["ksub"]))))
+            index.centroids = data["centroids"]
+            index.codebooks = data["codebooks"]
+            index.trained_rows = int(data["trained_rows"])
+            index.next_row = int(data["next_row"])
+            index._ids = data["ids"]
+            index._lists = data["lists"]
+            index._codes = data["codes"]
+        return index
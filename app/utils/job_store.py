@@ -0,0 +1,316 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import configs
+
+
+# Job states: queued → running → completed (some items may have failed) or failed (all items failed)
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class JobStore:
+    """
+    Persistent queue of ingestion jobs in SQLite.
+
+    A job is a list of items (one image or one text each) that background
+    workers claim in batches. A claim is a lease: items claimed by a worker
+    that died are claimed again once the lease expires, so queued and
+    in-flight work survives a restart. Several processes (app.serve
+    workers) can share the database; claims are made in IMMEDIATE
+    transactions so an item is never handed to two workers at once.
+    """
+    def __init__(self, path: str, spool_dir: str) -> None:
+        """
+        Args:
+            path: SQLite database file (opened on first use)
+            spool_dir: Directory holding uploaded files until their job item is processed
+        """
+        self.path = path
+        self.spool_dir = spool_dir
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Callers hold self._lock; a forked process opens its own connection
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._conn_pid = os.getpid()
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    total INTEGER NOT NULL,
+                    processed INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS job_items (
+                    job_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    claimed_at REAL,
+                    error TEXT,
+                    PRIMARY KEY (job_id, idx)
+                );
+                CREATE INDEX IF NOT EXISTS job_items_status ON job_items (status, job_id);
+                """
+            )
+        return self._conn
+
+    def job_spool_dir(self, job_id: str) -> str:
+        """Directory for the uploaded files of a job."""
+        return os.path.join(self.spool_dir, job_id)
+
+    def create_job(self, job_id: str, kind: str, payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Queue a job.
+
+        Args:
+            job_id: Unique job id
+            kind: "image" or "text"
+            payloads: One JSON-serializable payload per item
+
+        Returns:
+            The job, as returned by get_job
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT INTO jobs (id, kind, status, total, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (job_id, kind, QUEUED, len(payloads), now),
+                )
+                conn.executemany(
+                    "INSERT INTO job_items (job_id, idx, payload) VALUES (?, ?, ?)",
+                    [(job_id, i, json.dumps(payload)) for i, payload in enumerate(payloads)],
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get_job(job_id)
+
+    def claim(self, limit: int, lease: float) -> Optional[Tuple[str, str, float, List[Tuple[int, Dict[str, Any]]]]]:
+        """
+        Claim up to `limit` items of the oldest job with work left.
+
+        Args:
+            limit: Maximum number of items
+            lease: Seconds after which unfinished claimed items can be claimed again
+
+        Returns:
+            (job_id, kind, claimed_at, [(index, payload), ...]), or None when the
+            queue is empty; claimed_at identifies the claim in finish_items / release
+        """
+        now = time.time()
+        claimable = "(i.status = 'queued' OR (i.status = 'running' AND i.claimed_at < ?))"
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    f"SELECT j.id, j.kind FROM job_items i JOIN jobs j ON j.id = i.job_id "
+                    f"WHERE {claimable} ORDER BY j.created_at LIMIT 1",
+                    (now - lease,),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                job_id, kind = row
+                items = conn.execute(
+                    f"SELECT i.idx, i.payload FROM job_items i "
+                    f"WHERE i.job_id = ? AND {claimable} ORDER BY i.idx LIMIT ?",
+                    (job_id, now - lease, limit),
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE job_items SET status = 'running', claimed_at = ?, attempts = attempts + 1 "
+                    "WHERE job_id = ? AND idx = ?",
+                    [(now, job_id, idx) for idx, _ in items],
+                )
+                conn.execute(
+                    "UPDATE jobs SET status = ?, started_at = COALESCE(started_at, ?) WHERE id = ?",
+                    (RUNNING, now, job_id),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return job_id, kind, now, [(idx, json.loads(payload)) for idx, payload in items]
+
+    def finish_items(self, job_id: str, done: List[int], failures: Dict[int, str], claimed_at: float) -> List[int]:
+        """
+        Record the outcome of claimed items, and finish the job when no item is left.
+
+        Only items still held by this claim are updated: if the lease expired
+        and another worker claimed them again, that worker's outcome counts.
+
+        Args:
+            job_id: Job id
+            done: Indices of items written successfully
+            failures: Error message per failed item index
+            claimed_at: Claim the items were returned with (see claim)
+
+        Returns:
+            Indices of the items updated (those still held by this claim)
+        """
+        now = time.time()
+        claimed = "job_id = ? AND idx = ? AND status = 'running' AND claimed_at = ?"
+        finished_done, finished_failed = [], []
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for idx in done:
+                    if conn.execute(
+                        f"UPDATE job_items SET status = 'done', error = NULL WHERE {claimed}",
+                        (job_id, idx, claimed_at),
+                    ).rowcount:
+                        finished_done.append(idx)
+                for idx, error in failures.items():
+                    if conn.execute(
+                        f"UPDATE job_items SET status = 'failed', error = ? WHERE {claimed}",
+                        (error, job_id, idx, claimed_at),
+                    ).rowcount:
+                        finished_failed.append(idx)
+                conn.execute(
+                    "UPDATE jobs SET processed = processed + ?, failed = failed + ? WHERE id = ?",
+                    (len(finished_done), len(finished_failed), job_id),
+                )
+                left = conn.execute(
+                    "SELECT COUNT(*) FROM job_items WHERE job_id = ? AND status IN ('queued', 'running')",
+                    (job_id,),
+                ).fetchone()[0]
+                if left == 0:
+                    conn.execute(
+                        "UPDATE jobs SET status = CASE WHEN processed = 0 AND failed > 0 THEN ? ELSE ? END, "
+                        "finished_at = ? WHERE id = ?",
+                        (FAILED, COMPLETED, now, job_id),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return finished_done + finished_failed
+
+    def release(self, job_id: str, indices: List[int], error: str, max_attempts: int,
+                claimed_at: float) -> List[int]:
+        """
+        Return claimed items to the queue after a failed attempt, or fail
+        them once they have been attempted max_attempts times. Items no
+        longer held by this claim (see finish_items) are left alone.
+
+        Returns:
+            Indices of the items that failed for good
+        """
+        with self._lock:
+            conn = self._connection()
+            placeholders = ",".join("?" * len(indices))
+            claimed = f"job_id = ? AND idx IN ({placeholders}) AND status = 'running' AND claimed_at = ?"
+            exhausted = [
+                idx for (idx,) in conn.execute(
+                    f"SELECT idx FROM job_items WHERE {claimed} AND attempts >= ?",
+                    (job_id, *indices, claimed_at, max_attempts),
+                ).fetchall()
+            ]
+            conn.execute(
+                f"UPDATE job_items SET status = 'queued', claimed_at = NULL, error = ? "
+                f"WHERE {claimed} AND attempts < ?",
+                (error, job_id, *indices, claimed_at, max_attempts),
+            )
+        if exhausted:
+            self.finish_items(job_id, [], {idx: error for idx in exhausted}, claimed_at)
+        return exhausted
+
+    def requeue(self, job_id: str, indices: List[int], claimed_at: float) -> None:
+        """
+        Return claimed items to the queue without counting the attempt
+        (the batch was refused, e.g. because inference was saturated).
+        Items no longer held by this claim are left alone.
+        """
+        with self._lock:
+            conn = self._connection()
+            placeholders = ",".join("?" * len(indices))
+            conn.execute(
+                f"UPDATE job_items SET status = 'queued', claimed_at = NULL, attempts = MAX(attempts - 1, 0) "
+                f"WHERE job_id = ? AND idx IN ({placeholders}) AND status = 'running' AND claimed_at = ?",
+                (job_id, *indices, claimed_at),
+            )
+
+    def get_job(self, job_id: str, max_failures: int = 100) -> Optional[Dict[str, Any]]:
+        """
+        Job status, progress, throughput and (up to max_failures) item failures.
+
+        Returns:
+            Dictionary describing the job, or None if it does not exist
+        """
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT id, kind, status, total, processed, failed, created_at, started_at, finished_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            failures = conn.execute(
+                "SELECT idx, payload, error FROM job_items WHERE job_id = ? AND status = 'failed' "
+                "ORDER BY idx LIMIT ?",
+                (job_id, max_failures),
+            ).fetchall()
+        job_id, kind, status, total, processed, failed, created_at, started_at, finished_at = row
+        elapsed = ((finished_at or time.time()) - started_at) if started_at else 0.0
+        return {
+            "id": job_id,
+            "kind": kind,
+            "status": status,
+            "total": total,
+            "processed": processed,
+            "failed": failed,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "items_per_second": (processed + failed) / elapsed if elapsed > 0 else 0.0,
+            "failures": [
+                {"index": idx, "item": _describe(json.loads(payload)), "error": error}
+                for idx, payload, error in failures
+            ],
+        }
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            if self._conn is not None and self._conn_pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+def _describe(payload: Dict[str, Any]) -> str:
+    """Short description of a job item for failure reports (file name or text prefix)."""
+    if "filename" in payload:
+        return payload["filename"]
+    return payload.get("text", "")[:100]
+
+
+# Create a singleton instance
+job_store = JobStore(configs.JOB_STORE_PATH, configs.JOB_SPOOL_DIR)
@@ -0,0 +1,503 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.utils.ivfpq import IVFPQIndex
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process only
+    fcntl = None
+
+
+@dataclass
+class LocalObject:
+    """A stored object, shaped like the Weaviate client's result objects."""
+    uuid: str
+    properties: Dict[str, Any]
+    distance: Optional[float] = None
+
+
+@dataclass
+class LocalQueryResult:
+    """Search result exposing `.objects`, like the Weaviate client's QueryReturn."""
+    objects: List[LocalObject] = field(default_factory=list)
+
+
+class LocalVectorStore:
+    """
+    In-process exact vector store.
+
+    Vectors live in a float32 matrix file (one row per write, appended and
+    read through np.memmap), and objects in a sidecar JSON-lines append log
+    mapping each UUID to its row, properties and type. Updating an object
+    appends a new row and tombstones the old one; deleting only appends a
+    tombstone, so ingestion never rewrites existing data.
+
+    Searches are one matrix-vector product over the memory-mapped matrix
+    followed by an argpartition top-k, restricted to live rows of the
+    requested type. Vectors are expected to be L2-normalized, so the score
+    is the cosine similarity and the reported distance is 1 - cosine, as
+    with Weaviate's cosine metric.
+
+    Several processes (e.g. forked server workers) can share one store:
+    writes are serialized with a file lock, and every read first replays
+    any log lines appended by other processes.
+
+    With index="ivfpq", stores of at least index_min_rows rows are searched
+    through an IVF-PQ index instead (see app.utils.ivfpq): trained in a
+    background thread once a search finds the store past the threshold (or
+    with build_index()), extended with new rows as they arrive, persisted
+    next to the vectors, and retrained in the background once the store
+    has doubled since the last training. Searches stay exact (or keep the
+    previous index) until a new index is swapped in.
+    """
+    VECTORS_FILE = "vectors.f32"
+    LOG_FILE = "log.jsonl"
+    LOCK_FILE = "store.lock"
+    INDEX_FILE = "ivfpq.npz"
+    INDEX_BUILD_LOCK_FILE = "ivfpq.lock"
+    # Retrain the index once the store has grown by this factor
+    INDEX_REBUILD_GROWTH = 2.0
+    # Persist incremental additions once they exceed this fraction of the index
+    INDEX_SAVE_FRACTION = 0.1
+
+    def __init__(self, path: str, type_property: str = "type", index: str = "flat",
+                 index_min_rows: int = 20000, nlist: int = 0, pq_m: int = 32,
+                 nprobe: int = 16, rerank_factor: int = 10) -> None:
+        """
+        Args:
+            path: Directory holding the vectors file and the append log
+            type_property: Object property searches filter on
+            index: "flat" (exact scan) or "ivfpq" (approximate)
+            index_min_rows: Below this many rows searches stay exact
+            nlist: Number of IVF lists (0 = 4 * sqrt(rows))
+            pq_m: Number of PQ subspaces (must divide the vector dimension)
+            nprobe: Number of IVF lists scanned per query
+            rerank_factor: limit * rerank_factor PQ candidates are re-scored exactly (0 disables)
+        """
+        if index not in ("flat", "ivfpq"):
+            raise ValueError(f"Unknown local index type: {index}")
+        self.path = path
+        self.type_property = type_property
+        self.index_type = index
+        self.index_min_rows = index_min_rows
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.nprobe = nprobe
+        self.rerank_factor = rerank_factor
+        self._index: Optional[IVFPQIndex] = None
+        self._index_mtime: Optional[float] = None
+        self._index_saved_rows = 0
+        self._index_build: Optional[threading.Thread] = None
+        self._index_build_pid: Optional[int] = None
+        self._lock = threading.RLock()
+        self._write_depth = 0
+        self._log_offset = 0
+        self._dim: Optional[int] = None
+        self._num_rows = 0
+        self._rows: Dict[str, int] = {}
+        self._row_uuids: List[Optional[str]] = []
+        self._row_properties: List[Optional[Dict[str, Any]]] = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._types = np.zeros(0, dtype=np.int32)
+        self._type_codes: Dict[str, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @contextmanager
+    def _write_lock(self):
+        # Serialize writers across threads and processes. Reentrant: flock
+        # on a second descriptor would block on our own lock
+        with self._lock:
+            if fcntl is None or self._write_depth:
+                self._write_depth += 1
+                try:
+                    yield
+                finally:
+                    self._write_depth -= 1
+                return
+            os.makedirs(self.path, exist_ok=True)
+            with open(self._file(self.LOCK_FILE), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._write_depth += 1
+                try:
+                    yield
+                finally:
+                    self._write_depth -= 1
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _type_code(self, value: Any) -> int:
+        if value is None:
+            return -1
+        return self._type_codes.setdefault(str(value), len(self._type_codes))
+
+    def _grow(self, num_rows: int) -> None:
+        if num_rows <= len(self._alive):
+            return
+        capacity = max(num_rows, 2 * len(self._alive), 1024)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self._alive)] = self._alive
+        types = np.full(capacity, -1, dtype=np.int32)
+        types[:len(self._types)] = self._types
+        self._alive, self._types = alive, types
+        self._row_uuids.extend([None] * (capacity - len(self._row_uuids)))
+        self._row_properties.extend([None] * (capacity - len(self._row_properties)))
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        """Apply one log record to the in-memory index."""
+        uuid = record["uuid"]
+        old_row = self._rows.pop(uuid, None)
+        if old_row is not None:
+            self._alive[old_row] = False
+            self._row_properties[old_row] = None
+        if record["op"] != "upsert":
+            return
+        row = record["row"]
+        if self._dim is None:
+            self._dim = record["dim"]
+        self._grow(row + 1)
+        self._rows[uuid] = row
+        self._row_uuids[row] = uuid
+        self._row_properties[row] = record["properties"]
+        self._alive[row] = True
+        self._types[row] = self._type_code(record["properties"].get(self.type_property))
+        self._num_rows = max(self._num_rows, row + 1)
+
+    def refresh(self) -> None:
+        """Replay log records appended since the last call (by any process)."""
+        with self._lock:
+            log_path = self._file(self.LOG_FILE)
+            if not os.path.exists(log_path) or os.path.getsize(log_path) == self._log_offset:
+                return
+            with open(log_path, "rb") as f:
+                f.seek(self._log_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # Partially written record (crash or concurrent append): retry later
+                        break
+                    self._log_offset += len(line)
+                    if line.strip():
+                        self._apply(json.loads(line))
+
+    def _vectors(self) -> Optional[np.ndarray]:
+        """Memory-map the rows referenced by the log (callers hold self._lock)."""
+        if self._num_rows == 0:
+            return None
+        if self._matrix is None or self._matrix.shape[0] != self._num_rows:
+            self._matrix = np.memmap(
+                self._file(self.VECTORS_FILE), dtype="<f4", mode="r", shape=(self._num_rows, self._dim)
+            )
+        return self._matrix
+
+    def _append_log(self, lines: List[str]) -> None:
+        """Append records to the log and apply them (callers hold the write lock)."""
+        log_path = self._file(self.LOG_FILE)
+        with open(log_path, "ab") as f:
+            if f.tell() > self._log_offset:
+                # Writers are serialized, so anything past the replayed offset
+                # is a partial record from an interrupted write
+                f.truncate(self._log_offset)
+            f.write(("\n".join(lines) + "\n").encode("utf-8"))
+        self.refresh()
+
+    def upsert(self, objects: Sequence[Tuple[str, Any, Dict[str, Any]]]) -> None:
+        """
+        Insert or replace objects.
+
+        Args:
+            objects: (uuid, vector, properties) tuples; properties must be JSON-serializable
+        """
+        if not objects:
+            return
+        vectors = np.ascontiguousarray(np.stack([np.asarray(v, dtype=np.float32).ravel() for _, v, _ in objects]), dtype="<f4")
+        with self._write_lock():
+            self.refresh()
+            if self._dim is not None and vectors.shape[1] != self._dim:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} does not match store dimension {self._dim}")
+            dim = vectors.shape[1]
+            row_bytes = dim * vectors.itemsize
+
+            # Vectors first, then the log lines pointing at them, so the log
+            # never references rows that are not on disk
+            os.makedirs(self.path, exist_ok=True)
+            vectors_path = self._file(self.VECTORS_FILE)
+            with open(vectors_path, "ab") as f:
+                start_row = f.tell() // row_bytes
+                if f.tell() != start_row * row_bytes:
+                    # Drop a partial row left by an interrupted write
+                    f.truncate(start_row * row_bytes)
+                    f.seek(start_row * row_bytes)
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            lines = [
+                json.dumps({"op": "upsert", "uuid": str(uuid), "row": start_row + i, "dim": dim, "properties": properties},
+                           ensure_ascii=False)
+                for i, (uuid, _, properties) in enumerate(objects)
+            ]
+            self._append_log(lines)
+
+    def delete(self, uuid: str) -> bool:
+        """
+        Tombstone an object.
+
+        Returns:
+            Whether the object existed
+        """
+        with self._write_lock():
+            self.refresh()
+            if uuid not in self._rows:
+                return False
+            self._append_log([json.dumps({"op": "delete", "uuid": uuid})])
+            return True
+
+    def get(self, uuid: str) -> Optional[LocalObject]:
+        """Return a live object by UUID, or None."""
+        with self._lock:
+            self.refresh()
+            row = self._rows.get(uuid)
+            if row is None:
+                return None
+            return LocalObject(uuid=uuid, properties=self._row_properties[row])
+
+    def objects(self, type_filter: Optional[str] = None) -> Iterable[LocalObject]:
+        """Return all live objects (of one type, if given) in insertion order."""
+        with self._lock:
+            self.refresh()
+            mask = self._alive[:self._num_rows]
+            if type_filter is not None:
+                mask = mask & (self._types[:self._num_rows] == self._type_codes.get(type_filter, -2))
+            return [
+                LocalObject(uuid=self._row_uuids[row], properties=self._row_properties[row])
+                for row in np.flatnonzero(mask)
+            ]
+
+    def page(self, type_filter: Optional[str] = None, after_row: int = -1,
+             limit: int = 100) -> Tuple[List[LocalObject], Optional[int]]:
+        """
+        Return live objects stored after a given row, in insertion order.
+
+        Args:
+            type_filter: Only return objects of this type
+            after_row: Row of the last object of the previous page (-1 for the first page)
+            limit: Page size
+
+        Returns:
+            (objects, last_row); last_row is None after the last page
+        """
+        with self._lock:
+            self.refresh()
+            start = after_row + 1
+            mask = self._alive[start:self._num_rows]
+            if type_filter is not None:
+                mask = mask & (self._types[start:self._num_rows] == self._type_codes.get(type_filter, -2))
+            rows = np.flatnonzero(mask)[:limit + 1] + start
+            objects = [
+                LocalObject(uuid=self._row_uuids[row], properties=self._row_properties[row])
+                for row in rows[:limit]
+            ]
+        if len(rows) <= limit:
+            return objects, None
+        return objects, int(rows[limit - 1])
+
+    def search(self, vector: Any, type_filter: Optional[str] = None, limit: int = 5,
+               rerank: Optional[int] = None) -> List[LocalObject]:
+        """
+        Nearest-neighbour search by cosine similarity (exact, or through the
+        IVF-PQ index with exact re-ranking once the store is large enough).
+
+        Args:
+            vector: Query vector (L2-normalized)
+            type_filter: Only return objects whose type property equals this value
+            limit: Maximum number of results
+            rerank: IVF-PQ candidates re-scored exactly (defaults to limit * rerank_factor)
+
+        Returns:
+            Objects ordered by increasing distance (1 - cosine similarity)
+        """
+        return self.search_many([vector], type_filter=type_filter, limit=limit, rerank=rerank)[0]
+
+    def search_many(self, vectors: Sequence[Any], type_filter: Optional[str] = None, limit: int = 5,
+                    rerank: Optional[int] = None) -> List[List[LocalObject]]:
+        """
+        Search several query vectors at once (see search). Exact search
+        scores a group of queries with one matrix product; through the
+        IVF-PQ index each query is searched on its own.
+
+        Returns:
+            One list of objects per query vector, in input order
+        """
+        queries = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        with self._lock:
+            self.refresh()
+            if self._vectors() is None or limit <= 0:
+                return [[] for _ in range(len(queries))]
+            index = self._current_index(self._vectors()) if self.index_type == "ivfpq" else None
+            if index is not None:
+                # Searched outside the lock while upserts keep adding to it
+                index = index.snapshot()
+            # Building the index may have replayed newer rows
+            matrix = self._vectors()
+            num_rows = self._num_rows
+            mask = self._alive[:num_rows].copy()
+            if type_filter is not None:
+                mask &= self._types[:num_rows] == self._type_codes.get(type_filter, -2)
+            candidates = int(mask.sum())
+            if candidates == 0:
+                return [[] for _ in range(len(queries))]
+
+        # Score outside the lock: (row, similarity) pairs of each query
+        hits = []
+        if index is not None:
+            for query in queries:
+                rows, scores = index.search(
+                    query, limit, nprobe=self.nprobe,
+                    rerank=limit * self.rerank_factor if rerank is None else rerank, vectors=matrix, mask=mask,
+                )
+                hits.append(list(zip(rows, scores)))
+        else:
+            k = min(limit, candidates)
+            # Bound the (queries, rows) score matrix to about 32MB
+            group = max(1, (1 << 23) // num_rows)
+            for start in range(0, len(queries), group):
+                scores = queries[start:start + group] @ matrix.T
+                scores[:, ~mask] = -np.inf
+                tops = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                for query_scores, top in zip(scores, tops):
+                    top = top[np.argsort(-query_scores[top], kind="stable")]
+                    hits.append([(row, query_scores[row]) for row in top])
+
+        # Upserts and deletes clear the properties of the rows they replace,
+        # so read them back under the lock and drop rows gone since the snapshot
+        with self._lock:
+            return [
+                [
+                    LocalObject(uuid=self._row_uuids[row], properties=self._row_properties[row],
+                                distance=float(1.0 - score))
+                    for row, score in query_hits if self._row_properties[row] is not None
+                ]
+                for query_hits in hits
+            ]
+
+    def _current_index(self, matrix: np.ndarray) -> Optional[IVFPQIndex]:
+        """
+        Return an IVF-PQ index covering every row, loading or extending it
+        as needed, or None while the store is searched exactly. Training
+        never happens here: it is started in a background thread (see
+        build_index), and the previous index, or exact search, is used until
+        the new one is swapped in. Callers hold self._lock.
+        """
+        if self._num_rows < self.index_min_rows:
+            return None
+        index_path = self._file(self.INDEX_FILE)
+        if os.path.exists(index_path) and os.path.getmtime(index_path) != self._index_mtime:
+            # Saved (or rebuilt) by this or another process
+            self._index_mtime = os.path.getmtime(index_path)
+            self._index = IVFPQIndex.load(index_path)
+            self._index_saved_rows = self._index.next_row
+        if self._index is None or self._num_rows >= self.INDEX_REBUILD_GROWTH * self._index.trained_rows:
+            self._start_index_build()
+        if self._index is None:
+            return None
+        if self._index.next_row < self._num_rows:
+            start = self._index.next_row
+            self._index.add(matrix[start:], np.arange(start, self._num_rows))
+            if self._num_rows - self._index_saved_rows > self.INDEX_SAVE_FRACTION * self._num_rows:
+                self._save_index()
+        return self._index
+
+    def _save_index(self) -> None:
+        with self._write_lock():
+            index_path = self._file(self.INDEX_FILE)
+            self._index.save(index_path)
+            self._index_mtime = os.path.getmtime(index_path)
+            self._index_saved_rows = self._index.next_row
+
+    def _start_index_build(self) -> None:
+        """Train a new index in a background thread, unless one is already training."""
+        if self._index_build is not None and self._index_build_pid == os.getpid() and self._index_build.is_alive():
+            return
+        self._index_build = threading.Thread(target=self._build_index_in_background, name="ivfpq-build", daemon=True)
+        self._index_build_pid = os.getpid()
+        self._index_build.start()
+
+    def _build_index_in_background(self) -> None:
+        try:
+            self.build_index()
+        except Exception as e:
+            # Searches keep using the previous index (or exact search); retried on a later search
+            print(f"Could not build the IVF-PQ index: {str(e)}")
+
+    def build_index(self) -> None:
+        """
+        Train the IVF-PQ index on the current rows, add every row and persist it.
+
+        Training runs on a snapshot of the rows without holding the store
+        lock, so searches and writes go on meanwhile; rows written during
+        training are added when the new index is swapped in. A file lock
+        keeps processes sharing the store from training at the same time.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._file(self.INDEX_BUILD_LOCK_FILE), "a") as build_lock:
+            if fcntl is not None:
+                fcntl.flock(build_lock, fcntl.LOCK_EX)
+            try:
+                self._build_index()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(build_lock, fcntl.LOCK_UN)
+
+    def _build_index(self) -> None:
+        with self._lock:
+            self.refresh()
+            matrix = self._vectors()
+            if matrix is None:
+                return
+            num_rows = self._num_rows
+            index_path = self._file(self.INDEX_FILE)
+            if os.path.exists(index_path) and os.path.getmtime(index_path) != self._index_mtime:
+                # Another process rebuilt it while we waited for the build lock
+                index = IVFPQIndex.load(index_path)
+                if num_rows < self.INDEX_REBUILD_GROWTH * index.trained_rows:
+                    self._index = index
+                    self._index_mtime = os.path.getmtime(index_path)
+                    self._index_saved_rows = index.next_row
+                    return
+
+        nlist = self.nlist or int(np.clip(4 * np.sqrt(num_rows), 16, 65536))
+        start = time.perf_counter()
+        index = IVFPQIndex(nlist=nlist, m=self.pq_m)
+        # Trained on a sample of all rows (tombstoned rows are still representative)
+        index.train(matrix)
+        for chunk_start in range(0, num_rows, 65536):
+            chunk_end = min(num_rows, chunk_start + 65536)
+            index.add(matrix[chunk_start:chunk_end], np.arange(chunk_start, chunk_end))
+
+        with self._write_lock():
+            self.refresh()
+            if self._num_rows > index.next_row:
+                # Rows written while training
+                index.add(self._vectors()[index.next_row:], np.arange(index.next_row, self._num_rows))
+            self._index = index
+            self._save_index()
+        print(f"Built IVF-PQ index over {num_rows} rows (nlist={index.nlist}, m={index.m}) "
+              f"in {time.perf_counter() - start:.1f}s")
+
+    def count(self, type_filter: Optional[str] = None) -> int:
+        """Number of live objects (of one type, if given)."""
+        with self._lock:
+            self.refresh()
+            mask = self._alive[:self._num_rows]
+            if type_filter is not None:
+                mask = mask & (self._types[:self._num_rows] == self._type_codes.get(type_filter, -2))
+            return int(mask.sum())
@@ -0,0 +1,86 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Union
+
+from PIL import Image
+
+from app.core.config import configs
+
+
+ImageInput = Union[Image.Image, bytes]
+
+# File extensions treated as images when scanning folders and archives
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif", ".tif", ".tiff"}
+
+
+def decode_image(content: bytes, target_size: Optional[int] = None) -> Image.Image:
+    """
+    Decode image bytes into an RGB PIL image, at reduced resolution when possible.
+
+    For JPEGs the decoder is asked (through Image.draft) for the smallest
+    DCT scale (1/2, 1/4 or 1/8) that keeps both sides at least target_size
+    pixels, so a large photo is never fully decoded just to be resized to
+    the model input. Images already in RGB are not converted again.
+
+    Args:
+        content: Raw image file contents
+        target_size: Smallest side needed downstream (None decodes at full resolution)
+
+    Returns:
+        The decoded RGB image
+    """
+    image = Image.open(io.BytesIO(content))
+    if target_size and image.format == "JPEG":
+        image.draft("RGB", (target_size, target_size))
+    if image.mode != "RGB":
+        return image.convert("RGB")
+    image.load()
+    return image
+
+
+class ImagePreprocessor:
+    """
+    Decode and transform a list of images in a thread pool and stack them
+    into one batch tensor. PIL decoding/resizing and the tensor transforms
+    release the GIL, so the work spreads over cores.
+    """
+    def __init__(self, transform: Callable, target_size: int, workers: int = 4) -> None:
+        """
+        Args:
+            transform: Transform turning an RGB PIL image into a CHW tensor
+            target_size: Smallest side the transform resizes to (used for reduced decoding)
+            workers: Number of preprocessing threads (1 disables the pool)
+        """
+        self.transform = transform
+        self.target_size = target_size
+        self.workers = max(1, workers)
+        self._executor = None
+        self._executor_pid = None
+
+    def preprocess_one(self, image: ImageInput):
+        """Decode (if given bytes) and transform a single image."""
+        if isinstance(image, (bytes, bytearray)):
+            image = decode_image(bytes(image), self.target_size)
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        return self.transform(image)
+
+    def preprocess(self, images: List[ImageInput]):
+        """
+        Preprocess a list of images into one stacked (N, C, H, W) tensor.
+
+        Args:
+            images: PIL images or raw image bytes
+        """
+        import torch
+
+        if self.workers == 1 or len(images) == 1:
+            tensors = [self.preprocess_one(image) for image in images]
+        else:
+            # Pool threads do not survive fork(), so a forked worker builds its own
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="preprocess")
+                self._executor_pid = os.getpid()
+            tensors = list(self._executor.map(self.preprocess_one, images))
+        return torch.stack(tensors)
@@ -0,0 +1,71 @@
+import os
+import resource
+import time
+from typing import Any, Dict, Optional
+
+
+# Time from process start (or fork) until the server was ready to accept requests
+_startup_seconds: Optional[float] = None
+_role = "server"
+
+
+def memory_usage(pid: Optional[int] = None) -> Dict[str, float]:
+    """
+    Return the memory footprint of a process in MB.
+
+    On Linux, /proc/self/smaps_rollup gives RSS together with PSS (each
+    shared page divided by the number of processes mapping it) and the
+    shared/private split, which is what matters when model weights are
+    shared copy-on-write between forked workers. Elsewhere only the peak
+    RSS of the current process is available.
+
+    Args:
+        pid: Process to inspect (defaults to the current process)
+    """
+    try:
+        fields = {}
+        with open(f"/proc/{pid or 'self'}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1]) / 1024
+        return {
+            "rss_mb": round(fields.get("Rss", 0.0), 1),
+            "pss_mb": round(fields.get("Pss", 0.0), 1),
+            "shared_mb": round(fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0), 1),
+            "private_mb": round(fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0), 1),
+        }
+    except OSError:
+        if pid is not None and pid != os.getpid():
+            return {}
+        # ru_maxrss is in KB on Linux and bytes on macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        scale = 1024 * 1024 if os.uname().sysname == "Darwin" else 1024
+        return {"max_rss_mb": round(maxrss / scale, 1)}
+
+
+def mark_startup(started_at: float, role: str = "server") -> float:
+    """
+    Record how long this process took to become ready.
+
+    Args:
+        started_at: time.monotonic() value when the process started (or was forked)
+        role: Process role reported in stats ("master", "worker", "server")
+
+    Returns:
+        Startup time in seconds
+    """
+    global _startup_seconds, _role
+    _startup_seconds = time.monotonic() - started_at
+    _role = role
+    return _startup_seconds
+
+
+def process_stats() -> Dict[str, Any]:
+    """Return pid, role, startup time and memory usage of the current process."""
+    return {
+        "pid": os.getpid(),
+        "role": _role,
+        "startup_seconds": round(_startup_seconds, 3) if _startup_seconds is not None else None,
+        **memory_usage(),
+    }
@@ -1,11 +1,29 @@
 import os
+import tempfile
 from PIL import Image
-import numpy as np
-import torch
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, Optional, Dict, Any
 from app.core.config import configs
 
+
+def _write_atomic(image_path: str, write: Callable[[str], None]) -> None:
+    """
+    Write a file through `write(temp_path)` and move it into place, so
+    readers (and concurrent writers of the same name) never see it partial.
+    """
+    directory, name = os.path.split(image_path)
+    # Same directory (same file system for os.replace), same extension for PIL
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=os.path.splitext(name)[1])
+    os.close(fd)
+    try:
+        write(temp_path)
+        os.replace(temp_path, image_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
 def save_image(images: List[Image.Image], images_filename: List[str],
                metadata: Optional[List[Dict[str, Any]]] = None) -> List[str]:
     """
@@ -38,9 +56,42 @@ def save_image(images: List[Image.Image], images_filename: List[str],
         
         # Save the image to the specified directory
         image_path = os.path.join(configs.IMAGE_SAVE_DIR, filename)
-        image.save(image_path)
+        _write_atomic(image_path, image.save)
         
         # Append saved image info to the list
         saved_images.append(image_path)
     
-    return saved_images
\ No newline at end of file
+    return saved_images
+
+def _write_bytes(path: str, content: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(content)
+
+def save_image_content(contents: List[bytes], images_filename: List[str]) -> List[str]:
+    """
+    Save raw image bytes to the local file system without re-encoding.
+    
+    Files that already exist are left untouched, so content-addressed
+    file names are only written once.
+    
+    Args:
+        contents: List of raw image file contents
+        images_filename: List of file names to save the contents under
+        
+    Returns:
+        List of saved image paths
+    """
+    if len(contents) != len(images_filename):
+        raise ValueError("Length of contents and images_filename must match")
+    
+    # Create a directory for saving images if it doesn't exist
+    os.makedirs(configs.IMAGE_SAVE_DIR, exist_ok=True)
+    
+    saved_images = []
+    for content, filename in zip(contents, images_filename):
+        image_path = os.path.join(configs.IMAGE_SAVE_DIR, filename)
+        if not os.path.exists(image_path):
+            _write_atomic(image_path, lambda path: _write_bytes(path, content))
+        saved_images.append(image_path)
+    
+    return saved_images
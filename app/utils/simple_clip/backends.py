@@ -0,0 +1,223 @@
+"""
+Inference backends running CLIP.extract_image_features /
+CLIP.extract_text_features (projections included).
+
+TorchBackend calls the eager PyTorch model. OnnxBackend exports both
+towers to ONNX once, with dynamic batch and sequence axes, and runs them
+with ONNX Runtime on the CPU execution provider.
+"""
+import hashlib
+import inspect
+import os
+
+import torch
+import torch.nn as nn
+
+from app.utils.simple_clip.optimize import BucketedCompiledFn, optimize_image_encoder
+
+# Bump when the exported graph changes for the same weights
+EXPORT_FORMAT_VERSION = 2
+
+
+class TorchBackend:
+    """Run the eager PyTorch model."""
+    name = "torch"
+
+    def __init__(self, model, optimize=False, compile=False, batch_buckets=None):
+        """
+        Args:
+            model: The loaded CLIP model
+            optimize: Fold Conv+BN and run the image tower in channels_last
+            compile: Apply torch.compile to the image tower
+            batch_buckets: Batch sizes the compiled image tower is specialized for
+        """
+        self.model = model
+        self.optimize = optimize
+        self._compiled_image_features = None
+        if optimize:
+            optimize_image_encoder(model)
+        if compile:
+            self._compiled_image_features = BucketedCompiledFn(
+                self._image_features, batch_buckets or [1, 2, 4, 8, 16, 32]
+            )
+
+    def _image_features(self, images):
+        if self.optimize:
+            images = images.contiguous(memory_format=torch.channels_last)
+        return self.model.extract_image_features(images)
+
+    def extract_image_features(self, images):
+        if self._compiled_image_features is not None:
+            return self._compiled_image_features(images)
+        return self._image_features(images)
+
+    def extract_text_features(self, input_ids, attention_mask):
+        return self.model.extract_text_features(input_ids, attention_mask)
+
+
+class _ImageTower(nn.Module):
+    def __init__(self, model):
+        super(_ImageTower, self).__init__()
+        self.model = model
+
+    def forward(self, images):
+        return self.model.extract_image_features(images)
+
+
+class _TextTower(nn.Module):
+    def __init__(self, model):
+        super(_TextTower, self).__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model.extract_text_features(input_ids, attention_mask)
+
+
+def _export(module, args, path, input_names, dynamic_axes):
+    kwargs = {}
+    # Newer torch releases default to the dynamo exporter; keep the TorchScript one
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kwargs["dynamo"] = False
+    tmp_path = f"{path}.tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            module,
+            args,
+            tmp_path,
+            input_names=input_names,
+            output_names=["features"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+            do_constant_folding=True,
+            **kwargs,
+        )
+    os.replace(tmp_path, path)
+
+
+def onnx_export_paths(export_dir, version):
+    """
+    Paths of the exported image and text models for a model version.
+
+    Files are named after a hash of version, so a new model version never
+    reuses a stale export.
+
+    Returns:
+        Tuple of (image model path, text model path)
+    """
+    key = hashlib.sha1(f"{version}:{EXPORT_FORMAT_VERSION}".encode()).hexdigest()[:12]
+    return (
+        os.path.join(export_dir, f"clip_image_{key}.onnx"),
+        os.path.join(export_dir, f"clip_text_{key}.onnx"),
+    )
+
+
+def onnx_exported(export_dir, version):
+    """Whether both towers of a model version are already exported."""
+    return all(os.path.exists(path) for path in onnx_export_paths(export_dir, version))
+
+
+def export_onnx(model, export_dir, version, image_size=224):
+    """
+    Export the image and text towers of a CLIP model to ONNX (see
+    onnx_export_paths). Existing files are kept.
+
+    Returns:
+        Tuple of (image model path, text model path)
+    """
+    os.makedirs(export_dir, exist_ok=True)
+    image_path, text_path = onnx_export_paths(export_dir, version)
+
+    # The wrappers must be in eval mode too: the exporter restores their
+    # training flag afterwards, recursively, onto the wrapped model
+    model = model.cpu().eval()
+    if not os.path.exists(image_path):
+        print(f"Exporting image tower to {image_path}")
+        _export(
+            _ImageTower(model).eval(),
+            (torch.randn(2, 3, image_size, image_size),),
+            image_path,
+            input_names=["images"],
+            dynamic_axes={"images": {0: "batch"}, "features": {0: "batch"}},
+        )
+    if not os.path.exists(text_path):
+        print(f"Exporting text tower to {text_path}")
+        _export(
+            _TextTower(model).eval(),
+            (torch.ones(2, 16, dtype=torch.long), torch.ones(2, 16, dtype=torch.long)),
+            text_path,
+            input_names=["input_ids", "attention_mask"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "features": {0: "batch"},
+            },
+        )
+    return image_path, text_path
+
+
+def quantize_onnx(path):
+    """Dynamically quantize the weights of an ONNX model to int8, next to the original file."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = path.replace(".onnx", ".int8.onnx")
+    if not os.path.exists(quantized_path):
+        print(f"Quantizing {path} to int8")
+        quantize_dynamic(path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+
+class OnnxBackend:
+    """Run exported ONNX models with ONNX Runtime on CPU."""
+    name = "onnx"
+
+    def __init__(self, model, export_dir, version, text_precision="fp32", num_threads=0):
+        """
+        Args:
+            model: The fp32 CLIP model to export (None when the export of
+                version already exists, see onnx_exported)
+            export_dir: Directory holding the exported models
+            version: Model version used to name the exported files
+            text_precision: "fp32", or "int8" to quantize the text model with ONNX Runtime
+            num_threads: Intra-op threads for ONNX Runtime (0 keeps its default)
+        """
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("The onnx inference backend requires the onnxruntime package") from e
+
+        if model is not None:
+            image_path, text_path = export_onnx(model, export_dir, version)
+        elif onnx_exported(export_dir, version):
+            image_path, text_path = onnx_export_paths(export_dir, version)
+        else:
+            raise RuntimeError(f"No ONNX export of model version {version} in {export_dir}")
+        if text_precision == "int8":
+            text_path = quantize_onnx(text_path)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        providers = ["CPUExecutionProvider"]
+        self.image_session = ort.InferenceSession(image_path, options, providers=providers)
+        self.text_session = ort.InferenceSession(text_path, options, providers=providers)
+
+    def extract_image_features(self, images):
+        (features,) = self.image_session.run(None, {"images": images.cpu().numpy()})
+        return torch.from_numpy(features)
+
+    def extract_text_features(self, input_ids, attention_mask):
+        (features,) = self.text_session.run(None, {
+            "input_ids": input_ids.cpu().numpy(),
+            "attention_mask": attention_mask.cpu().numpy(),
+        })
+        return torch.from_numpy(features)
+
+
+def get_backend(name, model, **kwargs):
+    """Create the inference backend selected by name ("torch" or "onnx")."""
+    if name == "torch":
+        return TorchBackend(model, **kwargs)
+    elif name == "onnx":
+        return OnnxBackend(model, **kwargs)
+    raise ValueError(f"Inference backend {name} not found")
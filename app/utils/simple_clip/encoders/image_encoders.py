@@ -2,7 +2,6 @@ import torch.nn as nn
 from torchvision import models
 from torchvision.models import MobileNet_V3_Small_Weights
 import torch
-import timm
 # from pprint import pprint
 
 
@@ -35,6 +34,7 @@ class ImageEncoder(nn.Module):
 
     # https://huggingface.co/timm/tiny_vit_5m_224.dist_in22k_ft_in1k
     def tiny_vit_5m(self):
+        import timm
         model = timm.create_model("tiny_vit_5m_224.dist_in22k_ft_in1k", pretrained=True)
         model.reset_classifier(0)
 
@@ -1,17 +1,28 @@
+import threading
 from torch import nn
 from transformers import AutoModel, AutoTokenizer
-from sentence_transformers import SentenceTransformer
 
 
 
 class TextEncoder(nn.Module):
-    tokenizer = AutoTokenizer.from_pretrained('vinai/phobert-base')
+    _tokenizer = None
+    _tokenizer_lock = threading.Lock()
+
+    @classmethod
+    def get_tokenizer(cls):
+        """Load the PhoBERT tokenizer once, on first use."""
+        if cls._tokenizer is None:
+            with cls._tokenizer_lock:
+                if cls._tokenizer is None:
+                    cls._tokenizer = AutoTokenizer.from_pretrained('vinai/phobert-base')
+        return cls._tokenizer
 
     def __init__(self, model_name):
         super(TextEncoder, self).__init__()
         if model_name == "phobert-base":
             self.model = AutoModel.from_pretrained('vinai/phobert-base')
         elif model_name == "sentence_transformer":
+            from sentence_transformers import SentenceTransformer
             self.model = SentenceTransformer('keepitreal/vietnamese-sbert')
         for param in self.model.parameters():
             param.requires_grad = False
@@ -19,12 +30,14 @@ class TextEncoder(nn.Module):
     def forward(self, input_ids, attention_mask):
         output = self.model(input_ids=input_ids, attention_mask=attention_mask)
         last_hidden_state = output.last_hidden_state
-        return last_hidden_state.mean(dim=1)
+        # Mean over real tokens only, so padding does not change the embedding
+        mask = attention_mask.unsqueeze(-1).to(last_hidden_state.dtype)
+        return (last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
 
 if __name__ == "__main__":
 
-    model = TextEncoder()
+    model = TextEncoder("phobert-base")
     print("Model loaded successfully")
-    input_ids = TextEncoder.tokenizer(["Cô giáo đang ăn kem", "Chị gái đang thử món thịt dê"], return_tensors='pt', padding=True)['input_ids']
-    attention_mask = TextEncoder.tokenizer(["Cô giáo đang ăn kem", "Chị gái đang thử món thịt dê"], return_tensors='pt', padding=True)['attention_mask']
+    input_ids = TextEncoder.get_tokenizer()(["Cô giáo đang ăn kem", "Chị gái đang thử món thịt dê"], return_tensors='pt', padding=True)['input_ids']
+    attention_mask = TextEncoder.get_tokenizer()(["Cô giáo đang ăn kem", "Chị gái đang thử món thịt dê"], return_tensors='pt', padding=True)['attention_mask']
     print(model(input_ids, attention_mask).shape)
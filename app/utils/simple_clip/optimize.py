@@ -0,0 +1,62 @@
+import torch
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+
+def fuse_conv_bn(module):
+    """
+    Fold every BatchNorm2d that directly follows a Conv2d inside an
+    nn.Sequential into the convolution weights (in place, eval mode only).
+
+    Covers MobileNetV3's Conv2dNormActivation blocks and TinyViT's ConvNorm,
+    which are both Sequential subclasses.
+
+    Returns:
+        Number of folded pairs
+    """
+    fused = 0
+    for child in module.children():
+        fused += fuse_conv_bn(child)
+    if isinstance(module, nn.Sequential):
+        names = list(module._modules.keys())
+        for conv_name, bn_name in zip(names, names[1:]):
+            conv, bn = module._modules[conv_name], module._modules[bn_name]
+            if isinstance(conv, nn.Conv2d) and isinstance(bn, nn.BatchNorm2d) and bn.track_running_stats:
+                module._modules[conv_name] = fuse_conv_bn_eval(conv, bn)
+                module._modules[bn_name] = nn.Identity()
+                fused += 1
+    return fused
+
+
+def optimize_image_encoder(model):
+    """
+    Prepare the image tower of a CLIP model for inference: fold Conv+BN
+    and switch the weights to channels_last. Must run after load_state_dict.
+    """
+    model.eval()
+    fused = fuse_conv_bn(model.image_encoder)
+    model.image_encoder.to(memory_format=torch.channels_last)
+    print(f"Image encoder optimized: {fused} Conv+BN pairs folded, channels_last")
+    return model
+
+
+class BucketedCompiledFn:
+    """
+    Wrap a batch function with torch.compile, padding every batch up to the
+    next size in a fixed set of buckets so only len(buckets) static graphs
+    are ever compiled. Batches larger than the largest bucket are split.
+    """
+    def __init__(self, fn, batch_buckets):
+        self.batch_buckets = sorted(set(batch_buckets))
+        self.compiled = torch.compile(fn, dynamic=False)
+
+    def __call__(self, batch):
+        max_bucket = self.batch_buckets[-1]
+        if batch.shape[0] > max_bucket:
+            return torch.cat([self(chunk) for chunk in batch.split(max_bucket)])
+        size = batch.shape[0]
+        bucket = next(b for b in self.batch_buckets if b >= size)
+        if bucket > size:
+            padding = batch.new_zeros((bucket - size, *batch.shape[1:]))
+            batch = torch.cat([batch, padding])
+        return self.compiled(batch)[:size]
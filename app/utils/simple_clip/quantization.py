@@ -0,0 +1,19 @@
+import torch
+import torch.nn as nn
+
+
+def quantize_text_tower(model):
+    """
+    Apply dynamic int8 quantization to the text side of a CLIP model.
+
+    The Linear layers of the text encoder and of text_projection get int8
+    weights, with activations quantized on the fly. The image tower is left
+    in fp32. Dynamic quantization only runs on CPU.
+    """
+    model.text_encoder = torch.quantization.quantize_dynamic(
+        model.text_encoder, {nn.Linear}, dtype=torch.qint8
+    )
+    model.text_projection = torch.quantization.quantize_dynamic(
+        model.text_projection, {nn.Linear}, dtype=torch.qint8
+    )
+    return model
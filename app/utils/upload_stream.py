@@ -0,0 +1,475 @@
+import asyncio
+import json
+import os
+import tarfile
+import tempfile
+import zipfile
+import zlib
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+import multipart
+from multipart.multipart import parse_options_header
+
+from app.utils.preprocess import IMAGE_EXTENSIONS
+
+# A file found in an upload: (file name, content, error); content is None when error is set
+Entry = Tuple[str, Optional[bytes], Optional[str]]
+
+# A line of an NDJSON upload: (line number, text, metadata, error); text is None when error is set
+Record = Tuple[int, Optional[str], Optional[Dict[str, Any]], Optional[str]]
+
+_BLOCK = 512
+
+
+def is_image_name(name: str) -> bool:
+    """Whether an archive member looks like an image (skips folders' metadata such as __MACOSX/)."""
+    base = os.path.basename(name)
+    return (
+        os.path.splitext(base)[1].lower() in IMAGE_EXTENSIONS
+        and not base.startswith("._")
+        and not name.startswith("__MACOSX/")
+    )
+
+
+def archive_kind(filename: Optional[str], content_type: Optional[str] = None) -> Optional[str]:
+    """"tar", "tar.gz" or "zip" for archive uploads, None for anything else."""
+    name = (filename or "").lower()
+    content_type = (content_type or "").lower()
+    if name.endswith((".tar.gz", ".tgz")) or content_type in ("application/gzip", "application/x-gzip"):
+        return "tar.gz"
+    if name.endswith(".tar") or content_type == "application/x-tar":
+        return "tar"
+    if name.endswith(".zip") or content_type in ("application/zip", "application/x-zip-compressed"):
+        return "zip"
+    return None
+
+
+class TarStreamReader:
+    """
+    Incremental tar reader: bytes are fed as they arrive and regular files
+    are returned as soon as their last block is in, so only the member
+    being read is held in memory (never the whole archive).
+
+    Handles gzip compression, GNU long names and pax headers.
+    """
+    def __init__(self, compressed: bool = False, max_file_bytes: int = 0) -> None:
+        """
+        Args:
+            compressed: Whether the stream is gzip-compressed (.tar.gz)
+            max_file_bytes: Members larger than this are reported as errors and not buffered (0 = no limit)
+        """
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if compressed else None
+        self.max_file_bytes = max_file_bytes
+        self._buffer = bytearray()
+        self._member: Optional[tarfile.TarInfo] = None
+        self._data = bytearray()
+        self._keep = False
+        self._consumed = 0
+        self._total = 0
+        self._long_name: Optional[str] = None
+        self._pax_path: Optional[str] = None
+        self.finished = False
+
+    def feed(self, data: bytes) -> List[Entry]:
+        """Consume the next bytes of the archive and return the files completed by them."""
+        if self._decompressor is not None:
+            data = self._decompressor.decompress(data)
+        if self.finished:
+            # Zero padding after the end-of-archive marker
+            return []
+        self._buffer += data
+        entries = []
+        while not self.finished:
+            if self._member is None:
+                if len(self._buffer) < _BLOCK:
+                    break
+                block = bytes(self._buffer[:_BLOCK])
+                del self._buffer[:_BLOCK]
+                if not block.strip(b"\0"):
+                    # End-of-archive marker
+                    self.finished = True
+                    break
+                try:
+                    self._member = tarfile.TarInfo.frombuf(block, "utf-8", "surrogateescape")
+                except tarfile.HeaderError as e:
+                    raise ValueError(f"Invalid tar archive: {str(e)}") from e
+                size = self._member.size
+                self._total = size + (-size % _BLOCK)
+                self._consumed = 0
+                self._data = bytearray()
+                regular = self._member.type in (tarfile.REGTYPE, tarfile.AREGTYPE)
+                self._keep = (
+                    self._member.type in (tarfile.GNUTYPE_LONGNAME, tarfile.XHDTYPE)
+                    or (regular and (not self.max_file_bytes or size <= self.max_file_bytes))
+                )
+            take = min(self._total - self._consumed, len(self._buffer))
+            if self._keep and self._consumed < self._member.size:
+                self._data += self._buffer[:min(take, self._member.size - self._consumed)]
+            del self._buffer[:take]
+            self._consumed += take
+            if self._consumed < self._total:
+                break
+            entry = self._finish_member()
+            if entry is not None:
+                entries.append(entry)
+        return entries
+
+    def close(self) -> None:
+        """Check the archive was complete (up to its end-of-archive marker)."""
+        if self._member is not None:
+            raise ValueError(f"Truncated tar archive (in {self._member.name})")
+        if not self.finished:
+            raise ValueError("Truncated tar archive (no end-of-archive marker)")
+        if self._decompressor is not None and not self._decompressor.eof:
+            raise ValueError("Truncated gzip stream")
+
+    def _finish_member(self) -> Optional[Entry]:
+        member, data = self._member, bytes(self._data)
+        self._member, self._data = None, bytearray()
+        if member.type == tarfile.GNUTYPE_LONGNAME:
+            self._long_name = data.rstrip(b"\0").decode("utf-8", "surrogateescape")
+            return None
+        if member.type == tarfile.XHDTYPE:
+            self._pax_path = _pax_path(data) or self._pax_path
+            return None
+        name = self._long_name or self._pax_path or member.name
+        self._long_name = self._pax_path = None
+        if member.type not in (tarfile.REGTYPE, tarfile.AREGTYPE) or not is_image_name(name):
+            return None
+        if not self._keep:
+            return name, None, f"File exceeds {self.max_file_bytes} bytes"
+        return name, data, None
+
+
+def _pax_path(data: bytes) -> Optional[str]:
+    """The "path" record of a pax extended header ("<length> <key>=<value>\\n" records)."""
+    position = 0
+    while position < len(data):
+        space = data.find(b" ", position)
+        if space < 0:
+            break
+        length = int(data[position:space])
+        key, _, value = data[space + 1:position + length - 1].partition(b"=")
+        if key == b"path":
+            return value.decode("utf-8", "surrogateescape")
+        position += length
+    return None
+
+
+def iter_zip(file, max_file_bytes: int = 0) -> Iterator[Entry]:
+    """
+    Read the image members of a zip file one at a time.
+
+    Args:
+        file: Seekable file object holding the zip archive
+        max_file_bytes: Members larger than this are reported as errors (0 = no limit)
+    """
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile as e:
+        yield "<zip>", None, f"Invalid zip archive: {str(e)}"
+        return
+    with archive:
+        for info in archive.infolist():
+            if info.is_dir() or not is_image_name(info.filename):
+                continue
+            if max_file_bytes and info.file_size > max_file_bytes:
+                yield info.filename, None, f"File exceeds {max_file_bytes} bytes"
+                continue
+            try:
+                yield info.filename, archive.read(info), None
+            except (zipfile.BadZipFile, zlib.error, NotImplementedError) as e:
+                yield info.filename, None, f"Could not extract: {str(e)}"
+
+
+class ArchiveStream:
+    """
+    An archive received in chunks. Tar archives are read as the bytes
+    arrive; a zip keeps its index at the end, so it is spooled to a
+    temporary file (on disk past spool_memory_bytes) and read on close().
+    """
+    def __init__(self, kind: str, max_file_bytes: int = 0, spool_memory_bytes: int = 8 * 1024 * 1024) -> None:
+        """
+        Args:
+            kind: "tar", "tar.gz" or "zip" (see archive_kind)
+            max_file_bytes: Members larger than this are reported as errors
+            spool_memory_bytes: Zip bytes kept in memory before spooling to disk
+        """
+        self.kind = kind
+        self.max_file_bytes = max_file_bytes
+        self._tar = TarStreamReader(kind == "tar.gz", max_file_bytes) if kind != "zip" else None
+        self._spool = tempfile.SpooledTemporaryFile(max_size=spool_memory_bytes) if kind == "zip" else None
+
+    def feed(self, data: bytes) -> List[Entry]:
+        """Consume the next bytes; returns the files completed so far (tar only)."""
+        if self._tar is not None:
+            return self._tar.feed(data)
+        self._spool.write(data)
+        return []
+
+    def close(self) -> Iterator[Entry]:
+        """Finish the archive; yields the remaining files (all of them for a zip)."""
+        if self._tar is not None:
+            self._tar.close()
+            return iter(())
+        self._spool.seek(0)
+        return self._iter_zip_and_close()
+
+    def _iter_zip_and_close(self) -> Iterator[Entry]:
+        try:
+            yield from iter_zip(self._spool, self.max_file_bytes)
+        finally:
+            self._spool.close()
+
+
+class MultipartImageStream:
+    """
+    Incremental multipart/form-data parser for image uploads.
+
+    Parts are handled in the order they arrive:
+    - form fields (no filename) are collected as text, e.g. a "metadata"
+      field with per-file metadata, which must come before the files (see
+      metadata_for)
+    - tar / tar.gz / zip files are expanded through ArchiveStream
+    - any other file part is one image, buffered until the part ends
+
+    feed() returns the images completed by each chunk, so the caller can
+    process them in batches while the rest of the request is still
+    being received.
+    """
+    def __init__(self, content_type: str, max_file_bytes: int = 0, spool_memory_bytes: int = 8 * 1024 * 1024,
+                 max_field_bytes: int = 1024 * 1024) -> None:
+        """
+        Args:
+            content_type: The request's Content-Type header (carries the boundary)
+            max_file_bytes: Images larger than this are reported as errors (0 = no limit)
+            spool_memory_bytes: Zip bytes kept in memory before spooling to disk
+            max_field_bytes: Maximum size of a form field
+        """
+        _, options = parse_options_header(content_type)
+        boundary = options.get(b"boundary")
+        if not boundary:
+            raise ValueError("Missing multipart boundary")
+        self.max_file_bytes = max_file_bytes
+        self.spool_memory_bytes = spool_memory_bytes
+        self.max_field_bytes = max_field_bytes
+        self.fields: Dict[str, str] = {}
+        self._metadata: Any = None
+        self._ready: List[Any] = []
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._part: Optional[Dict[str, Any]] = None
+        self._parser = multipart.MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def feed(self, chunk: bytes) -> Iterator[Entry]:
+        """Parse the next chunk of the request body; yields the images it completed."""
+        self._parser.write(chunk)
+        return self._drain()
+
+    def close(self) -> Iterator[Entry]:
+        """Finish parsing; yields the remaining images."""
+        self._parser.finalize()
+        return self._drain()
+
+    def metadata_for(self, filename: str, index: int) -> Dict[str, Any]:
+        """
+        Metadata of the index-th file, from the "metadata" form field: a JSON
+        object keyed by file name (or archive member base name), or a JSON
+        list in the order the files are received.
+        """
+        if self._metadata is None:
+            raw = self.fields.get("metadata")
+            try:
+                self._metadata = json.loads(raw) if raw else {}
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid metadata JSON: {str(e)}") from e
+            if not isinstance(self._metadata, (dict, list)):
+                raise ValueError("metadata must be a JSON object keyed by file name or a JSON list")
+        if isinstance(self._metadata, list):
+            item = self._metadata[index] if index < len(self._metadata) else None
+        else:
+            item = self._metadata.get(filename, self._metadata.get(os.path.basename(filename)))
+        return dict(item) if isinstance(item, dict) else {}
+
+    def _drain(self) -> Iterator[Entry]:
+        ready, self._ready = self._ready, []
+        for item in ready:
+            if isinstance(item, tuple):
+                yield item
+            else:
+                # Entries of a closed zip, read lazily
+                yield from item
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "surrogateescape")
+        filename = options.get(b"filename")
+        part = {"name": name, "filename": None, "data": bytearray(), "size": 0, "archive": None, "error": None}
+        if filename is not None:
+            part["filename"] = filename.decode("utf-8", "surrogateescape")
+            kind = archive_kind(part["filename"], self._headers.get(b"content-type", b"").decode("latin-1"))
+            if kind:
+                part["archive"] = ArchiveStream(kind, self.max_file_bytes, self.spool_memory_bytes)
+        self._part = part
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        part = self._part
+        if part["error"] is not None:
+            # The rest of a failed part is skipped
+            return
+        part["size"] += end - start
+        if part["archive"] is not None:
+            try:
+                self._ready.extend(part["archive"].feed(data[start:end]))
+            except ValueError as e:
+                part["archive"], part["error"] = None, str(e)
+            return
+        limit = self.max_file_bytes if part["filename"] is not None else self.max_field_bytes
+        if limit and part["size"] > limit:
+            what = "File" if part["filename"] is not None else "Field"
+            part["data"], part["error"] = bytearray(), f"{what} exceeds {limit} bytes"
+            return
+        part["data"] += data[start:end]
+
+    def _on_part_end(self) -> None:
+        part, self._part = self._part, None
+        if part["filename"] is None:
+            if part["error"] is not None:
+                raise ValueError(f"Form field {part['name']!r}: {part['error']}")
+            self.fields[part["name"]] = part["data"].decode("utf-8")
+        elif part["error"] is not None:
+            self._ready.append((part["filename"], None, part["error"]))
+        elif part["archive"] is not None:
+            try:
+                self._ready.append(part["archive"].close())
+            except ValueError as e:
+                self._ready.append((part["filename"], None, str(e)))
+        else:
+            self._ready.append((part["filename"], bytes(part["data"]), None))
+
+
+
+class NdjsonTextStream:
+    """
+    Incremental NDJSON parser for text uploads. Each line is a JSON object
+    {"text": "...", "metadata": {...}} (metadata optional) or a bare JSON
+    string; blank lines are skipped. A line is parsed as soon as its
+    newline arrives, and a line longer than max_line_bytes is reported as
+    an error without being buffered, so memory stays bounded by one line.
+    """
+    def __init__(self, max_line_bytes: int = 1024 * 1024) -> None:
+        """
+        Args:
+            max_line_bytes: Longest accepted line (0 = no limit)
+        """
+        self.max_line_bytes = max_line_bytes
+        self._buffer = bytearray()
+        self._oversized = False
+        self._line = 0
+
+    def feed(self, chunk: bytes) -> List[Record]:
+        """Consume the next chunk of the body and return the records of the lines it completed."""
+        records = []
+        start = 0
+        while True:
+            newline = chunk.find(b"\n", start)
+            end = len(chunk) if newline < 0 else newline
+            if not self._oversized:
+                self._buffer += chunk[start:end]
+                if self.max_line_bytes and len(self._buffer) > self.max_line_bytes:
+                    # Drop the line, the rest of it is skipped up to the next newline
+                    self._buffer = bytearray()
+                    self._oversized = True
+            if newline < 0:
+                break
+            record = self._end_line()
+            if record is not None:
+                records.append(record)
+            start = newline + 1
+        return records
+
+    def close(self) -> List[Record]:
+        """Finish the body; returns the record of a last line without newline."""
+        if not self._buffer and not self._oversized:
+            return []
+        record = self._end_line()
+        return [record] if record is not None else []
+
+    def _end_line(self) -> Optional[Record]:
+        line, self._buffer = bytes(self._buffer), bytearray()
+        self._line += 1
+        if self._oversized:
+            self._oversized = False
+            return self._line, None, None, f"Line exceeds {self.max_line_bytes} bytes"
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            value = json.loads(line)
+        except ValueError as e:
+            return self._line, None, None, f"Invalid JSON: {str(e)}"
+        metadata = {}
+        if isinstance(value, dict):
+            metadata = value.get("metadata") or {}
+            value = value.get("text")
+            if not isinstance(metadata, dict):
+                return self._line, None, None, "metadata must be a JSON object"
+        if not isinstance(value, str) or not value.strip():
+            return self._line, None, None, "Expected a non-empty text (a JSON string or an object with \"text\")"
+        return self._line, value, metadata, None
+
+
+async def process_in_batches(items: AsyncIterator[Any], batch_size: int,
+                             process: Callable[[List[Any]], Awaitable[None]]) -> int:
+    """
+    Run process on consecutive batches of batch_size items as they are
+    received. Each batch is processed while the next one is being
+    received, so at most two batches are held in memory.
+
+    Returns:
+        Number of batches processed
+    """
+    pending = None
+    batch = []
+    batches = 0
+    try:
+        async for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                if pending is not None:
+                    await pending
+                pending = asyncio.ensure_future(process(batch))
+                batch = []
+                batches += 1
+        if pending is not None:
+            await pending
+            pending = None
+        if batch:
+            await process(batch)
+            batches += 1
+    finally:
+        if pending is not None:
+            pending.cancel()
+    return batches
@@ -1,22 +1,91 @@
+import gc
 import os
-import torch
-import torchvision.transforms as transforms
-from transformers import AutoTokenizer
-from app.utils.simple_clip.clip import CLIP
-from app.utils.simple_clip.utils import get_image_encoder, get_text_encoder
+import threading
+from typing import List, Optional
+import numpy as np
+from PIL import Image
 from app.core.config import configs
+from app.utils.inference_executor import configure_torch_threads, inference_executor, torch_threads_configured
+from app.utils.preprocess import ImageInput, ImagePreprocessor
+
+# Maximum number of tokens per text
+TEXT_MAX_LENGTH = 100
+# Image transform sizes: shorter side resize, then center crop
+IMAGE_RESIZE = 256
+IMAGE_CROP = 224
+
+# torch, torchvision, timm and transformers are imported when the model is
+# first needed, so importing this module (and the app) stays cheap
+
+def _as_float32(features) -> np.ndarray:
+    """Move a feature tensor to a contiguous float32 NumPy array."""
+    return np.ascontiguousarray(features.detach().cpu().numpy(), dtype=np.float32)
+
+
+def _empty_vectors() -> np.ndarray:
+    return np.empty((0, 0), dtype=np.float32)
+
 
 # Define a class to hold our resources
 class SimpleClipResources:
-    def __init__(self):
+    def __init__(self, text_precision: Optional[str] = None, backend: Optional[str] = None,
+                 optimize: Optional[bool] = None):
+        """
+        Create an empty holder; the model is loaded on first use.
+        
+        Args:
+            text_precision: "fp32" or "int8" for the text tower
+                (defaults to configs.TEXT_PRECISION)
+            backend: "torch" or "onnx" inference backend
+                (defaults to configs.INFERENCE_BACKEND)
+            optimize: Run the optimized eager image path with the torch backend
+                (defaults to configs.INFERENCE_OPTIMIZE)
+        """
+        self.text_precision = text_precision or configs.TEXT_PRECISION
+        if self.text_precision not in ("fp32", "int8"):
+            raise ValueError(f"Unsupported text precision: {self.text_precision}")
+        self.backend_name = backend or configs.INFERENCE_BACKEND
+        if self.backend_name not in ("torch", "onnx"):
+            raise ValueError(f"Unsupported inference backend: {self.backend_name}")
+        self.optimize = configs.INFERENCE_OPTIMIZE if optimize is None else optimize
         self._initialized = False
-        """Initialize all resources"""
+        self.ready = False
+        self._lock = threading.Lock()
+    
+    @property
+    def loaded(self) -> bool:
+        """Whether the model and tokenizer have been loaded."""
+        return self._initialized
+    
+    def initialize(self):
+        """Initialize all resources (once, thread-safe)"""
         if self._initialized:
             return
+        with self._lock:
+            if self._initialized:
+                return
+            self._load()
+    
+    def _load(self):
+        import torch
+        import torchvision.transforms as transforms
+        from app.utils.simple_clip.clip import CLIP
+        from app.utils.simple_clip.encoders import TextEncoder
+        from app.utils.simple_clip.quantization import quantize_text_tower
+        from app.utils.simple_clip.backends import get_backend, onnx_exported
+        from app.utils.simple_clip.utils import get_image_encoder, get_text_encoder
+        
+        # Pin torch thread pools before any parallel work (unless the
+        # serving entry point already did, e.g. before forking workers)
+        if not torch_threads_configured():
+            configure_torch_threads(configs.INFERENCE_SLOTS)
             
-        # Set device
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        print(f"Using device: {self.device}")
+        # Set device (ONNX Runtime runs on CPU)
+        if self.backend_name == "onnx":
+            self.device = torch.device("cpu")
+        else:
+            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        print(f"Using device: {self.device}, inference backend: {self.backend_name}")
         
         # Get environment variables
         model_path = os.environ.get("MODEL_PATH", configs.MODEL_PATH)
@@ -24,34 +93,69 @@ class SimpleClipResources:
         text_encoder_name = os.environ.get("TEXT_ENCODER", configs.TEXT_ENCODER)
         
         try:
-            # Load encoders
-            image_encoder = get_image_encoder(image_encoder_name)
-            text_encoder = get_text_encoder(text_encoder_name)
-            
-            # Create CLIP model
-            self.model = CLIP(
-                image_encoder=image_encoder,
-                text_encoder=text_encoder,
-                image_mlp_dim=576,
-                text_mlp_dim=768,
-                proj_dim=256
-            )
-            
-            # Load model weights
-            if os.path.exists(model_path):
-                print(f"Loading model from: {model_path}")
-                state_dict = torch.load(model_path, map_location=self.device)
-                self.model.load_state_dict(state_dict, strict=False)
+            if self.backend_name == "onnx" and onnx_exported(configs.ONNX_EXPORT_DIR, self.model_version):
+                # ONNX Runtime only needs the exported files
+                print(f"Using the ONNX export of {self.model_version}, skipping the PyTorch model")
+                self.model = None
             else:
-                print(f"Warning: Model file not found at {model_path}, using untrained model")
+                # Load encoders
+                image_encoder = get_image_encoder(image_encoder_name)
+                text_encoder = get_text_encoder(text_encoder_name)
+                
+                # Create CLIP model
+                self.model = CLIP(
+                    image_encoder=image_encoder,
+                    text_encoder=text_encoder,
+                    image_mlp_dim=576,
+                    text_mlp_dim=768,
+                    proj_dim=256
+                )
+                
+                # Load model weights
+                if os.path.exists(model_path):
+                    print(f"Loading model from: {model_path}")
+                    state_dict = torch.load(model_path, map_location=self.device)
+                    self.model.load_state_dict(state_dict, strict=False)
+                else:
+                    print(f"Warning: Model file not found at {model_path}, using untrained model")
+                
+                self.model.to(self.device)
+                self.model.eval()
             
-            self.model.to(self.device)
-            self.model.eval()
+            if self.backend_name == "onnx":
+                # Export to ONNX (int8 text quantization is done by ONNX Runtime)
+                self.backend = get_backend(
+                    "onnx",
+                    self.model,
+                    export_dir=configs.ONNX_EXPORT_DIR,
+                    version=self.model_version,
+                    text_precision=self.text_precision,
+                    num_threads=configs.ORT_NUM_THREADS,
+                )
+                # The fp32 weights were only needed for the export
+                self.model = None
+                gc.collect()
+            else:
+                # Quantize the text tower to int8 (CPU only)
+                if self.text_precision == "int8":
+                    if self.device.type == "cpu":
+                        print("Applying dynamic int8 quantization to the text encoder")
+                        quantize_text_tower(self.model)
+                    else:
+                        print(f"Warning: int8 text precision is only supported on CPU, keeping fp32 on {self.device}")
+                        self.text_precision = "fp32"
+                self.backend = get_backend(
+                    "torch",
+                    self.model,
+                    optimize=self.optimize,
+                    compile=configs.TORCH_COMPILE,
+                    batch_buckets=configs.COMPILE_BATCH_BUCKETS,
+                )
             
-            # Initialize tokenizer
+            # Initialize tokenizer (shared with the text encoder, loaded once)
             try:
                 print(f"Loading tokenizer for vinai/phobert-base")
-                self.tokenizer = AutoTokenizer.from_pretrained("vinai/phobert-base", local_files_only=False)
+                self.tokenizer = TextEncoder.get_tokenizer()
                 
                 # Verify tokenizer
                 test_result = self.tokenizer("Test sentence", return_tensors="pt")
@@ -66,11 +170,15 @@ class SimpleClipResources:
             
             # Define image transform
             self.transform = transforms.Compose([
-                transforms.Resize(256),
-                transforms.CenterCrop(224),
+                transforms.Resize(IMAGE_RESIZE),
+                transforms.CenterCrop(IMAGE_CROP),
                 transforms.ToTensor(),
                 transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
             ])
+            # Decode and transform batches of images in parallel
+            self.preprocessor = ImagePreprocessor(
+                self.transform, target_size=IMAGE_RESIZE, workers=configs.PREPROCESS_WORKERS
+            )
             
             self._initialized = True
             print("Model initialization complete!")
@@ -78,59 +186,198 @@ class SimpleClipResources:
             print(f"Error initializing model: {str(e)}")
             raise e
     
+    def warmup(self, batch_sizes: Optional[List[int]] = None):
+        """
+        Load the model and run dummy batches through both towers, so the
+        first real requests do not pay for lazy allocations.
+        
+        Args:
+            batch_sizes: Batch sizes to run (defaults to configs.WARMUP_BATCH_SIZES)
+        """
+        self.initialize()
+        batch_sizes = batch_sizes or configs.WARMUP_BATCH_SIZES
+        image_batch_sizes = batch_sizes
+        if self.backend_name == "torch" and configs.TORCH_COMPILE:
+            # Compile every batch bucket up front instead of on live traffic
+            image_batch_sizes = sorted(set(batch_sizes) | set(configs.COMPILE_BATCH_BUCKETS))
+        for batch_size in image_batch_sizes:
+            self.encode_images([Image.new("RGB", (256, 256))] * batch_size, batch_size=batch_size)
+        for batch_size in batch_sizes:
+            self.encode_texts(["Khởi động mô hình"] * batch_size, batch_size=batch_size)
+        self.ready = True
+        print("Model warmup complete!")
+    
+    @property
+    def model_version(self) -> str:
+        """
+        Identify the weights producing the embeddings, so cached vectors
+        are not reused across model changes.
+        """
+        if getattr(self, "_model_version", None) is not None:
+            return self._model_version
+        model_path = os.environ.get("MODEL_PATH", configs.MODEL_PATH)
+        image_encoder_name = os.environ.get("IMAGE_ENCODER", configs.IMAGE_ENCODER)
+        text_encoder_name = os.environ.get("TEXT_ENCODER", configs.TEXT_ENCODER)
+        version = f"{image_encoder_name}:{text_encoder_name}"
+        if os.path.exists(model_path):
+            stat = os.stat(model_path)
+            version += f":{os.path.basename(model_path)}:{stat.st_size}:{int(stat.st_mtime)}"
+        else:
+            version += ":untrained"
+        self._model_version = version
+        return version
+    
+    @property
+    def text_model_version(self) -> str:
+        """
+        Identify the text embeddings, which also depend on the text precision.
+        """
+        return f"{self.model_version}:{self.text_precision}:{self.backend_name}"
+    
     def encode_image(self, image: str):
         """
         Encode an image using the model.
         """
-        # Apply transformations
-        image = self.transform(image).unsqueeze(0).to(self.device)
-        
-        # Extract image features
-        with torch.no_grad():
-            image_features = self.model.extract_image_features(image)
-            image_features = torch.nn.functional.normalize(image_features, p=2, dim=-1)
+        embeddings = self.encode_images([image])
         
         return {
-            "vector": image_features[0].cpu().numpy().tolist(),
-            "dim": image_features.shape[1]  
+            "vector": embeddings["vectors"][0],
+            "dim": embeddings["dim"]
         } 
     
     def encode_text(self, text: str):
         """
         Encode text using the model.
         """
-        # Tokenize and encode text
+        embeddings = self.encode_texts([text])
+        
+        return {
+            "vector": embeddings["vectors"][0],
+            "dim": embeddings["dim"]
+        }
+    
+    def encode_images(self, images: List[ImageInput], batch_size: Optional[int] = None):
+        """
+        Encode a list of images using the model, one forward pass per batch.
+        
+        Args:
+            images: List of PIL Image objects or raw image bytes to encode
+                (bytes are decoded at reduced resolution when possible)
+            batch_size: Maximum number of images per forward pass
+                (defaults to configs.ENCODE_BATCH_SIZE)
+            
+        Returns:
+            Dictionary with an (N, dim) float32 array of vectors, in input order
+        """
+        self.initialize()
+        batch_size = batch_size or configs.ENCODE_BATCH_SIZE
+        vectors = []
+        
+        for start in range(0, len(images), batch_size):
+            # Decode and transform the batch in parallel into a single tensor
+            batch = self.preprocessor.preprocess(images[start:start + batch_size])
+            vectors.append(self.encode_image_tensors(batch)["vectors"])
+        
+        vectors = np.concatenate(vectors) if len(vectors) > 1 else (vectors[0] if vectors else _empty_vectors())
+        return {
+            "vectors": vectors,
+            "dim": vectors.shape[1]
+        }
+    
+    def encode_image_tensors(self, batch):
+        """
+        Encode an already preprocessed (N, 3, 224, 224) image tensor in one forward pass.
+        """
+        import torch
+        
+        self.initialize()
+        batch = batch.to(self.device)
+        
+        # Extract image features (holding one of the model slots)
+        with inference_executor.slot(), torch.inference_mode():
+            image_features = self.backend.extract_image_features(batch)
+            image_features = torch.nn.functional.normalize(image_features, p=2, dim=-1)
+        
+        vectors = _as_float32(image_features)
+        return {
+            "vectors": vectors,
+            "dim": vectors.shape[1]
+        }
+    
+    def encode_texts(self, texts: List[str], batch_size: Optional[int] = None):
+        """
+        Encode a list of texts using the model, one forward pass per batch.
+        
+        Texts are tokenized once, sorted by token length and cut into
+        batches of similar length, so each batch is only padded to its own
+        longest text. Pooling ignores padding, so a text gets the same
+        embedding whichever batch it lands in.
+        
+        Args:
+            texts: List of text strings to encode
+            batch_size: Maximum number of texts per forward pass
+                (defaults to configs.ENCODE_BATCH_SIZE)
+            
+        Returns:
+            Dictionary with an (N, dim) float32 array of vectors, in input order
+        """
+        import torch
+        
+        self.initialize()
+        batch_size = batch_size or configs.ENCODE_BATCH_SIZE
+        vectors = None
+        
+        # Tokenize without padding and bucket by length
         encoded_texts = self.tokenizer(
-            [text],
-            padding=True,
+            list(texts),
             truncation=True,
-            max_length=100,
-            return_tensors='pt'
+            max_length=TEXT_MAX_LENGTH,
         )
+        order = sorted(range(len(texts)), key=lambda i: len(encoded_texts['input_ids'][i]))
         
-        # Move to device
-        input_ids = encoded_texts['input_ids'].to(self.device)
-        attention_mask = encoded_texts['attention_mask'].to(self.device)
-        
-        # Extract text features
-        with torch.no_grad():
-            text_features = self.model.extract_text_features(input_ids, attention_mask)
-            text_features = torch.nn.functional.normalize(text_features, p=2, dim=-1)
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            
+            # Pad the bucket to its longest text only
+            batch = self.tokenizer.pad(
+                {
+                    'input_ids': [encoded_texts['input_ids'][i] for i in indices],
+                    'attention_mask': [encoded_texts['attention_mask'][i] for i in indices],
+                },
+                padding=True,
+                return_tensors='pt'
+            )
+            
+            # Move to device
+            input_ids = batch['input_ids'].to(self.device)
+            attention_mask = batch['attention_mask'].to(self.device)
+            
+            # Extract text features (holding one of the model slots)
+            with inference_executor.slot(), torch.inference_mode():
+                text_features = self.backend.extract_text_features(input_ids, attention_mask)
+                text_features = torch.nn.functional.normalize(text_features, p=2, dim=-1)
+            
+            # Put the vectors back in input order
+            features = _as_float32(text_features)
+            if vectors is None:
+                vectors = np.empty((len(texts), features.shape[1]), dtype=np.float32)
+            vectors[indices] = features
         
+        if vectors is None:
+            vectors = _empty_vectors()
         return {
-            "vector": text_features[0].cpu().numpy().tolist(),
-            "dim": text_features.shape[1]  
+            "vectors": vectors,
+            "dim": vectors.shape[1]
         }
     
 
-# Create a singleton instance
+# Create a singleton instance (cheap: nothing is loaded until first use)
 resources = SimpleClipResources()
 
-# # Export the initialize function and resources
-# def initialize():
-#     resources.initialize()
+# Export the initialize function and resources
+def initialize():
+    resources.initialize()
 
-# def get_resources():
-#     if not resources._initialized:
-#         resources.initialize()
-#     return resources
\ No newline at end of file
+def get_resources():
+    resources.initialize()
+    return resources
@@ -0,0 +1,54 @@
+import threading
+
+import numpy as np
+
+from app.utils.local_vector_store import LocalVectorStore
+
+
+def _unit_vectors(rng, n, dim=32):
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_ivfpq_search_while_upserting(tmp_path):
+    """Searches must not see index rows added by concurrent upserts (IndexError)."""
+    rng = np.random.default_rng(0)
+    store = LocalVectorStore(str(tmp_path), index="ivfpq", index_min_rows=1000, nlist=16, pq_m=8)
+    store.upsert([(f"id{i}", vector, {"type": "Image"}) for i, vector in enumerate(_unit_vectors(rng, 2000))])
+    store.build_index()
+
+    new_vectors = _unit_vectors(rng, 2000)
+    queries = _unit_vectors(rng, 16)
+    errors = []
+    done = threading.Event()
+
+    def upsert():
+        try:
+            for start in range(0, len(new_vectors), 10):
+                store.upsert([
+                    (f"new{start + i}", vector, {"type": "Image"})
+                    for i, vector in enumerate(new_vectors[start:start + 10])
+                ])
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+
+    def search():
+        # Each search adds the rows written since the last one to the shared index
+        try:
+            while not done.is_set():
+                for objects in store.search_many(queries, type_filter="Image", limit=5):
+                    assert len(objects) == 5
+                    assert all(obj.properties is not None for obj in objects)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=upsert)] + [threading.Thread(target=search) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert store.search(new_vectors[-1], type_filter="Image", limit=1)[0].uuid == "new1999"